@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+
+# uvicorn asgi:app --workers 4
+# gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+
+from create_asgi_app import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# ############################################
+# compares gunicorn sync workers running app:app
+# with uvicorn workers running the asgi app on
+# async engines, at growing numbers of concurrent
+# clients. --latency-ms adds a wait to every query
+# to stand in for a database across the network,
+# asleep on the event loop under asgi and blocking
+# the worker under wsgi
+#
+# needs gunicorn, uvicorn and aiosqlite
+#
+# cd server
+# python -m benchmarks.asgi_benchmark --workers 2 --concurrency 10,100,1000 --latency-ms 20
+# ############################################
+
+import os
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+
+from create_app import create_app
+from create_asgi_app import create_asgi_app
+from config import sqlite_pragmas
+from models import db
+from benchmarks.serializer_benchmark import build_catalog
+
+MONSTER_COUNT = 200
+PATHS = [ '/monsters/{id}', '/monsters/{id}/skills', '/spells/{spell}' ]
+
+
+# add_query_latency ##########
+# params: engine:sqlalchemy.Engine, seconds:float
+# ############################
+def add_query_latency(engine, seconds):
+    def wait(conn, cursor, statement, parameters, context, executemany):
+        if engine.dialect.is_async:
+            await_only(asyncio.sleep(seconds))
+        else:
+            time.sleep(seconds)
+    event.listen(engine, 'before_cursor_execute', wait)
+
+
+def server_config():
+    return { 'SQLALCHEMY_DATABASE_URI': os.environ['BENCHMARK_DATABASE_URI'], 'SQLITE_PRAGMAS': sqlite_pragmas(), 'QUERY_BUDGET_ENABLED': False }
+
+
+# wsgi_app, asgi_app ##########
+# the servers under test, started by gunicorn and
+# uvicorn from run_server
+# #############################
+def wsgi_app():
+    app = create_app('TESTING', server_config())
+    with app.app_context():
+        add_query_latency(db.engine, float(os.environ['BENCHMARK_LATENCY_MS']) / 1000)
+    return app
+
+
+def asgi_app():
+    bridge = create_asgi_app('TESTING', server_config())
+    add_query_latency(bridge.engines[0].sync_engine, float(os.environ['BENCHMARK_LATENCY_MS']) / 1000)
+    return bridge
+
+
+def build_database(path):
+    app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}", 'SQLITE_PRAGMAS': sqlite_pragmas() })
+    with app.app_context():
+        db.create_all()
+        build_catalog(MONSTER_COUNT)
+        db.session.remove()
+        db.engine.dispose()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_server(kind, port, workers):
+    if kind == 'wsgi':
+        command = [ 'gunicorn', '--workers', str(workers), '--bind', f"127.0.0.1:{port}", '--backlog', '4096', '--timeout', '120', 'benchmarks.asgi_benchmark:wsgi_app()' ]
+    else:
+        command = [ 'uvicorn', '--factory', 'benchmarks.asgi_benchmark:asgi_app', '--workers', str(workers), '--port', str(port), '--backlog', '4096', '--log-level', 'warning' ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"{kind} server did not start, is {command[0]} installed?")
+
+
+# ----------- LOAD ----------- #
+
+async def get(port, path, timeout):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+        return int(response.split(b' ', 2)[1])
+    finally:
+        writer.close()
+
+
+# client ##########
+# one client sending requests back to back until
+# the deadline
+# #################
+async def client(port, deadline, timeout, latencies, errors):
+    while time.perf_counter() < deadline:
+        path = random.choice(PATHS).format(id=random.randint(1, MONSTER_COUNT), spell=random.randint(1, 20))
+        started = time.perf_counter()
+        try:
+            status = await get(port, path, timeout)
+        except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+            status = None
+        if status == 200:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(status)
+
+
+async def load(port, concurrency, seconds, timeout):
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*[ client(port, deadline, timeout, latencies, errors) for _ in range(concurrency) ])
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0
+    return { 'requests_per_second': len(latencies) / seconds, 'p50': percentile(0.5), 'p99': percentile(0.99), 'errors': len(errors) }
+
+
+def run(workers, concurrency_levels, seconds, latency_ms, timeout):
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    build_database(path)
+    os.environ['BENCHMARK_DATABASE_URI'] = f"sqlite:///{path}"
+    os.environ['BENCHMARK_LATENCY_MS'] = str(latency_ms)
+
+    rows = []
+    for kind in ['wsgi', 'asgi']:
+        port = free_port()
+        server = run_server(kind, port, workers)
+        try:
+            for concurrency in concurrency_levels:
+                rows.append({ 'server': kind, 'clients': concurrency, **asyncio.run(load(port, concurrency, seconds, timeout)) })
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{workers} workers, {latency_ms} ms per query, {seconds}s per run")
+    print(f"{'server':<6} {'clients':>7} {'req/sec':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for row in rows:
+        print(f"{row['server']:<6} {row['clients']:>7} {row['requests_per_second']:>9.0f} {row['p50']:>9.1f} {row['p99']:>9.1f} {row['errors']:>7}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare gunicorn sync workers with the asgi app under concurrent clients")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', default='10,100,1000', help="comma separated numbers of concurrent clients")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--latency-ms', type=float, default=20, help="wait added to every query")
+    parser.add_argument('--timeout', type=float, default=30, help="seconds before a request counts as an error")
+    args = parser.parse_args()
+    run(args.workers, [ int(n) for n in args.concurrency.split(',') ], args.seconds, args.latency_ms, args.timeout)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+# ############################################
+# generates a synthetic catalog shaped like the
+# published monster manuals: most monsters are low
+# challenge rating, stats grow with the rating,
+# child rows follow the counts seen in the scraped
+# data, and about one monster in five casts spells
+# from a list where a few spells are far more
+# popular than the rest
+#
+# the same seed always gives the same catalog
+#
+# cd server
+# python -m benchmarks.catalog_generator --monsters 10000 --database /tmp/catalog.db
+# ############################################
+
+import math
+import random
+import argparse
+from faker import Faker
+from sqlalchemy import insert, select, func
+
+from models import db, Monster, Skill, SavingThrow, ConditionImmunity, Spell
+from bulk import prepare_bulk_monster, insert_bulk_monsters, BULK_MAX_ITEMS
+from damage_types import DAMAGE_TYPES
+
+SCALES = { '1k': 1000, '10k': 10000, '100k': 100000 }
+
+# challenge rating: weight, roughly the srd spread
+CHALLENGE_RATINGS = { 0: 8, 1: 14, 2: 13, 3: 10, 4: 7, 5: 8, 6: 5, 7: 4, 8: 4, 9: 3, 10: 3, 11: 2, 12: 2, 13: 2, 14: 1.5, 15: 1.5, 16: 1.5, 17: 1.5, 18: 0.5, 19: 0.5, 20: 0.5, 21: 1, 22: 0.5, 23: 0.5, 24: 0.5, 30: 0.2 }
+SIZES = { 'tiny': 6, 'small': 10, 'medium': 44, 'large': 25, 'huge': 10, 'gargantuan': 5 }
+HIT_DICE = { 'tiny': 4, 'small': 6, 'medium': 8, 'large': 10, 'huge': 12, 'gargantuan': 20 }
+CATEGORIES = { 'aberration': 4, 'beast': 20, 'celestial': 3, 'construct': 4, 'dragon': 12, 'elemental': 5, 'fey': 3, 'fiend': 9, 'giant': 4, 'humanoid': 15, 'monstrosity': 13, 'ooze': 1, 'plant': 2, 'undead': 6 }
+ALIGNMENTS = { 'unaligned': 25, 'neutral': 10, 'chaotic evil': 20, 'lawful evil': 15, 'neutral evil': 10, 'chaotic neutral': 5, 'lawful good': 5, 'chaotic good': 4, 'lawful neutral': 4, 'neutral good': 2 }
+SPELL_LEVELS = { 0: 8, 1: 16, 2: 16, 3: 13, 4: 11, 5: 11, 6: 9, 7: 6, 8: 5, 9: 5 }
+SENSES = ['darkvision', 'blindsight', 'tremorsense', 'truesight']
+SPEEDS = ['walk', 'fly', 'swim', 'climb', 'burrow']
+LANGUAGES = ['common', 'draconic', 'elvish', 'dwarvish', 'giant', 'goblin', 'orc', 'abyssal', 'infernal', 'celestial', 'sylvan', 'deep speech', 'primordial', 'undercommon', 'telepathy 120 ft.']
+ABILITIES = ['strength', 'dexterity', 'constitution', 'intelligence', 'wisdom', 'charisma']
+SPELL_SLOT_COLUMNS = ['spell_slots_first_level', 'spell_slots_second_level', 'spell_slots_third_level', 'spell_slots_fourth_level', 'spell_slots_fifth_level', 'spell_slots_sixth_level', 'spell_slots_seventh_level', 'spell_slots_eighth_level', 'spell_slots_ninth_level']
+SPELLCASTER_SHARE = 0.2
+# popularity of the n-th spell is 1 / n ** SPELL_POPULARITY
+SPELL_POPULARITY = 0.9
+
+
+def weighted(rng, weights):
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+# poisson ##########
+# params: rng:random.Random, mean:float, cap:int
+# return int between 0 and cap
+# ##################
+def poisson(rng, mean, cap):
+    limit = math.exp(-mean)
+    count = 0
+    product = rng.random()
+    while product > limit and count < cap:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def modifier(score):
+    return (score - 10) // 2
+
+
+# CatalogGenerator ##########
+# params: seed:int
+#
+# example: CatalogGenerator(0).spells(300)
+# ###########################
+class CatalogGenerator:
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.names = set()
+
+    # unique_name ##########
+    # names are unique case insensitively, like the
+    # catalog import keeps them
+    # ######################
+    def unique_name(self, words):
+        while True:
+            name = ' '.join( self.fake.word().title() for _ in range(words) )
+            if name.lower() not in self.names:
+                self.names.add(name.lower())
+                return name
+
+    # spells ##########
+    # params: count:int
+    # return list[dict] POST /spells bodies
+    # #################
+    def spells(self, count):
+        spells = []
+        for _ in range(count):
+            level = weighted(self.rng, SPELL_LEVELS)
+            spells.append({
+                'name': self.unique_name(self.rng.choice([1, 2, 2, 3])),
+                'description': self.fake.paragraph(nb_sentences=self.rng.randint(2, 8)),
+                'level': level,
+                'casting_time': self.rng.choices(['1 action', '1 bonus action', '1 reaction', '1 minute', '10 minutes', '1 hour'], weights=[70, 10, 4, 8, 5, 3])[0],
+                'duration': self.rng.choices(['Instantaneous', '1 round', '1 minute', '10 minutes', '1 hour', '8 hours', '24 hours'], weights=[45, 5, 20, 10, 10, 6, 4])[0],
+                'range_area': self.rng.choice(['Self', 'Touch', '30 ft.', '60 ft.', '90 ft.', '120 ft.', '150 ft.', 'Self (15 ft. cone)', 'Self (60 ft. line)']),
+                'at_higher_levels': self.fake.sentence() if 0 < level < 9 and self.rng.random() < 0.4 else None,
+                'ritual': self.rng.random() < 0.08,
+                'concentration': self.rng.random() < 0.4,
+                'verbal': self.rng.random() < 0.95,
+                'somatic': self.rng.random() < 0.8,
+                'material': self.fake.sentence(nb_words=6) if self.rng.random() < 0.5 else None,
+                'school': self.rng.choice(Spell.SPELL_SCHOOLS[:-1]),
+                'attack_save': self.rng.choice([None, None, 'DEX Save', 'WIS Save', 'CON Save', 'Melee', 'Ranged']),
+                'damage_effect': self.rng.choice([None, None, *DAMAGE_TYPES[:13], 'Control', 'Buff', 'Healing']),
+                'source': 'Synthetic',
+            })
+        return spells
+
+    # monsters ##########
+    # params: count:int, spell_names:list[str]
+    # return list[dict] POST /monsters bodies
+    # ###################
+    def monsters(self, count, spell_names):
+        popularity = [ 1 / (rank + 1) ** SPELL_POPULARITY for rank in range(len(spell_names)) ]
+        return [ self.monster(spell_names, popularity) for _ in range(count) ]
+
+    def monster(self, spell_names, popularity):
+        rng = self.rng
+        cr = weighted(rng, CHALLENGE_RATINGS)
+        size = weighted(rng, SIZES)
+        scores = { a: max(1, min(30, round(rng.gauss(10 + cr / (2 if a in ['strength', 'constitution'] else 4), 3)))) for a in ABILITIES }
+        hit_dice_count = max(1, round(rng.gauss(2 + cr * 1.4, 1 + cr * 0.3)))
+        hit_dice_size = HIT_DICE[size]
+        proficiency_bonus = 2 + max(0, (cr - 1) // 4)
+
+        monster = {
+            'name': self.unique_name(rng.choice([1, 2, 2, 3])),
+            'size': size,
+            'alignment': weighted(rng, ALIGNMENTS),
+            'category': weighted(rng, CATEGORIES),
+            'sub_category': rng.choice([None, None, None, 'shapechanger', 'demon', 'devil', 'goblinoid', 'any race', 'titan']),
+            'armor_class': max(5, min(25, round(rng.gauss(11 + cr / 2.5, 1.5)))),
+            'hit_dice_count': hit_dice_count,
+            'hit_dice_size': hit_dice_size,
+            'hit_points': max(1, hit_dice_count * (hit_dice_size + 1) // 2 + hit_dice_count * modifier(scores['constitution'])),
+            **scores,
+            'passive_perception': 10 + modifier(scores['wisdom']) + (proficiency_bonus if rng.random() < 0.4 else 0),
+            'challenge_rating': cr,
+            'proficiency_bonus': proficiency_bonus,
+            'source': 'Synthetic',
+            'skills': [ { 'name': name, 'value': proficiency_bonus + rng.randint(0, 4) } for name in rng.sample(Skill.SKILLS, poisson(rng, 1.4, 5)) ],
+            'saving_throws': [ { 'name': name, 'value': proficiency_bonus + rng.randint(0, 5) } for name in rng.sample(ABILITIES, poisson(rng, 0.5 + cr / 8, 5)) ],
+            'special_abilities': [ { 'name': self.fake.catch_phrase(), 'description': self.fake.paragraph(nb_sentences=rng.randint(1, 5)) } for _ in range(poisson(rng, 1.3 + cr / 10, 7)) ],
+            'senses': [ { 'name': name, 'distance': rng.choice([30, 60, 60, 120]) } for name in rng.sample(SENSES, poisson(rng, 0.8, 3)) ],
+            'speeds': [ { 'name': name, 'distance': rng.choice([10, 20, 30, 30, 40, 60, 80]) } for name in ['walk', *rng.sample(SPEEDS[1:], poisson(rng, 0.5, 3))] ],
+            'languages': [ { 'name': name } for name in rng.sample(LANGUAGES, poisson(rng, 1.2, 5)) ],
+            'damage_resistances': [ { 'damage_type': t } for t in rng.sample(DAMAGE_TYPES, poisson(rng, 0.4 + cr / 20, 6)) ],
+            'damage_immunities': [ { 'damage_type': t } for t in rng.sample(DAMAGE_TYPES, poisson(rng, 0.3 + cr / 25, 4)) ],
+            'damage_vulnerabilities': [ { 'damage_type': t } for t in rng.sample(DAMAGE_TYPES, poisson(rng, 0.08, 2)) ],
+            'condition_immunities': [ { 'condition_type': t } for t in rng.sample(ConditionImmunity.CONDITION_TYPES, poisson(rng, 0.5 + cr / 15, 8)) ],
+            'actions': self.actions(cr),
+        }
+
+        if spell_names and rng.random() < SPELLCASTER_SHARE:
+            level = max(1, min(20, cr + rng.randint(0, 4)))
+            ability = rng.choice(['intelligence', 'wisdom', 'charisma'])
+            monster.update({
+                'spellcasting_level': level,
+                'spellcasting_ability': ability,
+                'spell_save_dc': 8 + proficiency_bonus + modifier(scores[ability]),
+                'spell_modifier': proficiency_bonus + modifier(scores[ability]),
+                **{ column: min(4, max(0, (level + 1) // 2 - n)) if n < 5 else int(level >= 2 * n + 1) for n, column in enumerate(SPELL_SLOT_COLUMNS) },
+            })
+            known = min(len(spell_names), max(2, round(rng.lognormvariate(2, 0.5))))
+            monster['spells'] = list({ name.lower(): name for name in rng.choices(spell_names, weights=popularity, k=known) }.values())
+        return monster
+
+    def actions(self, cr):
+        rng = self.rng
+        actions = [
+            { 'name': rng.choice(['Bite', 'Claw', 'Slam', 'Tail', 'Gore', 'Longsword', 'Shortbow', 'Dagger', 'Tentacle', 'Multiattack']), 'description': self.fake.paragraph(nb_sentences=rng.randint(1, 3)) }
+            for _ in range(1 + poisson(rng, 1.5 + cr / 10, 7))
+        ]
+        if rng.random() < 0.1:
+            actions.append({ 'name': self.fake.catch_phrase(), 'description': self.fake.sentence(), 'bonus_action': True })
+        if rng.random() < 0.12:
+            actions.append({ 'name': 'Parry', 'description': self.fake.sentence(), 'reaction': True })
+        if cr >= 10 and rng.random() < 0.6:
+            actions += [ { 'name': self.fake.catch_phrase(), 'description': self.fake.sentence(), 'legendary_action': True } for _ in range(3) ]
+        if cr >= 17 and rng.random() < 0.4:
+            actions += [ { 'name': self.fake.catch_phrase(), 'description': self.fake.paragraph(), 'lair_action': True } for _ in range(rng.randint(1, 3)) ]
+        return actions
+
+# END CatalogGenerator #
+
+
+def spell_count_for(monster_count):
+    return max(100, monster_count // 10)
+
+
+# load_catalog ##########
+# params: monster_count:int, spell_count:int, seed:int
+# return { spells:int, monsters:int, missing_spells:int }
+#
+# generates and bulk inserts a catalog into the
+# current app's database with the same validation
+# and executemany inserts as POST /monsters/bulk,
+# needs an app context
+# #######################
+def load_catalog(monster_count, spell_count=None, seed=0, progress=None):
+    generator = CatalogGenerator(seed)
+    spells = generator.spells(spell_count if spell_count is not None else spell_count_for(monster_count))
+    for start in range(0, len(spells), BULK_MAX_ITEMS):
+        db.session.execute(insert(Spell), spells[start:start + BULK_MAX_ITEMS])
+    spell_names = [ s['name'] for s in spells ]
+
+    missing = 0
+    for start in range(0, monster_count, BULK_MAX_ITEMS):
+        batch = generator.monsters(min(BULK_MAX_ITEMS, monster_count - start), spell_names)
+        results = insert_bulk_monsters([ prepare_bulk_monster(item) for item in batch ])
+        missing += sum( len(r['missing_spells']) for r in results )
+        if progress:
+            progress(start + len(batch), monster_count)
+    db.session.commit()
+    return { 'spells': len(spells), 'monsters': monster_count, 'missing_spells': missing }
+
+
+def catalog_size():
+    return {
+        'monsters': db.session.execute(select(func.count()).select_from(Monster)).scalar(),
+        'spells': db.session.execute(select(func.count()).select_from(Spell)).scalar(),
+    }
+
+
+if __name__ == '__main__':
+    from create_app import create_app
+    from config import sqlite_pragmas
+
+    parser = argparse.ArgumentParser(description="Generate and load a synthetic monster catalog")
+    parser.add_argument('--monsters', type=int, default=SCALES['1k'])
+    parser.add_argument('--spells', type=int, default=None, help="defaults to a tenth of the monsters, at least 100")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--database', required=True, help="sqlite file to create")
+    args = parser.parse_args()
+
+    app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{args.database}", 'SQLITE_PRAGMAS': sqlite_pragmas() })
+    with app.app_context():
+        db.create_all()
+        loaded = load_catalog(args.monsters, args.spells, args.seed, progress=lambda done, total: print(f"\rmonsters: {done}/{total}", end='', flush=True))
+        print(f"\nloaded {loaded['monsters']} monsters and {loaded['spells']} spells into {args.database}")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+# ############################################
+# times every route of monster_routes, spell_routes,
+# the nested monster blueprints and search against a
+# synthetic catalog loaded by catalog_generator, and
+# writes the results to JSON so two runs can be
+# compared
+#
+# cd server
+# python -m benchmarks.route_benchmark --scale 10k --output results/main.json
+# python -m benchmarks.route_benchmark --scale 10k --output results/branch.json --compare results/main.json
+#
+# --compare exits with 1 when a scenario's p50 is
+# slower than the old run by more than --threshold
+# ############################################
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timezone
+import sqlalchemy
+
+from create_app import create_app
+from config import sqlite_pragmas
+from models import db
+from benchmarks.catalog_generator import SCALES, CatalogGenerator, load_catalog, catalog_size
+from benchmarks.scenarios import build_scenarios, benchmark_context
+
+RESULTS_VERSION = 1
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+# summarize ##########
+# params: timings:list[float] seconds, errors:int
+# return dict of milliseconds
+# ####################
+def summarize(timings, errors):
+    timings = sorted(timings)
+    if not timings:
+        return { 'requests': 0, 'errors': errors }
+    ms = [ t * 1000 for t in timings ]
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(percentile(ms, 0.5), 3),
+        'p95_ms': round(percentile(ms, 0.95), 3),
+        'p99_ms': round(percentile(ms, 0.99), 3),
+        'min_ms': round(ms[0], 3),
+        'max_ms': round(ms[-1], 3),
+        'per_second': round(len(ms) / sum(timings), 1),
+    }
+
+
+# run_scenario ##########
+# params: client:FlaskClient, scenario:dict, ctx:dict, repeat:int
+# return dict, see summarize
+#
+# setup runs untimed, each request is timed from the
+# call to the test client until its body is read.
+# requests share the benchmark's app context, so the
+# session is removed after each one like a server's
+# request teardown would
+# #######################
+def run_scenario(client, scenario, ctx, repeat):
+    count = scenario['requests'](repeat) if 'requests' in scenario else repeat
+    if 'setup' in scenario:
+        available = scenario['setup'](ctx, count)
+        if available is not None:
+            count = min(count, available)
+        db.session.remove()
+
+    timings = []
+    errors = 0
+    for n in range(count):
+        method, path, options = scenario['request'](ctx, n)
+        started = time.perf_counter()
+        response = client.open(path, method=method, **options)
+        response.get_data()
+        timings.append(time.perf_counter() - started)
+        db.session.remove()
+        if response.status_code != scenario['status']:
+            errors += 1
+        elif 'after' in scenario:
+            scenario['after'](ctx, response)
+    ctx.pop('next_cursor', None)
+    return summarize(timings, errors)
+
+
+# prepare_database ##########
+# params: app:flask.app.Flask, monsters:int, seed:int, rebuild:bool
+# return dict of catalog counts and load_seconds
+#
+# reuses a database that already holds a catalog
+# unless rebuild is set
+# ###########################
+def prepare_database(app, monsters, seed, rebuild):
+    with app.app_context():
+        if rebuild:
+            db.drop_all()
+        db.create_all()
+        size = catalog_size()
+        if size['monsters']:
+            return { **size, 'load_seconds': None }
+        started = time.perf_counter()
+        load_catalog(monsters, seed=seed, progress=lambda done, total: print(f"\rloading monsters: {done}/{total}", end='', file=sys.stderr, flush=True))
+        print(file=sys.stderr)
+        return { **catalog_size(), 'load_seconds': round(time.perf_counter() - started, 2) }
+
+
+def run(monsters, seed, repeat, database, rebuild, response_cache, only):
+    app = create_app('TESTING', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{database}",
+        'SQLITE_PRAGMAS': sqlite_pragmas(),
+        'RESPONSE_CACHE_ENABLED': response_cache,
+        'QUERY_BUDGET_ENABLED': False,
+    })
+    catalog = prepare_database(app, monsters, seed, rebuild)
+
+    results = {}
+    with app.app_context():
+        client = app.test_client()
+        # a different seed from the catalog so new rows get new names
+        ctx = benchmark_context(CatalogGenerator(seed + 1), repeat)
+        db.session.remove()
+        for scenario in build_scenarios():
+            if only and not any( o in scenario['name'] for o in only ):
+                continue
+            results[scenario['name']] = run_scenario(client, scenario, ctx, repeat)
+            print(format_row(scenario['name'], results[scenario['name']]), file=sys.stderr)
+
+    return {
+        'version': RESULTS_VERSION,
+        'metadata': {
+            'catalog': catalog,
+            'seed': seed,
+            'repeat': repeat,
+            'response_cache': response_cache,
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'scenarios': results,
+    }
+
+
+# ----------- COMPARE ----------- #
+
+def format_row(name, stats):
+    if not stats['requests']:
+        return f"{name:<48} {'skipped, no rows':>20}"
+    return f"{name:<48} {stats['requests']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>6}"
+
+
+# compare ##########
+# params: old:dict, new:dict results, threshold:float
+# return list[dict] rows of scenarios in both runs,
+# regressed when new p50 > old p50 * (1 + threshold)
+# ##################
+def compare(old, new, threshold):
+    rows = []
+    for name, stats in new['scenarios'].items():
+        before = old['scenarios'].get(name)
+        if not before or not before['requests'] or not stats['requests']:
+            continue
+        change = stats['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0
+        rows.append({ 'name': name, 'old_p50_ms': before['p50_ms'], 'new_p50_ms': stats['p50_ms'], 'change': change, 'regressed': change > threshold })
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'scenario':<48} {'old p50':>9} {'new p50':>9} {'change':>8}")
+    for row in rows:
+        flag = '  REGRESSED' if row['regressed'] else ''
+        print(f"{row['name']:<48} {row['old_p50_ms']:>9.2f} {row['new_p50_ms']:>9.2f} {row['change']:>+8.0%}{flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time every route against a synthetic catalog")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument('--scale', choices=SCALES, default='1k')
+    size.add_argument('--monsters', type=int, help="catalog size instead of a scale")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=200, help="requests per scenario")
+    parser.add_argument('--database', help="sqlite file, reused when it already holds a catalog, defaults to a temporary file")
+    parser.add_argument('--rebuild', action='store_true', help="drop and reload the catalog in --database")
+    parser.add_argument('--response-cache', action='store_true', help="run with the response cache enabled")
+    parser.add_argument('--only', action='append', help="run the scenarios whose name contains this, repeatable")
+    parser.add_argument('--output', help="file to write the results JSON to")
+    parser.add_argument('--compare', help="results JSON of an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.2, help="p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    monsters = args.monsters or SCALES[args.scale]
+    print(f"{'scenario':<48} {'reqs':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>6}", file=sys.stderr)
+    results = run(monsters, args.seed, args.repeat, database, args.rebuild, args.response_cache, args.only)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), results, args.threshold)
+        print_comparison(rows)
+        if any( row['regressed'] for row in rows ):
+            sys.exit(1)
@@ -0,0 +1,178 @@
+# ############################################
+# timed scenarios for route_benchmark, one or more
+# per route of monster_routes, spell_routes, the
+# nested monster blueprints and search
+#
+# a scenario is a dict:
+#     name      str shown in the results
+#     request   function(ctx, n) -> (method, path, options)
+#               for the n-th request, options are
+#               passed to the test client
+#     status    expected status code
+#     requests  optional function(repeat) -> int
+#     setup     optional function(ctx, count) run
+#               untimed before the requests, may
+#               return a lower count when there are
+#               fewer rows to work on
+#     after     optional function(ctx, response)
+#
+# reads run first, then writes, then deletes, and
+# the writes only touch rows the reads are done with
+# or rows their setup created
+# ############################################
+
+from sqlalchemy import select, insert, func
+
+from models import db, Monster, MonsterSpell, Spell
+from helpers import NESTED_MONSTER_DATA
+from bulk import prepare_bulk_monster, insert_bulk_monsters
+
+# field sent by PATCH /monsters/:id/<resource>/:id
+NESTED_PATCHES = {
+    'skills': lambda n: { 'value': n % 10 },
+    'saving_throws': lambda n: { 'value': n % 10 },
+    'special_abilities': lambda n: { 'description': f"Patched description {n}" },
+    'senses': lambda n: { 'distance': 30 + n % 4 * 30 },
+    'speeds': lambda n: { 'distance': 10 + n % 8 * 10 },
+    'languages': lambda n: { 'name': f"language {n}" },
+    'damage_resistances': lambda n: { 'damage_type': 'fire' if n % 2 else 'cold' },
+    'damage_immunities': lambda n: { 'damage_type': 'poison' if n % 2 else 'necrotic' },
+    'damage_vulnerabilities': lambda n: { 'damage_type': 'radiant' if n % 2 else 'thunder' },
+    'condition_immunities': lambda n: { 'condition_type': 'prone' if n % 2 else 'charmed' },
+    'actions': lambda n: { 'description': f"Patched action {n}" },
+}
+
+
+def pick(ctx, key, n):
+    values = ctx[key]
+    return values[n % len(values)]
+
+
+# sample_rows ##########
+# params: columns:list[Column], count:int, *where
+# return list[tuple] random rows
+# ######################
+def sample_rows(columns, count, *where):
+    return db.session.execute(select(*columns).where(*where).order_by(func.random()).limit(count)).all()
+
+
+# scratch_monsters ##########
+# params: ctx:dict, count:int
+# return list[int] ids of new monsters without spells,
+# for the scenarios that delete or link
+# ###########################
+def scratch_monsters(ctx, count):
+    items = [ { **item, 'spells': [] } for item in ctx['generator'].monsters(count, []) ]
+    ids = [ r['id'] for r in insert_bulk_monsters([ prepare_bulk_monster(item) for item in items ]) ]
+    db.session.commit()
+    return ids
+
+
+def setup_links(ctx, count):
+    monster_ids = scratch_monsters(ctx, count)
+    ctx['links'] = [ (monster_id, pick(ctx, 'spell_ids', n)) for n, monster_id in enumerate(monster_ids) ]
+
+
+def setup_deleted_links(ctx, count):
+    monster_ids = scratch_monsters(ctx, count)
+    ctx['deleted_links'] = [ (monster_id, pick(ctx, 'spell_ids', n)) for n, monster_id in enumerate(monster_ids) ]
+    db.session.execute(insert(MonsterSpell), [ { 'monster_id': m, 'spell_id': s } for m, s in ctx['deleted_links'] ])
+    db.session.commit()
+
+
+def setup_deleted_monsters(ctx, count):
+    ctx['deleted_monster_ids'] = scratch_monsters(ctx, count)
+
+
+def setup_deleted_spells(ctx, count):
+    rows = ctx['generator'].spells(count)
+    ctx['deleted_spell_ids'] = db.session.execute(insert(Spell).returning(Spell.id), rows).scalars().all()
+    db.session.commit()
+
+
+def setup_nested_rows(model, key):
+    def setup(ctx, count):
+        # rows left behind by replaced collections have no monster
+        ctx[key] = sample_rows([ model.monster_id, model.id ], count, model.monster_id.is_not(None))
+        return len(ctx[key])
+    return setup
+
+
+def store_cursor(ctx, response):
+    ctx['next_cursor'] = response.json.get('next_cursor') or ''
+
+
+def json_request(method, path, body):
+    return (method, path, { 'json': body })
+
+
+# build_scenarios ##########
+# return list[dict]
+# ##########################
+def build_scenarios():
+    reads = [
+        { 'name': 'GET /monsters', 'request': lambda ctx, n: ('GET', f"/monsters?page={n % 50 + 1}", {}), 'status': 200 },
+        { 'name': 'GET /monsters?page_count=50', 'request': lambda ctx, n: ('GET', f"/monsters?page={n % 20 + 1}&page_count=50", {}), 'status': 200 },
+        { 'name': 'GET /monsters?fields', 'request': lambda ctx, n: ('GET', f"/monsters?page={n % 50 + 1}&fields=name,challenge_rating,category", {}), 'status': 200 },
+        { 'name': 'GET /monsters?name', 'request': lambda ctx, n: ('GET', f"/monsters?name={pick(ctx, 'monster_names', n)[:4]}", {}), 'status': 200 },
+        { 'name': 'GET /monsters?cursor', 'request': lambda ctx, n: ('GET', f"/monsters?cursor={ctx.get('next_cursor', '')}&sort=name", {}), 'status': 200, 'after': store_cursor },
+        { 'name': 'GET /monsters/:id', 'request': lambda ctx, n: ('GET', f"/monsters/{pick(ctx, 'monster_ids', n)}", {}), 'status': 200 },
+        { 'name': 'GET /monsters/:id?fields', 'request': lambda ctx, n: ('GET', f"/monsters/{pick(ctx, 'monster_ids', n)}?fields=name,actions,spells", {}), 'status': 200 },
+        { 'name': 'GET /monsters/export', 'request': lambda ctx, n: ('GET', '/monsters/export', {}), 'status': 200, 'requests': lambda repeat: 3 },
+        { 'name': 'GET /spells', 'request': lambda ctx, n: ('GET', f"/spells?page={n % 10 + 1}", {}), 'status': 200 },
+        { 'name': 'GET /spells?name', 'request': lambda ctx, n: ('GET', f"/spells?name={pick(ctx, 'spell_names', n)[:4]}", {}), 'status': 200 },
+        { 'name': 'GET /spells?cursor', 'request': lambda ctx, n: ('GET', f"/spells?cursor={ctx.get('next_cursor', '')}", {}), 'status': 200, 'after': store_cursor },
+        { 'name': 'GET /spells/:id', 'request': lambda ctx, n: ('GET', f"/spells/{pick(ctx, 'spell_ids', n)}", {}), 'status': 200 },
+        { 'name': 'GET /spells/export', 'request': lambda ctx, n: ('GET', '/spells/export', {}), 'status': 200, 'requests': lambda repeat: 3 },
+        { 'name': 'GET /search', 'request': lambda ctx, n: ('GET', f"/search?q={pick(ctx, 'spell_names', n).split()[0]}", {}), 'status': 200 },
+    ]
+    nested_reads = []
+    nested_writes = []
+    nested_deletes = []
+    for key, (model, _, _) in NESTED_MONSTER_DATA.items():
+        path = key.replace('_', '-')
+        nested_reads.append({ 'name': f"GET /monsters/:id/{path}", 'request': lambda ctx, n, path=path: ('GET', f"/monsters/{pick(ctx, 'monster_ids', n)}/{path}", {}), 'status': 200 })
+        nested_writes.append({
+            'name': f"PATCH /monsters/:id/{path}/:id",
+            'setup': setup_nested_rows(model, f"patch_{key}"),
+            'request': lambda ctx, n, key=key, path=path: json_request('PATCH', f"/monsters/{pick(ctx, f'patch_{key}', n)[0]}/{path}/{pick(ctx, f'patch_{key}', n)[1]}", NESTED_PATCHES[key](n)),
+            'status': 202,
+        })
+        nested_deletes.append({
+            'name': f"DELETE /monsters/:id/{path}/:id",
+            'setup': setup_nested_rows(model, f"delete_{key}"),
+            'request': lambda ctx, n, key=key, path=path: ('DELETE', f"/monsters/{ctx[f'delete_{key}'][n][0]}/{path}/{ctx[f'delete_{key}'][n][1]}", {}),
+            'status': 204,
+        })
+
+    writes = [
+        { 'name': 'POST /monsters', 'request': lambda ctx, n: json_request('POST', '/monsters', ctx['generator'].monsters(1, ctx['spell_names'])[0]), 'status': 201 },
+        { 'name': 'POST /monsters/bulk (100)', 'request': lambda ctx, n: json_request('POST', '/monsters/bulk', ctx['generator'].monsters(100, ctx['spell_names'])), 'status': 201, 'requests': lambda repeat: max(1, repeat // 20) },
+        { 'name': 'PATCH /monsters/:id', 'request': lambda ctx, n: json_request('PATCH', f"/monsters/{pick(ctx, 'monster_ids', n)}", { 'armor_class': 10 + n % 10 }), 'status': 202 },
+        { 'name': 'PATCH /monsters/:id (nested)', 'request': lambda ctx, n: json_request('PATCH', f"/monsters/{pick(ctx, 'monster_ids', n)}", { 'skills': [ { 'name': 'stealth', 'value': n % 10 } ], 'languages': [ { 'name': 'common' } ] }), 'status': 202 },
+        { 'name': 'POST /spells', 'request': lambda ctx, n: json_request('POST', '/spells', ctx['generator'].spells(1)[0]), 'status': 201 },
+        { 'name': 'PATCH /spells/:id', 'request': lambda ctx, n: json_request('PATCH', f"/spells/{pick(ctx, 'spell_ids', n)}", { 'level': n % 10 }), 'status': 202 },
+        { 'name': 'POST /monsters/:id/spells', 'setup': setup_links, 'request': lambda ctx, n: json_request('POST', f"/monsters/{ctx['links'][n][0]}/spells", { 'id': ctx['links'][n][1] }), 'status': 201 },
+    ]
+    deletes = [
+        { 'name': 'DELETE /monsters/:id/spells/:id', 'setup': setup_deleted_links, 'request': lambda ctx, n: ('DELETE', f"/monsters/{ctx['deleted_links'][n][0]}/spells/{ctx['deleted_links'][n][1]}", {}), 'status': 204 },
+        { 'name': 'DELETE /monsters/:id', 'setup': setup_deleted_monsters, 'request': lambda ctx, n: ('DELETE', f"/monsters/{ctx['deleted_monster_ids'][n]}", {}), 'status': 204 },
+        { 'name': 'DELETE /spells/:id', 'setup': setup_deleted_spells, 'request': lambda ctx, n: ('DELETE', f"/spells/{ctx['deleted_spell_ids'][n]}", {}), 'status': 204 },
+    ]
+    return reads + nested_reads + writes + nested_writes + deletes + nested_deletes
+
+
+# benchmark_context ##########
+# params: generator:CatalogGenerator, repeat:int
+# return dict of ids and names the scenarios pick from
+# ############################
+def benchmark_context(generator, repeat):
+    monsters = sample_rows([ Monster.id, Monster.name ], repeat)
+    spells = sample_rows([ Spell.id, Spell.name ], repeat)
+    return {
+        'generator': generator,
+        'monster_ids': [ id for id, _ in monsters ],
+        'monster_names': [ name for _, name in monsters ],
+        'spell_ids': [ id for id, _ in spells ],
+        'spell_names': [ name for _, name in spells ],
+    }
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# ############################################
+# compares SerializerMixin.to_dict with the
+# compiled serializers on fully loaded monsters
+#
+# cd server
+# python -m benchmarks.serializer_benchmark --monsters 200 --repeat 5
+# ############################################
+
+import argparse
+import timeit
+
+from create_app import create_app
+from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell
+from loaders import monster_loader_options
+from serializers import serialize
+from testing.test_monsters import MONSTER_TWO
+
+
+def build_catalog(monster_count):
+    spells = [ Spell(name=f"Spell {n}", school="evocation", level=n % 10, description="A bolt of light") for n in range(20) ]
+    db.session.add_all(spells)
+    for n in range(monster_count):
+        m = Monster(**MONSTER_TWO)
+        db.session.add_all([
+            m,
+            Skill(name='history', value=2, monster=m),
+            Skill(name='arcana', value=4, monster=m),
+            SavingThrow(name='dex', value=2, monster=m),
+            SpecialAbility(name='Amphibious', description='Breathes air and water', monster=m),
+            Sense(name='darkvision', distance=60, monster=m),
+            Speed(name='walk', distance=30, monster=m),
+            Speed(name='fly', distance=60, monster=m),
+            Language(name='common', monster=m),
+            Language(name='draconic', monster=m),
+            DamageResistance(damage_type='fire', monster=m),
+            DamageImmunity(damage_type='poison', monster=m),
+            DamageVulnerability(damage_type='cold', monster=m),
+            ConditionImmunity(condition_type='prone', monster=m),
+            Action(name='Bite', description='Melee Weapon Attack: +4 to hit', monster=m),
+            Action(name='Claw', description='Melee Weapon Attack: +4 to hit', monster=m),
+            *[ MonsterSpell(monster=m, spell=spells[(n + k) % len(spells)]) for k in range(5) ],
+        ])
+    db.session.commit()
+
+
+def run(monster_count, repeat):
+    app = create_app('TESTING')
+    with app.app_context():
+        db.create_all()
+        build_catalog(monster_count)
+
+        monsters = Monster.query.options(*monster_loader_options()).all()
+        assert [ serialize(m) for m in monsters ] == [ m.to_dict() for m in monsters ]
+
+        to_dict_time = min(timeit.repeat(lambda: [ m.to_dict() for m in monsters ], number=1, repeat=repeat))
+        compiled_time = min(timeit.repeat(lambda: [ serialize(m) for m in monsters ], number=1, repeat=repeat))
+
+        db.session.remove()
+        db.drop_all()
+
+    print(f"monsters: {monster_count}")
+    print(f"to_dict:   {to_dict_time * 1000:.2f} ms ({to_dict_time / monster_count * 1e6:.1f} us per monster)")
+    print(f"compiled:  {compiled_time * 1000:.2f} ms ({compiled_time / monster_count * 1e6:.1f} us per monster)")
+    print(f"speedup:   {to_dict_time / compiled_time:.1f}x")
+    return { 'monsters': monster_count, 'to_dict': to_dict_time, 'compiled': compiled_time }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare to_dict with the compiled serializers")
+    parser.add_argument('--monsters', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.monsters, args.repeat)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+# ############################################
+# GET throughput of concurrent worker processes
+# sharing one sqlite file, with the sqlite defaults
+# (rollback journal) and with SQLITE_PRAGMAS (WAL),
+# while one more process keeps writing
+#
+# cd server
+# python -m benchmarks.sqlite_concurrency_benchmark --workers 1,2,4,8 --seconds 3
+# ############################################
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from create_app import create_app
+from config import sqlite_pragmas
+from models import db
+from benchmarks.serializer_benchmark import build_catalog
+
+MODES = { 'default': {}, 'tuned': sqlite_pragmas() or { 'journal_mode': 'WAL' } }
+
+
+def build_database(path, monster_count, pragmas):
+    app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}", 'SQLITE_PRAGMAS': pragmas })
+    with app.app_context():
+        db.create_all()
+        build_catalog(monster_count)
+        if not pragmas:
+            db.session.execute(text("PRAGMA journal_mode=DELETE"))
+        db.session.remove()
+        db.engine.dispose()
+
+
+# run_client ##########
+# params: path:str, pragmas:dict, seconds:float,
+# monster_count:int, write:bool, results:Queue
+#
+# one worker process, sends GETs (or PATCHes when
+# write) until the time is up
+# #####################
+def run_client(path, pragmas, seconds, monster_count, write, results):
+    app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}", 'SQLITE_PRAGMAS': pragmas, 'QUERY_BUDGET_ENABLED': False })
+    client = app.test_client()
+    done = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if write:
+                res = client.patch(f"/spells/{random.randint(1, 20)}", json={ 'level': random.randint(0, 9) })
+            elif done % 2:
+                res = client.get(f"/monsters/{random.randint(1, monster_count)}")
+            else:
+                res = client.get(f"/spells?page={random.randint(1, 2)}")
+            if res.status_code < 400:
+                done += 1
+            else:
+                errors += 1
+        except OperationalError:
+            # "database is locked"
+            errors += 1
+            with app.app_context():
+                db.session.rollback()
+    results.put((write, done, errors))
+
+
+def run_mode(path, pragmas, workers, seconds, monster_count, writer):
+    results = multiprocessing.Queue()
+    clients = [ (False, n) for n in range(workers) ] + ([ (True, workers) ] if writer else [])
+    processes = [ multiprocessing.Process(target=run_client, args=(path, pragmas, seconds, monster_count, write, results)) for write, _ in clients ]
+    for process in processes:
+        process.start()
+    counts = [ results.get() for _ in processes ]
+    for process in processes:
+        process.join()
+
+    reads = [ c for c in counts if not c[0] ]
+    writes = [ c for c in counts if c[0] ]
+    return {
+        'reads_per_second': sum( c[1] for c in reads ) / seconds,
+        'read_errors': sum( c[2] for c in reads ),
+        'writes_per_second': sum( c[1] for c in writes ) / seconds,
+        'write_errors': sum( c[2] for c in writes ),
+    }
+
+
+def run(worker_counts, seconds, monster_count, writer):
+    directory = tempfile.mkdtemp()
+    rows = []
+    for mode, pragmas in MODES.items():
+        path = os.path.join(directory, f"{mode}.db")
+        build_database(path, monster_count, pragmas)
+        for workers in worker_counts:
+            result = run_mode(path, pragmas, workers, seconds, monster_count, writer)
+            rows.append({ 'mode': mode, 'workers': workers, **result })
+
+    print(f"monsters: {monster_count}, {seconds}s per run, {'one writer' if writer else 'no writer'}")
+    print(f"{'mode':<8} {'workers':>7} {'reads/sec':>10} {'per worker':>10} {'read errors':>11} {'writes/sec':>10} {'write errors':>12}")
+    for row in rows:
+        print(f"{row['mode']:<8} {row['workers']:>7} {row['reads_per_second']:>10.0f} {row['reads_per_second'] / row['workers']:>10.0f} {row['read_errors']:>11} {row['writes_per_second']:>10.0f} {row['write_errors']:>12}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare concurrent sqlite reads with and without SQLITE_PRAGMAS")
+    parser.add_argument('--workers', default='1,2,4,8', help="comma separated reader process counts")
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--monsters', type=int, default=200)
+    parser.add_argument('--no-writer', dest='writer', action='store_false', help="only run readers")
+    args = parser.parse_args()
+    run([ int(n) for n in args.workers.split(',') ], args.seconds, args.monsters, args.writer)
@@ -0,0 +1,174 @@
+import json
+from sqlalchemy import insert
+from models import db, Monster, MonsterSpell
+from helpers import NESTED_MONSTER_DATA, find_spell_ids_by_name
+from conditional import VERSION_COLUMNS, record_bulk_insert
+
+# ----------- BULK MONSTER CREATION ----------- #
+#
+# Every item is validated up front by building
+# transient model instances, so the @validates rules
+# of the models run exactly like they do for
+# POST /monsters, without touching the database.
+#
+# The valid items are then written with one
+# executemany insert for the monsters (returning
+# their ids in order), one per child table and one
+# for monster_spells, all in a single transaction.
+# ############################################
+
+BULK_MAX_ITEMS = 5000
+
+
+# parse_bulk_items ##########
+# params: body:str, content_type:str
+# return list[dict | Exception]
+#
+# accepts a json array or newline delimited json.
+# an ndjson line that is not valid json becomes an
+# error for that item only
+# ###########################
+def parse_bulk_items(body, content_type):
+    if content_type and 'ndjson' in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"invalid json: {e}"))
+        return items
+
+    items = json.loads(body)
+    if not isinstance(items, list):
+        raise ValueError("body must be a json array or ndjson")
+    return items
+
+
+# row_from_instance ##########
+# params: instance:db.Model
+# return dict of column values
+#
+# every insertable column is present, unset columns
+# take their column default, so all rows of a model
+# share the same keys for executemany
+# ############################
+def row_from_instance(instance):
+    row = {}
+    for column in instance.__table__.columns:
+        if column.primary_key:
+            continue
+        if column.key in instance.__dict__:
+            row[column.key] = instance.__dict__[column.key]
+        elif column.default is not None and column.default.is_scalar:
+            row[column.key] = column.default.arg
+        elif column.default is not None and column.default.is_callable:
+            row[column.key] = column.default.arg(None)
+        else:
+            row[column.key] = None
+    return row
+
+
+# missing_required_columns ##########
+# params: model:class, row:dict
+# return list[str]
+# ###################################
+def missing_required_columns(model, row):
+    return [
+        c.key for c in model.__table__.columns
+        if not c.nullable and not c.primary_key and c.server_default is None and row.get(c.key) is None
+    ]
+
+
+# build_transient ##########
+# params: model:class, data:dict, attributes:list[str]
+# return dict row
+#
+# raises ValueError for anything the model rejects
+# ##########################
+def build_transient(model, data, attributes):
+    if not isinstance(data, dict):
+        raise ValueError(f"{model.__tablename__} items must be objects but got {data}")
+    try:
+        instance = model(**{ k: v for k, v in data.items() if k in attributes })
+    except (TypeError, AttributeError) as e:
+        raise ValueError(f"invalid {model.__tablename__} value: {e}")
+    row = row_from_instance(instance)
+    missing = [ c for c in missing_required_columns(model, row) if c != 'monster_id' ]
+    if missing:
+        raise ValueError(f"{model.__tablename__} requires {', '.join(missing)}")
+    return row
+
+
+# prepare_bulk_monster ##########
+# params: item:dict
+# return { monster:dict, children:dict[model, list[dict]], spells:list[str] }
+#
+# raises ValueError when the item or any nested
+# resource is invalid
+# ###############################
+def prepare_bulk_monster(item):
+    if isinstance(item, Exception):
+        raise item
+    if not isinstance(item, dict):
+        raise ValueError(f"each monster must be an object but got {item}")
+
+    monster_attributes = [ k for k in Monster.__table__.columns.keys() if k not in ['id', *VERSION_COLUMNS] ]
+    prepared = { 'monster': build_transient(Monster, item, monster_attributes), 'children': {}, 'spells': [] }
+
+    for key, (model, attributes, _) in NESTED_MONSTER_DATA.items():
+        nested = item.get(key) or []
+        if not isinstance(nested, list):
+            raise ValueError(f"{key} must be a list")
+        prepared['children'][model] = [ build_transient(model, data, attributes) for data in nested ]
+
+    spells = item.get('spells') or []
+    if not isinstance(spells, list) or not all( isinstance(s, str) for s in spells ):
+        raise ValueError("spells must be a list of spell names")
+    prepared['spells'] = spells
+
+    return prepared
+
+
+# insert_bulk_monsters ##########
+# params: prepared:list[dict] from prepare_bulk_monster
+# return list[{ id:int, missing_spells:list[str] }]
+#
+# does not commit
+# ###############################
+def insert_bulk_monsters(prepared):
+    if not prepared:
+        return []
+
+    ids = db.session.execute(
+        insert(Monster).returning(Monster.id, sort_by_parameter_order=True),
+        [ p['monster'] for p in prepared ]
+    ).scalars().all()
+    # the nested rows below only belong to these new monsters
+    record_bulk_insert(db.session, Monster, [])
+
+    for model, _, _ in NESTED_MONSTER_DATA.values():
+        rows = [ { **row, 'monster_id': id } for p, id in zip(prepared, ids) for row in p['children'][model] ]
+        if rows:
+            db.session.execute(insert(model), rows)
+
+    spell_ids = find_spell_ids_by_name([ name for p in prepared for name in p['spells'] ])
+    results = []
+    join_rows = []
+    for p, id in zip(prepared, ids):
+        linked = set()
+        missing = []
+        for name in p['spells']:
+            spell_id = spell_ids.get(name.lower())
+            if spell_id is None:
+                missing.append(name)
+            elif spell_id not in linked:
+                linked.add(spell_id)
+                join_rows.append({ 'monster_id': id, 'spell_id': spell_id })
+        results.append({ 'id': id, 'missing_spells': missing })
+
+    if join_rows:
+        db.session.execute(insert(MonsterSpell), join_rows)
+
+    return results
@@ -0,0 +1,4 @@
+from .normalize import normalize_monster
+from .pipeline import run_import, format_import_stats, IMPORT_BATCH_SIZE
+from .snapshot import write_snapshot, read_snapshot_header, restore_snapshot, SNAPSHOT_VERSION
+from .cli import catalog_cli, import_catalog
@@ -0,0 +1,112 @@
+import os
+import click
+from datetime import datetime
+from flask.cli import AppGroup
+from .pipeline import run_import, format_import_stats, IMPORT_BATCH_SIZE
+from .streams import is_stream_source
+from .snapshot import write_snapshot, restore_snapshot, SNAPSHOT_BATCH_SIZE
+
+# ----------- CATALOG COMMANDS ----------- #
+#
+# flask catalog import [--spells PATH] [--monsters PATH]
+#     [--workers N] [--batch-size N] [--incremental]
+#     [--dry-run] [--log FILE]
+# flask catalog snapshot PATH [--batch-size N]
+# flask catalog restore PATH
+# ########################################
+
+catalog_cli = AppGroup('catalog', help="Import, snapshot and restore spells and monsters.")
+
+
+# print_progress ##########
+# one line per entity, rewritten after every batch.
+# the total of a streamed file is not known
+# #########################
+def print_progress(entity, done, total, seconds, finished):
+    rate = done / seconds if seconds else 0
+    count = f"{done}/{total} files" if total is not None else f"{done} records"
+    click.echo(f"\r{entity}s: {count} ({rate:.1f}/sec)", nl=finished, err=True)
+
+
+# write_import_log ##########
+# params: path:str, stats:dict, started_at:datetime
+# #########################
+def write_import_log(path, stats, started_at):
+    with open(path, 'a') as log_file:
+        log_file.write(f"\n\n------Starting new attempt at {started_at}------\n\n")
+        for number, (entity, error) in enumerate(stats['errors'], start=1):
+            log_file.write(f"Error {number}: {entity or 'unknown'}\n    {error}\n\n")
+        if stats['errors']:
+            log_file.write(f"\nError files: {' '.join( os.path.basename(entity) for entity, _ in stats['errors'] )}")
+        log_file.write(''.join( f"\n{line}" for line in format_import_stats(stats) ))
+        log_file.write(f"\n\n------Ending attempt at {datetime.now()}------\n\n")
+
+
+# import_catalog ##########
+# params: spells_path:str, monsters_path:str, workers:int,
+# batch_size:int, incremental:bool, dry_run:bool,
+# log_path:str | None
+# return stats:dict
+#
+# runs the import and prints the summary, needs an
+# app context
+# #########################
+def import_catalog(spells_path, monsters_path, workers=os.cpu_count(), batch_size=IMPORT_BATCH_SIZE, incremental=False, dry_run=False, log_path=None):
+    started_at = datetime.now()
+    if dry_run:
+        click.echo("Dry run, parsing and validating without writing")
+    elif incremental:
+        click.echo(f"Importing changed files from {spells_path} and {monsters_path}")
+    else:
+        click.echo(f"Replacing spells and monsters with {spells_path} and {monsters_path}")
+
+    stats = run_import(spells_path, monsters_path, workers=workers, batch_size=batch_size, incremental=incremental, dry_run=dry_run, progress=print_progress)
+
+    for path, error in stats['errors']:
+        click.echo(f"Error: {path}\n    {error}", err=True)
+    for line in format_import_stats(stats):
+        click.echo(line)
+    if log_path:
+        write_import_log(log_path, stats, started_at)
+    return stats
+
+
+@catalog_cli.command('import')
+@click.option('--spells', 'spells_path', default='./beyond_json_data/spells', show_default=True, type=click.Path(exists=True), help="Directory of spell json files, or one .json array, .ndjson or .zip file.")
+@click.option('--monsters', 'monsters_path', default='./beyond_json_data/monsters', show_default=True, type=click.Path(exists=True), help="Directory of monster json files, or one .json array, .ndjson or .zip file.")
+@click.option('--workers', default=os.cpu_count(), show_default=True, type=click.IntRange(min=1), help="Processes parsing files, 1 parses in this process.")
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True, type=click.IntRange(min=1), help="Files written per batch.")
+@click.option('--incremental', is_flag=True, help="Only import files added or changed since the last import.")
+@click.option('--dry-run', is_flag=True, help="Parse and validate every file without writing.")
+@click.option('--log', 'log_path', type=click.Path(dir_okay=False), help="Append errors and the summary to this file.")
+def import_command(spells_path, monsters_path, workers, batch_size, incremental, dry_run, log_path):
+    """ Import spells and monsters from json files. """
+    if incremental and (is_stream_source(spells_path) or is_stream_source(monsters_path)):
+        raise click.UsageError("--incremental needs directories of json files, not single files")
+    stats = import_catalog(spells_path, monsters_path, workers, batch_size, incremental, dry_run, log_path)
+    if stats['errors']:
+        raise SystemExit(1)
+
+
+@catalog_cli.command('snapshot')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--batch-size', default=SNAPSHOT_BATCH_SIZE, show_default=True, type=click.IntRange(min=1), help="Rows per column batch.")
+def snapshot_command(path, batch_size):
+    """ Write every catalog table to one compressed snapshot file. """
+    header = write_snapshot(path, batch_size)
+    for table, info in header['tables'].items():
+        click.echo(f"{table}: {info['rows']}")
+    click.echo(f"Wrote snapshot version {header['version']} to {path} ({os.path.getsize(path)} bytes)")
+
+
+@catalog_cli.command('restore')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def restore_command(path):
+    """ Replace every catalog table with a snapshot file. """
+    try:
+        restored = restore_snapshot(path)
+    except ValueError as e:
+        raise click.ClickException(f"{e}")
+    for table, rows in restored.items():
+        click.echo(f"{table}: {rows}")
+    click.echo(f"Restored {sum(restored.values())} rows from {path}")
@@ -0,0 +1,162 @@
+import re
+
+# ----------- NORMALIZATION ----------- #
+#
+# Turns one scraped monster json (the files under
+# beyond_json_data/monsters) into the body POST
+# /monsters accepts. Pure functions of their input,
+# so they can run in worker processes.
+# #####################################
+
+CHALLENGE_RATING_FRACTIONS = { '1/8': 0.125, '1/4': 0.25, '1/2': 0.5 }
+
+SPELL_SLOT_COLUMNS = {
+    '1': 'spell_slots_first_level',
+    '2': 'spell_slots_second_level',
+    '3': 'spell_slots_third_level',
+    '4': 'spell_slots_fourth_level',
+    '5': 'spell_slots_fifth_level',
+    '6': 'spell_slots_sixth_level',
+    '7': 'spell_slots_seventh_level',
+    '8': 'spell_slots_eighth_level',
+    '9': 'spell_slots_ninth_level',
+}
+
+SPELLCASTING_ABILITY_PATTERNS = [
+    re.compile(r"spellcasting ability is (\w+)", re.IGNORECASE),
+    re.compile(r"(\w+) as the spellcasting ability", re.IGNORECASE),
+]
+
+# multi word skills are joined before splitting
+# "Skill: Animal Handling +2" on spaces
+MULTI_WORD_SKILLS = { 'Animal Handling': 'Animal_Handling', 'Sleight of Hand': 'Sleight_of_Hand' }
+
+
+# normalize_challenge_rating ##########
+# params: value:str | int | float | None,
+# example "1/4" or "9"
+# return int | float
+# #####################################
+def normalize_challenge_rating(value):
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return value
+    if value in CHALLENGE_RATING_FRACTIONS:
+        return CHALLENGE_RATING_FRACTIONS[value]
+    return float(value)
+
+
+# normalize_distance ##########
+# params: value:str | int, example "30 ft."
+# return int
+# #############################
+def normalize_distance(value):
+    if isinstance(value, int):
+        return value
+    match = re.search(r"\d+", f"{value}")
+    if not match:
+        raise ValueError(f"distance must be a number of feet but got {value}")
+    return int(match.group())
+
+
+# normalize_proficiencies ##########
+# params: proficiencies:str, example
+# "Saving Throw: INT +8 | Skill: Arcana +8"
+# return skills:list[dict], saving_throws:list[dict]
+# ##################################
+def normalize_proficiencies(proficiencies):
+    skills = []
+    saving_throws = []
+    for prof in proficiencies.split('|'):
+        if "Saving Throw:" in prof:
+            name, value = prof.replace('Saving Throw:', '').strip().split()[:2]
+            saving_throws.append({ 'name': name, 'value': int(value) })
+        if "Skill:" in prof:
+            prof = prof.replace('Skill:', '')
+            for words, joined in MULTI_WORD_SKILLS.items():
+                prof = prof.replace(words, joined)
+            name, value = prof.strip().split()[:2]
+            skills.append({ 'name': name.replace('_', ' '), 'value': int(value) })
+    return skills, saving_throws
+
+
+# normalize_senses ##########
+# params: senses:str, example
+# "Darkvision 60 ft. | Passive Perception 11"
+# return senses:list[dict], passive_perception:int | None
+# ###########################
+def normalize_senses(senses):
+    normalized = []
+    passive_perception = None
+    for sense in senses.split('|'):
+        if "passive perception" in sense.lower():
+            passive_perception = int(sense.strip().split(" ")[-1])
+        elif sense.strip():
+            name, distance = sense.lower().strip().replace("ft.", "").split()[:2]
+            normalized.append({ 'name': name, 'distance': int(distance) })
+    return normalized, passive_perception
+
+
+# find_spellcasting_ability ##########
+# params: descriptions:list[str]
+# return str | None, the last one mentioned
+# ####################################
+def find_spellcasting_ability(descriptions):
+    ability = None
+    for description in descriptions:
+        for pattern in SPELLCASTING_ABILITY_PATTERNS:
+            match = pattern.search(description)
+            if match:
+                ability = match.group(1)
+    return ability
+
+
+# normalize_monster ##########
+# params: monster_json:dict
+# return dict shaped like the POST /monsters body
+#
+# raises ValueError, KeyError or TypeError for a
+# file that cannot be read as a monster
+# ############################
+def normalize_monster(monster_json):
+    monster = dict(monster_json)
+
+    monster['category'] = monster_json.get('type').replace(",", "")
+    monster['sub_category'] = monster_json.get('subtype')
+    hit_dice_count, hit_dice_size = monster_json.get('hit_dice').strip().split('d')
+    monster['hit_dice_count'] = int(hit_dice_count)
+    monster['hit_dice_size'] = int(hit_dice_size)
+    monster['challenge_rating'] = normalize_challenge_rating(monster_json.get('challenge_rating'))
+    if monster_json.get('spell_dc'):
+        monster['spell_save_dc'] = monster_json['spell_dc']
+
+    monster['skills'], monster['saving_throws'] = normalize_proficiencies(monster_json.get('proficiencies') or '')
+
+    monster['languages'] = [ { 'name': language } for language in (monster_json.get('languages') or '').split(', ') if language and language != '--' ]
+
+    monster['senses'], passive_perception = normalize_senses(monster_json.get('senses') or '')
+    if passive_perception is not None:
+        monster['passive_perception'] = passive_perception
+
+    monster['special_abilities'] = [ { 'name': sa['name'], 'description': sa['desc'] } for sa in monster_json.get('special_abilities') or [] ]
+    monster['actions'] = [ { 'name': act['name'], 'description': act['desc'] } for act in monster_json.get('actions') or [] ]
+    monster['actions'] += [ { 'name': act['name'], 'description': act['desc'], 'reaction': True } for act in monster_json.get('reactions') or [] ]
+    ability = find_spellcasting_ability([ item['description'] for item in monster['special_abilities'] + monster['actions'] ])
+    if ability:
+        monster['spellcasting_ability'] = ability
+
+    monster['damage_resistances'] = [ { 'damage_type': dr } for dr in monster_json.get('damage_resistances') or [] ]
+    monster['damage_immunities'] = [ { 'damage_type': di } for di in monster_json.get('damage_immunities') or [] ]
+    monster['damage_vulnerabilities'] = [ { 'damage_type': dv } for dv in monster_json.get('damage_vulnerabilities') or [] ]
+    monster['condition_immunities'] = [ { 'condition_type': ci } for ci in monster_json.get('condition_immunities') or [] ]
+
+    monster['speeds'] = [ { 'name': name, 'distance': normalize_distance(distance) } for name, distance in (monster_json.get('speed') or {}).items() ]
+
+    for level, slots in (monster_json.get('spell_slots') or {}).items():
+        if level in SPELL_SLOT_COLUMNS:
+            monster[SPELL_SLOT_COLUMNS[level]] = slots
+
+    monster['spells'] = [ spell['name'] for spell in monster_json.get('spells') or [] ]
+    return monster
+
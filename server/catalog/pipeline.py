@@ -0,0 +1,442 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import insert, update, delete, select
+from models import db, utc_now, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell, CatalogFile
+from conditional import VERSION_COLUMNS
+from bulk import build_transient, prepare_bulk_monster, insert_bulk_monsters
+from .normalize import normalize_monster
+from .streams import iter_records, is_stream_source
+
+# ----------- IMPORT PIPELINE ----------- #
+#
+# Files, or the records of one large file, are
+# normalized and validated by a pool of worker
+# processes, which send back plain rows.
+# The parent process is the only writer: it inserts
+# the rows in batches of batch_size with one
+# executemany per table, spells first so monsters can
+# link them by name, and commits once at the end.
+#
+# catalog_files_table keeps the content hash of every
+# file and the row it became. An incremental import
+# only parses added and changed files, rewrites their
+# rows in place (same id, next version) and deletes
+# the rows of files that are gone. Everything happens
+# in one transaction, readers keep seeing the old
+# catalog until the commit.
+# #######################################
+
+IMPORT_BATCH_SIZE = 500
+
+MONSTER_CHILD_TABLES = [ MonsterSpell, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action ]
+
+# children before parents
+IMPORT_TABLES = [ *MONSTER_CHILD_TABLES, Monster, Spell ]
+
+SPELL_ATTRIBUTES = [ k for k in Spell.__table__.columns.keys() if k not in ['id', *VERSION_COLUMNS] ]
+
+
+# list_json_files ##########
+# params: directory:str
+# return list[str] sorted paths
+# ##########################
+def list_json_files(directory):
+    return sorted( os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.json') )
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# load_item ##########
+# params: item:str path | (label:str, record)
+# return (label, record)
+# ####################
+def load_item(item):
+    if isinstance(item, str):
+        with open(item) as json_file:
+            return item, json.load(json_file)
+    label, record = item
+    if isinstance(record, Exception):
+        raise record
+    return label, record
+
+
+def item_label(item):
+    return item if isinstance(item, str) else item[0]
+
+
+# parse_spell ##########
+# params: item:str path | (label:str, record)
+# return (label, row:dict | None, error:str | None)
+#
+# runs in a worker process
+# ######################
+def parse_spell(item):
+    try:
+        label, record = load_item(item)
+        return label, build_transient(Spell, record, SPELL_ATTRIBUTES), None
+    except Exception as e:
+        return item_label(item), None, repr(e)
+
+
+# parse_monster ##########
+# params: item:str path | (label:str, record)
+# return (label, prepared:dict | None, error:str | None)
+#
+# prepared is shaped like bulk.prepare_bulk_monster.
+# runs in a worker process
+# ########################
+def parse_monster(item):
+    try:
+        label, record = load_item(item)
+        return label, prepare_bulk_monster(normalize_monster(record)), None
+    except Exception as e:
+        return item_label(item), None, repr(e)
+
+
+# parse_batches ##########
+# params: parse:function, items:iterable, workers:int,
+# batch_size:int
+# return generator of list[parse result], in item order
+#
+# items are consumed one batch at a time so a stream
+# is never read ahead by more than the next batch,
+# which the pool parses while the current one is
+# written. workers <= 1 parses in this process
+# ########################
+def parse_batches(parse, items, workers, batch_size):
+    if workers <= 1:
+        for batch in batched(items, batch_size):
+            yield [ parse(item) for item in batch ]
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = None
+        for batch in batched(items, batch_size):
+            # map submits the whole batch right away
+            results = executor.map(parse, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            if pending is not None:
+                yield list(pending)
+            pending = results
+        if pending is not None:
+            yield list(pending)
+
+
+# batched ##########
+# params: iterable, size:int
+# return generator of list
+# ##################
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ----------- MANIFEST ----------- #
+
+# plan_files ##########
+# params: entity:str, directory:str, model:class,
+# incremental:bool
+# return { parse:list[str], hashes:dict, relative:dict,
+# manifest:dict, vanished:list[CatalogFile],
+# unchanged:list[CatalogFile] }
+#
+# parse holds the added and changed files, manifest
+# the existing CatalogFile of every changed one. a
+# file whose row was deleted through the api since
+# counts as added. without incremental every file
+# counts as added. a single file source streams its
+# records and is not kept in the manifest
+# #####################
+def plan_files(entity, directory, model, incremental):
+    if is_stream_source(directory):
+        return { 'parse': iter_records(directory), 'total': None, 'stream': True, 'manifest': {}, 'unchanged': [], 'vanished': [] }
+
+    manifest = { f.path: f for f in CatalogFile.query.where(CatalogFile.entity == entity) } if incremental else {}
+    existing = set(db.session.execute(select(model.id).where(model.id.in_([ f.entity_id for f in manifest.values() ]))).scalars())
+    hashes = { path: file_hash(path) for path in list_json_files(directory) }
+    relative = { path: os.path.relpath(path, directory) for path in hashes }
+
+    plan = { 'parse': [], 'stream': False, 'hashes': hashes, 'relative': relative, 'manifest': {}, 'unchanged': [], 'vanished': [] }
+    for path, content_hash in hashes.items():
+        known = manifest.pop(relative[path], None)
+        if known and known.entity_id not in existing:
+            db.session.delete(known)
+            known = None
+        if known and known.content_hash == content_hash:
+            plan['unchanged'].append(known)
+        else:
+            plan['parse'].append(path)
+            if known:
+                plan['manifest'][path] = known
+    plan['vanished'] = list(manifest.values())
+    plan['total'] = len(plan['parse'])
+    db.session.flush()
+    return plan
+
+
+# record_files ##########
+# params: entity:str, plan:dict, written:list[(path, id)]
+# #######################
+def record_files(entity, plan, written):
+    if plan['stream']:
+        return
+    rows = []
+    for path, id in written:
+        known = plan['manifest'].get(path)
+        if known:
+            known.content_hash = plan['hashes'][path]
+        else:
+            rows.append({ 'entity': entity, 'path': plan['relative'][path], 'content_hash': plan['hashes'][path], 'entity_id': id })
+    if rows:
+        db.session.execute(insert(CatalogFile), rows)
+
+
+def next_versions(model, ids):
+    return dict(db.session.execute(select(model.id, model.version + 1).where(model.id.in_(ids))).all())
+
+
+# bump_monsters_knowing ##########
+# params: spell_ids:list[int]
+#
+# monsters embed their spells, see conditional.py
+# ################################
+def bump_monsters_knowing(spell_ids):
+    db.session.execute(
+        update(Monster)
+        .where(Monster.id.in_(select(MonsterSpell.monster_id).where(MonsterSpell.spell_id.in_(spell_ids))))
+        .values(version=Monster.version + 1, updated_at=utc_now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_monster_rows(ids):
+    for model in MONSTER_CHILD_TABLES:
+        db.session.execute(delete(model).where(model.monster_id.in_(ids)))
+    db.session.execute(delete(Monster).where(Monster.id.in_(ids)))
+
+
+def delete_spell_rows(ids):
+    bump_monsters_knowing(ids)
+    db.session.execute(delete(MonsterSpell).where(MonsterSpell.spell_id.in_(ids)))
+    db.session.execute(delete(Spell).where(Spell.id.in_(ids)))
+
+
+# ----------- WRITER ----------- #
+
+def new_import_stats():
+    return { 'files': 0, 'unchanged': 0, 'deleted': 0, 'errors': [], 'duplicates': [], 'rows': { model.__tablename__: 0 for model in IMPORT_TABLES }, 'parse_seconds': 0.0, 'insert_seconds': 0.0, 'total_seconds': 0.0 }
+
+
+# unique_by_name ##########
+# params: results:list[parse result], seen:set[str],
+# name:function, stats:dict
+# return list[(path, value)]
+#
+# the first file wins when two share a name,
+# failed files are recorded as errors
+# #########################
+def unique_by_name(results, seen, name, stats):
+    unique = []
+    for path, value, error in results:
+        stats['files'] += 1
+        if error:
+            stats['errors'].append((path, error))
+        elif name(value).lower() in seen:
+            stats['duplicates'].append(path)
+        else:
+            seen.add(name(value).lower())
+            unique.append((path, value))
+    return unique
+
+
+# write_spells ##########
+# params: parsed:list[(path, row)], plan:dict, stats:dict
+# return list[(path, id)]
+#
+# changed spells are updated in place so the
+# monsters that know them keep their links
+# #######################
+def write_spells(parsed, plan, stats):
+    written = []
+    changed = [ (path, row) for path, row in parsed if path in plan['manifest'] ]
+    added = [ (path, row) for path, row in parsed if path not in plan['manifest'] ]
+
+    if changed:
+        ids = [ plan['manifest'][path].entity_id for path, _ in changed ]
+        versions = next_versions(Spell, ids)
+        db.session.execute(update(Spell), [ { **row, 'id': id, 'version': versions.get(id, 1), 'updated_at': utc_now() } for (_, row), id in zip(changed, ids) ])
+        bump_monsters_knowing(ids)
+        written += [ (path, id) for (path, _), id in zip(changed, ids) ]
+
+    if added:
+        ids = db.session.execute(
+            insert(Spell).returning(Spell.id, sort_by_parameter_order=True),
+            [ row for _, row in added ]
+        ).scalars().all()
+        written += [ (path, id) for (path, _), id in zip(added, ids) ]
+
+    stats['rows'][Spell.__tablename__] += len(parsed)
+    return written
+
+
+# write_monsters ##########
+# params: parsed:list[(path, prepared)], plan:dict, stats:dict
+# return list[(path, id)]
+#
+# changed monsters are rewritten with their old id
+# and the next version
+# #########################
+def write_monsters(parsed, plan, stats):
+    written = []
+    changed = [ (path, p) for path, p in parsed if path in plan['manifest'] ]
+    added = [ (path, p) for path, p in parsed if path not in plan['manifest'] ]
+
+    if changed:
+        ids = [ plan['manifest'][path].entity_id for path, _ in changed ]
+        versions = next_versions(Monster, ids)
+        delete_monster_rows(ids)
+        for (_, p), id in zip(changed, ids):
+            p['monster'] = { **p['monster'], 'id': id, 'version': versions.get(id, 1) }
+
+    for group in [changed, added]:
+        if not group:
+            continue
+        results = insert_bulk_monsters([ p for _, p in group ])
+        written += [ (path, result['id']) for (path, _), result in zip(group, results) ]
+        for (_, p), result in zip(group, results):
+            for model, rows in p['children'].items():
+                stats['rows'][model.__tablename__] += len(rows)
+            # every name found links one spell, once
+            linked = { n.lower() for n in p['spells'] } - { n.lower() for n in result['missing_spells'] }
+            stats['rows'][MonsterSpell.__tablename__] += len(linked)
+
+    stats['rows'][Monster.__tablename__] += len(parsed)
+    return written
+
+
+# count_rows ##########
+# params: parsed:list[(path, value)], plan:dict, stats:dict
+# return []
+#
+# the writer of a dry run, monster_spells counts the
+# spell names asked for since nothing is looked up
+# ######################
+def count_rows(parsed, plan, stats):
+    for _, value in parsed:
+        if 'monster' not in value:
+            stats['rows'][Spell.__tablename__] += 1
+            continue
+        stats['rows'][Monster.__tablename__] += 1
+        for model, rows in value['children'].items():
+            stats['rows'][model.__tablename__] += len(rows)
+        stats['rows'][MonsterSpell.__tablename__] += len({ n.lower() for n in value['spells'] })
+    return []
+
+
+# import_entity ##########
+# params: entity:str, directory:str, parse:function,
+# write:function, delete_rows:function, model:class,
+# options:dict, stats:dict
+#
+# insert_seconds is the time spent writing, the rest
+# of the elapsed time is spent hashing and waiting on
+# the parsers
+# ########################
+def import_entity(entity, directory, parse, write, delete_rows, model, options, stats):
+    started = time.perf_counter()
+    plan = plan_files(entity, directory, model, options['incremental'])
+    stats['unchanged'] += len(plan['unchanged'])
+    if options['dry_run']:
+        write = count_rows
+
+    write_started = time.perf_counter()
+    if plan['vanished'] and not options['dry_run']:
+        delete_rows([ f.entity_id for f in plan['vanished'] ])
+        for f in plan['vanished']:
+            db.session.delete(f)
+    stats['deleted'] += len(plan['vanished'])
+    stats['insert_seconds'] += time.perf_counter() - write_started
+
+    # names of the rows this import keeps as they are
+    kept = [ f.entity_id for f in plan['unchanged'] ]
+    seen = set(db.session.execute(select(db.func.lower(model.name)).where(model.id.in_(kept))).scalars()) if kept else set()
+
+    name = (lambda row: row['name']) if model is Spell else (lambda p: p['monster']['name'])
+    done = 0
+    for results in parse_batches(parse, plan['parse'], options['workers'], options['batch_size']):
+        parsed = unique_by_name(results, seen, name, stats)
+        write_started = time.perf_counter()
+        written = write(parsed, plan, stats)
+        if not options['dry_run']:
+            record_files(entity, plan, written)
+        stats['insert_seconds'] += time.perf_counter() - write_started
+        done += len(results)
+        if options['progress']:
+            options['progress'](entity, done, plan['total'], time.perf_counter() - started, False)
+    if options['progress']:
+        options['progress'](entity, done, plan['total'], time.perf_counter() - started, True)
+    stats['total_seconds'] += time.perf_counter() - started
+
+
+# run_import ##########
+# params: spells_path:str, monsters_path:str,
+# workers:int, batch_size:int, incremental:bool,
+# dry_run:bool,
+# progress:function(entity, done, total | None, seconds, finished)
+# return stats:dict
+#
+# each path is a directory of json files, or one
+# json array, ndjson or zip file (see streams.py).
+# without incremental every spell and monster is
+# replaced with the records of the two sources.
+# incremental only touches the files that changed
+# since the last import. one transaction either way,
+# a dry run parses and validates without writing.
+# needs an app context
+# #####################
+def run_import(spells_path, monsters_path, workers=os.cpu_count(), batch_size=IMPORT_BATCH_SIZE, incremental=False, dry_run=False, progress=None):
+    if incremental and (is_stream_source(spells_path) or is_stream_source(monsters_path)):
+        raise ValueError("incremental imports need directories of json files, not single files")
+    stats = new_import_stats()
+    options = { 'workers': workers, 'batch_size': batch_size, 'incremental': incremental, 'dry_run': dry_run, 'progress': progress }
+    try:
+        if not incremental and not dry_run:
+            for model in [ *IMPORT_TABLES, CatalogFile ]:
+                db.session.execute(delete(model))
+        import_entity('spell', spells_path, parse_spell, write_spells, delete_spell_rows, Spell, options, stats)
+        import_entity('monster', monsters_path, parse_monster, write_monsters, delete_monster_rows, Monster, options, stats)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    stats['parse_seconds'] = stats['total_seconds'] - stats['insert_seconds']
+    return stats
+
+
+# format_import_stats ##########
+# params: stats:dict
+# return list[str] summary lines
+# ##############################
+def format_import_stats(stats):
+    seconds = stats['total_seconds'] or 1e-9
+    rows = sum(stats['rows'].values())
+    return [
+        f"Files: {stats['files']} ({stats['files'] / seconds:.1f} files/sec), {len(stats['errors'])} errors, {len(stats['duplicates'])} duplicates skipped",
+        f"Unchanged: {stats['unchanged']}, deleted: {stats['deleted']}",
+        f"Rows: {rows} ({rows / seconds:.1f} rows/sec)",
+        f"Parse: {stats['parse_seconds']:.2f}s, insert: {stats['insert_seconds']:.2f}s",
+        *( f"  {table}: {count}" for table, count in stats['rows'].items() if count ),
+    ]
@@ -0,0 +1,209 @@
+import io
+import gzip
+import json
+from datetime import datetime, date
+from sqlalchemy import select, delete, text
+from models import db, utc_now, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell, CatalogFile
+
+# ----------- SNAPSHOTS ----------- #
+#
+# A snapshot is every catalog table in one gzip file
+# of json lines. The first line is a header with the
+# format version and the columns and row count of
+# each table, every following line is a batch of up
+# to SNAPSHOT_BATCH_SIZE rows of one table stored
+# column by column, which compresses far better than
+# row by row.
+#
+# Restoring replaces every catalog table in one
+# transaction, with COPY on postgres and executemany
+# inserts everywhere else. Rows keep their ids, so
+# urls and ETags stay valid.
+# #################################
+
+SNAPSHOT_FORMAT = 'monster-catalog-snapshot'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = 10000
+
+# parents before children
+SNAPSHOT_MODELS = [ Spell, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, MonsterSpell, CatalogFile ]
+
+
+def encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+# decoder_for ##########
+# params: column:sqlalchemy.Column
+# return function turning a json value back into
+# the column's python type
+# ######################
+def decoder_for(column):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        python_type = None
+    if python_type is datetime:
+        return lambda v: v if v is None else datetime.fromisoformat(v)
+    if python_type is date:
+        return lambda v: v if v is None else date.fromisoformat(v)
+    return lambda v: v
+
+
+# ----------- WRITE ----------- #
+
+# write_snapshot ##########
+# params: path:str, batch_size:int
+# return header:dict
+#
+# reads every table with a streaming cursor, needs
+# an app context
+# #########################
+def write_snapshot(path, batch_size=SNAPSHOT_BATCH_SIZE):
+    connection = db.session.connection()
+    header = { 'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION, 'created_at': utc_now().isoformat(), 'tables': {} }
+    for model in SNAPSHOT_MODELS:
+        table = model.__table__
+        header['tables'][table.name] = {
+            'columns': [ c.name for c in table.columns ],
+            'rows': connection.execute(select(db.func.count()).select_from(table)).scalar(),
+        }
+
+    with gzip.open(path, 'wt', encoding='utf-8') as snapshot:
+        snapshot.write(json.dumps(header) + '\n')
+        for model in SNAPSHOT_MODELS:
+            table = model.__table__
+            result = connection.execution_options(yield_per=batch_size).execute(select(table).order_by(table.c.id))
+            for rows in result.partitions():
+                data = [ [ encode_value(v) for v in values ] for values in zip(*rows) ]
+                snapshot.write(json.dumps({ 'table': table.name, 'data': data }, separators=(',', ':')) + '\n')
+    return header
+
+
+# ----------- READ ----------- #
+
+# read_snapshot_header ##########
+# params: path:str
+# return header:dict
+#
+# raises ValueError for anything that is not a
+# snapshot this version can restore, or whose
+# columns are not in the current schema
+# ###############################
+def read_snapshot_header(path):
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as snapshot:
+            header = json.loads(snapshot.readline())
+    except (OSError, ValueError) as e:
+        raise ValueError(f"{path} is not a catalog snapshot: {e}")
+    return check_snapshot_header(header, path)
+
+
+def check_snapshot_header(header, path):
+    if not isinstance(header, dict) or header.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    if header.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"{path} is snapshot version {header.get('version')} but only version {SNAPSHOT_VERSION} can be restored")
+    for model in SNAPSHOT_MODELS:
+        table = model.__table__
+        if table.name not in header['tables']:
+            raise ValueError(f"{path} has no {table.name}")
+        unknown = set(header['tables'][table.name]['columns']) - set(table.columns.keys())
+        if unknown:
+            raise ValueError(f"{path} has columns that {table.name} does not: {', '.join(sorted(unknown))}")
+    return header
+
+
+# ----------- RESTORE ----------- #
+
+# copy_csv ##########
+# params: rows:list[tuple]
+# return str csv for COPY ... WITH (FORMAT csv)
+#
+# postgres reads an unquoted empty field as NULL and
+# a quoted one as an empty string, so every value
+# but None is quoted
+# ###################
+def copy_csv(rows):
+    def field(value):
+        if value is None:
+            return ''
+        return '"' + str(value).replace('"', '""') + '"'
+    return ''.join( ','.join( field(v) for v in row ) + '\n' for row in rows )
+
+
+# copy_rows ##########
+# params: connection, table, columns:list[str], rows:list[tuple]
+#
+# postgres COPY through the driver connection,
+# psycopg 3 or psycopg2
+# ####################
+def copy_rows(connection, table, columns, rows):
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    data = copy_csv(rows)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(sql, io.StringIO(data))
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(data)
+    finally:
+        cursor.close()
+
+
+def insert_rows(connection, table, columns, rows):
+    connection.execute(table.insert(), [ dict(zip(columns, row)) for row in rows ])
+
+
+# reset_sequences ##########
+# new rows continue after the restored ids on postgres
+# ##########################
+def reset_sequences(connection):
+    for model in SNAPSHOT_MODELS:
+        table = model.__table__.name
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) FROM {table}"
+        ))
+
+
+# restore_snapshot ##########
+# params: path:str
+# return rows:dict[table name, int]
+#
+# replaces every catalog table with the snapshot in
+# one transaction, needs an app context
+# ###########################
+def restore_snapshot(path):
+    read_snapshot_header(path)
+    connection = db.session.connection()
+    postgres = connection.dialect.name == 'postgresql'
+    write_rows = copy_rows if postgres else insert_rows
+    tables = { model.__table__.name: model.__table__ for model in SNAPSHOT_MODELS }
+    restored = { name: 0 for name in tables }
+
+    try:
+        for model in reversed(SNAPSHOT_MODELS):
+            connection.execute(delete(model.__table__))
+
+        with gzip.open(path, 'rt', encoding='utf-8') as snapshot:
+            header = json.loads(snapshot.readline())
+            decoders = { name: [ decoder_for(tables[name].c[c]) for c in header['tables'][name]['columns'] ] for name in tables }
+            for line in snapshot:
+                batch = json.loads(line)
+                name = batch['table']
+                columns = header['tables'][name]['columns']
+                data = [ [ decode(v) for v in values ] for decode, values in zip(decoders[name], batch['data']) ]
+                rows = list(zip(*data))
+                write_rows(connection, tables[name], columns, rows)
+                restored[name] += len(rows)
+
+        if postgres:
+            reset_sequences(connection)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return restored
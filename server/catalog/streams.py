@@ -0,0 +1,135 @@
+import io
+import os
+import json
+import zipfile
+
+# ----------- STREAMING SOURCES ----------- #
+#
+# A catalog source can be one large file instead of a
+# directory of json files: a json array, newline
+# delimited json (.ndjson or .jsonl) or a zip of
+# either. Records are decoded one at a time from
+# STREAM_CHUNK_SIZE reads, so memory holds one chunk
+# and the record being decoded, never the whole file.
+# #########################################
+
+STREAM_CHUNK_SIZE = 1 << 16
+# largest array element iter_json_values will buffer
+STREAM_MAX_RECORD_SIZE = 1 << 24
+# a decode error this close to the end of the buffer
+# may be a literal or number cut by the chunk boundary
+STREAM_ERROR_MARGIN = 64
+
+NDJSON_EXTENSIONS = ('.ndjson', '.jsonl')
+
+
+# is_incomplete ##########
+# params: error:json.JSONDecodeError, buffer:str
+# return True when more data may complete the value
+#
+# an unterminated string is reported where it starts,
+# every other error where the decoder stopped
+# ########################
+def is_incomplete(error, buffer):
+    if error.msg.startswith('Unterminated string'):
+        return True
+    return error.pos >= len(buffer.rstrip()) - STREAM_ERROR_MARGIN
+
+
+# iter_json_values ##########
+# params: stream:text io, chunk_size:int, max_size:int
+# return generator of decoded values
+#
+# the elements of a top level array one by one, or
+# the document itself when it is not an array.
+# a malformed element raises a ValueError with its
+# position as soon as it is found, and so does one
+# longer than max_size characters
+# ###########################
+def iter_json_values(stream, chunk_size=STREAM_CHUNK_SIZE, max_size=STREAM_MAX_RECORD_SIZE):
+    decoder = json.JSONDecoder()
+    buffer = stream.read(chunk_size)
+    read = len(buffer)
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['):
+        yield json.loads(buffer + stream.read())
+        return
+
+    buffer = buffer[1:]
+    index = 1
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            offset = read - len(buffer)
+            if not is_incomplete(e, buffer):
+                raise ValueError(f"invalid json array: element {index} at offset {offset}: {e.msg} at offset {offset + e.pos}")
+            if len(buffer) > max_size:
+                raise ValueError(f"invalid json array: element {index} at offset {offset} is longer than {max_size} characters")
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                raise ValueError(f"invalid json array: element {index} at offset {offset}: {e}")
+            read += len(chunk)
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+        index += 1
+
+
+# iter_ndjson ##########
+# params: stream:text io
+# return generator of decoded value | ValueError, one per line
+#
+# a line that is not valid json becomes an error
+# for that record only
+# ######################
+def iter_ndjson(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f"invalid json: {e}")
+
+
+# iter_stream_records ##########
+# params: stream:text io, name:str
+# return generator of (label:str, record)
+# ##############################
+def iter_stream_records(stream, name):
+    values = iter_ndjson(stream) if name.endswith(NDJSON_EXTENSIONS) else iter_json_values(stream)
+    for index, value in enumerate(values, start=1):
+        yield f"{name}:{index}", value
+
+
+# iter_records ##########
+# params: path:str to a .json, .ndjson, .jsonl or .zip file
+# return generator of (label:str, record)
+#
+# the members of a zip are read in name order,
+# anything that is not json is skipped
+# #######################
+def iter_records(path):
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in sorted(archive.namelist()):
+                if not member.endswith(('.json', *NDJSON_EXTENSIONS)):
+                    continue
+                with archive.open(member) as raw:
+                    yield from iter_stream_records(io.TextIOWrapper(raw, encoding='utf-8'), f"{path}/{member}")
+        return
+
+    with open(path, encoding='utf-8') as stream:
+        yield from iter_stream_records(stream, path)
+
+
+def is_stream_source(path):
+    return not os.path.isdir(path)
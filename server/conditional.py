@@ -0,0 +1,279 @@
+import zlib
+from functools import wraps
+from urllib.parse import urlencode
+from flask import request, make_response, g, has_request_context
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from models import db, utc_now, Monster, Spell, MonsterSpell
+
+# ----------- CONDITIONAL GET ----------- #
+#
+# Monster and Spell rows carry a version and an
+# updated_at that are bumped whenever the row or
+# anything it serializes changes. A monster is
+# bumped by writes to its nested resources and
+# monster_spells and by writes to its spells.
+#
+# Item routes build a strong ETag and Last-Modified
+# from those two columns and answer If-None-Match /
+# If-Modified-Since with a 304 from a primary key
+# lookup before the view loads anything. List routes
+# hash the response body instead.
+# #######################################
+
+VERSION_COLUMNS = ['version', 'updated_at']
+
+
+# ----------- ROW VERSIONS ----------- #
+
+# touched_rows ##########
+# params: session:Session
+# return monster_ids:set[int], spell_ids:set[int]
+#
+# ids of the rows whose json changes with this flush,
+# read while the flush history is still available
+# #######################
+def touched_rows(session):
+    monster_ids = set()
+    spell_ids = set()
+
+    for instance in session.new:
+        if not isinstance(instance, (Monster, Spell)) and hasattr(instance, 'monster_id'):
+            monster_ids.add(instance.monster_id)
+
+    for instance in session.dirty:
+        if not session.is_modified(instance, include_collections=False):
+            continue
+        if isinstance(instance, Monster):
+            monster_ids.add(instance.id)
+        elif isinstance(instance, Spell):
+            spell_ids.add(instance.id)
+        elif hasattr(instance, 'monster_id'):
+            # a moved row changes the old and the new monster
+            history = db.inspect(instance).attrs.monster_id.history
+            monster_ids.update(history.sum())
+
+    for instance in session.deleted:
+        if isinstance(instance, Spell):
+            spell_ids.add(instance.id)
+        elif not isinstance(instance, Monster) and hasattr(instance, 'monster_id'):
+            monster_ids.add(instance.monster_id)
+
+    monster_ids.discard(None)
+    spell_ids.discard(None)
+    return monster_ids, spell_ids
+
+
+# bump_row_versions ##########
+# runs after every flush
+# ############################
+def bump_row_versions(session, flush_context):
+    monster_ids, spell_ids = touched_rows(session)
+    if not monster_ids and not spell_ids:
+        return
+
+    now = utc_now()
+    if spell_ids:
+        session.execute(
+            update(Spell)
+            .where(Spell.id.in_(spell_ids))
+            .values(version=Spell.version + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        # monsters embed their spells
+        monster_ids.update(session.execute(
+            select(MonsterSpell.monster_id).where(MonsterSpell.spell_id.in_(spell_ids))
+        ).scalars())
+        monster_ids.discard(None)
+
+    if monster_ids:
+        session.execute(
+            update(Monster)
+            .where(Monster.id.in_(monster_ids))
+            .values(version=Monster.version + 1, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    session.info['bumped_rows'] = (monster_ids, spell_ids)
+
+
+# expire_row_versions ##########
+# runs once the flush is complete so loaded rows
+# read the bumped values on next access. ids come
+# from the identity keys, reading instance.id would
+# reload every expired instance in the session
+# ##############################
+def expire_row_versions(session, flush_context):
+    monster_ids, spell_ids = session.info.pop('bumped_rows', ((), ()))
+    for (_, (id, *_), _), instance in list(session.identity_map.items()):
+        if (isinstance(instance, Monster) and id in monster_ids) or (isinstance(instance, Spell) and id in spell_ids):
+            session.expire(instance, VERSION_COLUMNS)
+
+
+# record_bulk_insert ##########
+# params: session:Session, model:class, rows:list[dict]
+#
+# session.execute(insert(model), rows) writes without
+# a flush, so bulk writers record what they inserted
+# here. the monsters of child rows are bumped once
+# when the session commits and response_cache.py
+# invalidates from the same record
+# ##############################
+def record_bulk_insert(session, model, rows):
+    monster_ids = session.info.setdefault('bulk_inserted', {}).setdefault(model, set())
+    if model is not Monster and 'monster_id' in model.__table__.columns:
+        monster_ids.update( row['monster_id'] for row in rows if row.get('monster_id') is not None )
+
+
+def bump_bulk_insert_versions(session):
+    monster_ids = set()
+    for model, ids in session.info.get('bulk_inserted', {}).items():
+        monster_ids.update(ids)
+    if monster_ids:
+        session.execute(
+            update(Monster)
+            .where(Monster.id.in_(monster_ids))
+            .values(version=Monster.version + 1, updated_at=utc_now())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def discard_bulk_inserts(session):
+    session.info.pop('bulk_inserted', None)
+
+
+event.listen(Session, 'after_flush', bump_row_versions)
+event.listen(Session, 'after_flush_postexec', expire_row_versions)
+event.listen(Session, 'before_commit', bump_bulk_insert_versions)
+event.listen(Session, 'after_rollback', discard_bulk_inserts)
+
+
+# ----------- VALIDATORS ----------- #
+
+# remember_validators ##########
+# runs on every Monster and Spell load so the item
+# routes can tag the row the view already loaded
+# ###############################
+def remember_validators(target, context):
+    if has_request_context() and all( c in target.__dict__ for c in VERSION_COLUMNS ):
+        g.setdefault('row_validators', {})[(type(target), target.id)] = (target.version, target.updated_at)
+
+
+event.listen(Monster, 'load', remember_validators)
+event.listen(Spell, 'load', remember_validators)
+
+
+# row_validators ##########
+# params: model:Monster|Spell, id:int
+# return (version:int, updated_at:datetime) or None
+#
+# uses the row the view already loaded when there
+# is one, otherwise one primary key lookup
+# #########################
+def row_validators(model, id):
+    loaded = g.get('row_validators', {}).get((model, id))
+    if loaded:
+        return loaded
+    return db.session.execute(
+        select(model.version, model.updated_at).where(model.id == id)
+    ).first()
+
+
+# request_key ##########
+# return str
+#
+# path and sorted query string, the same for every
+# spelling of the same request
+# ######################
+def request_key():
+    return f"{request.path}?{urlencode(sorted(request.args.items(multi=True)))}"
+
+
+# representation_tag ##########
+# return str
+#
+# the same row has a different body for every
+# fields, include or nested path so those are part
+# of the tag
+# #############################
+def representation_tag():
+    return format(zlib.crc32(request_key().encode()), '08x')
+
+
+def entity_tag(model, id, version):
+    return f"{model.__tablename__}-{id}-{version}-{representation_tag()}"
+
+
+# is_not_modified ##########
+# params: etag:str, last_modified:datetime
+# return bool
+#
+# If-None-Match takes precedence over
+# If-Modified-Since like RFC 9110 asks
+# ##########################
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+# ----------- DECORATORS ----------- #
+
+# conditional_on ##########
+# params: model:Monster|Spell, id_arg:str
+#
+# for routes that render one row, or the nested
+# resources of one monster, identified by the
+# id_arg url parameter
+# #########################
+def conditional_on(model, id_arg='id'):
+    def decorator(view):
+        @wraps(view)
+        def conditional_view(*args, **kwargs):
+            id = kwargs[id_arg]
+            validators = None
+            g.pop('row_validators', None)
+
+            if request.if_none_match or request.if_modified_since:
+                validators = row_validators(model, id)
+                if validators:
+                    version, updated_at = validators
+                    etag = entity_tag(model, id, version)
+                    if is_not_modified(etag, updated_at):
+                        return set_validators(make_response('', 304), etag, updated_at)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                validators = validators or row_validators(model, id)
+                if validators:
+                    version, updated_at = validators
+                    set_validators(response, entity_tag(model, id, version), updated_at)
+            return response
+        return conditional_view
+    return decorator
+
+
+# conditional_body ##########
+# for list routes, whose body changes with rows
+# added or removed, the tag is a hash of the body
+# ###########################
+def conditional_body(view):
+    @wraps(view)
+    def conditional_view(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.add_etag()
+            response.cache_control.no_cache = True
+            response.make_conditional(request)
+        return response
+    return conditional_view
@@ -6,21 +6,135 @@
 # ###########################################
 
 import os
+from sqlalchemy.pool import NullPool
+from sqlite_tuning import read_only_uri
+
+
+# engine_options ##########
+# params: uri:str
+# return dict for SQLALCHEMY_ENGINE_OPTIONS
+#
+# DATABASE_POOL=null opens a connection per checkout,
+# for use behind an external pooler like pgbouncer.
+# otherwise each process keeps DATABASE_POOL_SIZE
+# connections plus DATABASE_MAX_OVERFLOW extra ones
+# under load, pings them before use and replaces
+# them after DATABASE_POOL_RECYCLE seconds so the
+# load balancer never hands back a dead one.
+# DATABASE_STATEMENT_TIMEOUT is in milliseconds and
+# only applies to postgres and mysql
+# #########################
+def engine_options(uri):
+    options = {}
+    connect_args = {}
+
+    statement_timeout = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT') or 0)
+    if statement_timeout and uri and uri.startswith('postgres'):
+        connect_args['options'] = f"-c statement_timeout={statement_timeout}"
+    elif statement_timeout and uri and uri.startswith('mysql'):
+        connect_args['init_command'] = f"SET SESSION max_execution_time={statement_timeout}"
+    if connect_args:
+        options['connect_args'] = connect_args
+
+    if (os.environ.get('DATABASE_POOL') or 'queue').lower() == 'null':
+        options['poolclass'] = NullPool
+        return options
+
+    if uri and uri.startswith('sqlite') and ':memory:' in uri:
+        # one shared connection, nothing to size
+        return options
+
+    options.update({
+        'pool_size': int(os.environ.get('DATABASE_POOL_SIZE') or 5),
+        'max_overflow': int(os.environ.get('DATABASE_MAX_OVERFLOW') or 10),
+        'pool_timeout': int(os.environ.get('DATABASE_POOL_TIMEOUT') or 30),
+        'pool_recycle': int(os.environ.get('DATABASE_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': (os.environ.get('DATABASE_POOL_PRE_PING') or 'true').lower() == 'true',
+    })
+    return options
+
+
+# sqlite_pragmas ##########
+# return dict of pragmas run on every new sqlite
+# connection, see sqlite_tuning.py. SQLITE_TUNING=false
+# keeps the sqlite defaults
+# ##########################
+def sqlite_pragmas():
+    if (os.environ.get('SQLITE_TUNING') or 'true').lower() != 'true':
+        return {}
+    return {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL',
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL',
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024),
+        'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE') or -64 * 1024),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000),
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE') or 'MEMORY',
+    }
+
+
+# database_uri ##########
+# params: default:str
+# return DATABASE_URI, opened read only and immutable
+# when SQLITE_IMMUTABLE=true
+# #######################
+def database_uri(default=None):
+    uri = os.environ.get('DATABASE_URI') or default
+    if uri and (os.environ.get('SQLITE_IMMUTABLE') or 'false').lower() == 'true':
+        return read_only_uri(uri, immutable=True)
+    return uri
+
 
 # DEFAULT #
 class Config(object):
     TESTING = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # in process GET response cache, see response_cache.py
+    RESPONSE_CACHE_ENABLED = (os.environ.get('RESPONSE_CACHE_ENABLED') or 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+    RESPONSE_CACHE_TTL = int(os.environ.get('RESPONSE_CACHE_TTL') or 300)
+
+    # per route and database metrics at /metrics, see metrics.py
+    METRICS_ENABLED = (os.environ.get('METRICS_ENABLED') or 'true').lower() == 'true'
+
+    # statements per request and N+1 detection, see query_budget.py
+    QUERY_BUDGET_ENABLED = (os.environ.get('QUERY_BUDGET_ENABLED') or 'false').lower() == 'true'
+    QUERY_BUDGET = int(os.environ['QUERY_BUDGET']) if os.environ.get('QUERY_BUDGET') else None
+    QUERY_BUDGETS = {}
+    QUERY_BUDGET_STRICT = (os.environ.get('QUERY_BUDGET_STRICT') or 'false').lower() == 'true'
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD') or 5)
+
+    # statements slower than SLOW_QUERY_MS, see slow_queries.py
+    SLOW_QUERY_LOG_ENABLED = (os.environ.get('SLOW_QUERY_LOG_ENABLED') or 'true').lower() == 'true'
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS') or 200)
+    SLOW_QUERY_LOG_SIZE = int(os.environ.get('SLOW_QUERY_LOG_SIZE') or 100)
+    SLOW_QUERY_EXPLAIN = (os.environ.get('SLOW_QUERY_EXPLAIN') or 'true').lower() == 'true'
+
+    # bearer token for the /admin routes, unset turns them off
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # read replicas, see replicas.py
+    REPLICA_DATABASE_URIS = [ uri.strip() for uri in (os.environ.get('DATABASE_REPLICA_URIS') or '').split(',') if uri.strip() ]
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS') or 5)
+
+    # pragmas for sqlite databases, see sqlite_tuning.py
+    SQLITE_PRAGMAS = sqlite_pragmas()
+
 # PRODUCTION #
 class ProductionConfig(Config):
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI')
+    SQLALCHEMY_DATABASE_URI = database_uri()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(database_uri())
 
 # DEVELOPMENT #
 class DevelopmentConfig(Config):
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or "sqlite:///app.db"
+    SQLALCHEMY_DATABASE_URI = database_uri("sqlite:///app.db")
+    QUERY_BUDGET_ENABLED = (os.environ.get('QUERY_BUDGET_ENABLED') or 'true').lower() == 'true'
 
 # TESTING #
 class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
-    TESTING = True
\ No newline at end of file
+    TESTING = True
+    RESPONSE_CACHE_ENABLED = False
+    SQLITE_PRAGMAS = {}
+    QUERY_BUDGET_ENABLED = True
+    QUERY_BUDGET_STRICT = True
\ No newline at end of file
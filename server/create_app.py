@@ -3,14 +3,25 @@ from flask import Flask, request
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
-from routes import monster_routes_blueprint, spell_routes_blueprint, create_nested_monster_routes_blueprint
+from routes import monster_routes_blueprint, spell_routes_blueprint, create_nested_monster_routes_blueprint, search_routes_blueprint, cache_routes_blueprint, metrics_routes_blueprint, admin_routes_blueprint
 
 from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell
 
+from serializers import compile_serializer
+from search import include_migration_object
+from response_cache import init_response_cache
+from metrics import init_metrics
+from query_budget import init_query_budget
+from slow_queries import init_slow_query_log
+from replicas import init_replicas, replica_engines
+from sqlite_tuning import set_sqlite_pragmas
+from catalog import catalog_cli
+
 import config
 
 # ###############################################
 # mode: 'DEVELOPMENT', 'PRODUCTION', 'TESTING'
+# config: dict of overrides for the mode's config
 # return app:flask.app.Flask
 # 
 # create_app is a factory for app instance that
@@ -18,7 +29,7 @@ import config
 # environment
 # ##############################################
 
-def create_app(mode=os.environ.get('FLASK_ENV') or "DEVELOPMENT"):
+def create_app(mode=os.environ.get('FLASK_ENV') or "DEVELOPMENT", config=None):
 
     app = Flask(__name__)
     if mode == "PRODUCTION":
@@ -30,16 +41,32 @@ def create_app(mode=os.environ.get('FLASK_ENV') or "DEVELOPMENT"):
     else:
         raise TypeError(f"create_app requires a mode argument of 'PRODUCTION', 'DEVELOPMENT', or 'TESTING' but got {mode}")
 
-    
+    app.config.update(config or {})
 
     app.json.compact = False
 
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, include_object=include_migration_object)
 
     db.init_app(app)
 
+    init_replicas(app)
+
+    with app.app_context():
+        for engine in [ *db.engines.values(), *replica_engines(app) ]:
+            set_sqlite_pragmas(engine, app.config.get('SQLITE_PRAGMAS'))
+
     CORS(app)
 
+    init_response_cache(app)
+
+    with app.app_context():
+        engines = { 'primary': db.engine, **{ f"replica_{i}": engine for i, engine in enumerate(replica_engines(app)) } }
+        init_metrics(app, engines)
+        init_query_budget(app, engines.values())
+        init_slow_query_log(app, engines)
+
+    app.cli.add_command(catalog_cli)
+
 
 
 
@@ -62,6 +89,14 @@ def create_app(mode=os.environ.get('FLASK_ENV') or "DEVELOPMENT"):
     app.register_blueprint( create_nested_monster_routes_blueprint('damage_vulnerabilities', DamageVulnerability) )
     app.register_blueprint( create_nested_monster_routes_blueprint('condition_immunities', ConditionImmunity) )
     app.register_blueprint( create_nested_monster_routes_blueprint('actions', Action) )
+    app.register_blueprint( search_routes_blueprint )
+    app.register_blueprint( cache_routes_blueprint )
+    app.register_blueprint( metrics_routes_blueprint )
+    app.register_blueprint( admin_routes_blueprint )
+
+    # compile the default serializers before the first request
+    compile_serializer(Monster)
+    compile_serializer(Spell)
 
     # SPELLS ROUTES #
 
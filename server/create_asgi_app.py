@@ -0,0 +1,250 @@
+import io
+import os
+import sys
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.util import greenlet_spawn, await_only
+
+from create_app import create_app
+from models import db
+from replicas import replica_engines, set_replica_engines
+from metrics import instrument_engine
+from query_budget import watch_engine
+from slow_queries import watch_slow_queries
+from sqlite_tuning import set_sqlite_pragmas
+
+# ----------- ASGI ----------- #
+#
+# uvicorn asgi:app --workers 4
+#
+# Serves the same flask app, routes and all, from an
+# asyncio event loop. Each request runs the flask app
+# in a greenlet of its own, and the primary and
+# replica engines are swapped for SQLAlchemy async
+# engines (aiosqlite, asyncpg). Whenever a query waits
+# on the database its greenlet hands the event loop
+# to the other requests, the way AsyncSession.run_sync
+# does, so a worker holds thousands of slow requests
+# instead of one, while every route, status, header
+# and body stays identical to the wsgi app.
+#
+# Request bodies are read in full before the app
+# runs, response bodies are streamed as the app
+# produces them.
+# ############################
+
+ASYNC_DRIVERS = { 'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg' }
+
+
+# async_url ##########
+# params: url:sqlalchemy.engine.URL | str
+# return URL using the async driver of its database
+# ####################
+def async_url(url):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"no async driver for {url.get_backend_name()} databases, use one of {', '.join(ASYNC_DRIVERS)}")
+    return url.set(drivername=driver)
+
+
+# async_engine_options ##########
+# params: options:dict SQLALCHEMY_ENGINE_OPTIONS, url:URL
+# return dict of create_async_engine options
+# ###############################
+def async_engine_options(options, url):
+    options = dict(options)
+    connect_args = dict(options.pop('connect_args', {}))
+
+    if url.get_backend_name() == 'postgresql' and 'options' in connect_args:
+        # asyncpg takes server settings instead of libpq options
+        settings = [ option.split('=', 1) for option in connect_args.pop('options').split('-c ') if '=' in option ]
+        connect_args['server_settings'] = { name.strip(): value.strip() for name, value in settings }
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # one shared connection, like flask-sqlalchemy does
+        options['poolclass'] = StaticPool
+
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
+
+
+def make_async_engine(url, options, pragmas):
+    url = async_url(url)
+    engine = create_async_engine(url, **async_engine_options(options, url))
+    set_sqlite_pragmas(engine.sync_engine, pragmas)
+    return engine
+
+
+# init_async_engines ##########
+# params: app:flask.app.Flask
+# return list[AsyncEngine]
+#
+# replaces the primary and replica engines of the app
+# with async engines to the same databases
+# #############################
+def init_async_engines(app):
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+
+    with app.app_context():
+        primary = make_async_engine(db.engine.url, options, pragmas)
+    app.extensions['primary_engine'] = primary.sync_engine
+
+    replicas = [ make_async_engine(engine.url, options, pragmas) for engine in replica_engines(app) ]
+    if replicas:
+        set_replica_engines(app, [ engine.sync_engine for engine in replicas ])
+
+    # the statement hooks of create_app watch the new engines too
+    named = { 'primary': primary.sync_engine, **{ f"replica_{i}": engine.sync_engine for i, engine in enumerate(replicas) } }
+    metrics = app.extensions.get('metrics')
+    slow_query_log = app.extensions.get('slow_query_log')
+    for name, engine in named.items():
+        if app.extensions.get('query_budget'):
+            watch_engine(engine)
+        if metrics is not None:
+            instrument_engine(metrics, engine, name)
+        if slow_query_log is not None:
+            watch_slow_queries(slow_query_log, engine, name)
+    return [ primary, *replicas ]
+
+
+# ----------- BRIDGE ----------- #
+
+# wsgi_environ ##########
+# params: scope:dict asgi http scope, body:bytes
+# return dict PEP 3333 environ
+# #######################
+def wsgi_environ(scope, body):
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+# read_body ##########
+# params: receive:asgi callable
+# return bytes
+# ####################
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+# AsgiBridge ##########
+# params: wsgi_app:callable, engines:list[AsyncEngine]
+# disposed on shutdown
+# #####################
+class AsgiBridge:
+
+    def __init__(self, wsgi_app, engines=()):
+        self.wsgi_app = wsgi_app
+        self.engines = list(engines)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            body = await read_body(receive)
+            if body is not None:
+                await greenlet_spawn(self.respond, wsgi_environ(scope, body), send)
+        else:
+            raise ValueError(f"unsupported asgi scope {scope['type']}")
+
+    # respond ##########
+    # runs in the request's greenlet, await_only hands
+    # the event loop back while a message is sent
+    # ##################
+    def respond(self, environ, send):
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and start.get('sent'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            start.update({
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [ (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers ],
+            })
+
+        def send_start():
+            if not start.get('sent'):
+                await_only(send({ k: v for k, v in start.items() if k != 'sent' }))
+                start['sent'] = True
+
+        body = self.wsgi_app(environ, start_response)
+        try:
+            for chunk in body:
+                if chunk:
+                    send_start()
+                    await_only(send({ 'type': 'http.response.body', 'body': chunk, 'more_body': True }))
+            send_start()
+            await_only(send({ 'type': 'http.response.body', 'body': b'', 'more_body': False }))
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({ 'type': 'lifespan.startup.complete' })
+            elif message['type'] == 'lifespan.shutdown':
+                for engine in self.engines:
+                    await engine.dispose()
+                await send({ 'type': 'lifespan.shutdown.complete' })
+                return
+
+# END AsgiBridge #
+
+
+# ###############################################
+# mode: 'DEVELOPMENT', 'PRODUCTION', 'TESTING'
+# config: dict of overrides for the mode's config
+# return AsgiBridge
+#
+# create_asgi_app builds the flask app with
+# create_app and serves it with async engines
+# ##############################################
+def create_asgi_app(mode=os.environ.get('FLASK_ENV') or "DEVELOPMENT", config=None):
+    app = create_app(mode, config)
+    engines = init_async_engines(app)
+    return AsgiBridge(app, engines)
@@ -0,0 +1,63 @@
+import zlib
+from flask import Response, request, current_app, stream_with_context
+from models import db
+from serializers import serialize
+
+# ----------- NDJSON EXPORT ----------- #
+#
+# Streams a whole query as one json document per line.
+# Rows are read EXPORT_BATCH_SIZE at a time from a
+# streaming cursor, the relationship loaders run once
+# per batch and the batch is dropped from the session
+# before the next one, so memory stays flat no matter
+# how many rows are exported.
+# #####################################
+
+EXPORT_BATCH_SIZE = 500
+
+
+# ndjson_lines ##########
+# params: query:Query, only:tuple[str], batch_size:int
+# return generator of str, one per batch
+# #######################
+def ndjson_lines(query, only=(), batch_size=EXPORT_BATCH_SIZE):
+    result = db.session.execute(query.statement.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.scalars().partitions():
+            yield ''.join( current_app.json.dumps(serialize(item, only=only)) + '\n' for item in partition )
+            # expunge_all would swap out the identity map the open result is using
+            for instance in list(db.session.identity_map.values()):
+                db.session.expunge(instance)
+    finally:
+        result.close()
+
+
+# gzip_chunks ##########
+# params: chunks:generator of str
+# return generator of bytes
+#
+# each batch is flushed so the client can start
+# decompressing before the export is done
+# ######################
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def accepts_gzip():
+    return request.accept_encodings['gzip'] > 0
+
+
+# ndjson_response ##########
+# params: query:Query, only:tuple[str], filename:str
+# return Response
+# ##########################
+def ndjson_response(query, only, filename):
+    chunks = ndjson_lines(query, only)
+    headers = { 'Content-Disposition': f'attachment; filename="{filename}"', 'Vary': 'Accept-Encoding' }
+    if accepts_gzip():
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson', headers=headers)
@@ -0,0 +1,37 @@
+import os
+import sys
+
+# ----------- GUNICORN ----------- #
+#
+# gunicorn reads this file from the working
+# directory. The app is imported once in the master
+# and forked into the workers, so a worker must
+# never reuse a pooled connection it inherited: its
+# socket is shared with the master and every other
+# worker. post_fork drops the inherited pool without
+# closing those sockets, each worker then opens its
+# own connections.
+#
+# Every worker has its own pool, so the database
+# sees up to workers * (DATABASE_POOL_SIZE +
+# DATABASE_MAX_OVERFLOW) connections.
+# ################################
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:8000'
+workers = int(os.environ.get('WEB_CONCURRENCY') or 2)
+preload_app = True
+
+
+# post_fork ##########
+# runs in each worker right after the fork
+# ####################
+def post_fork(server, worker):
+    app_module = sys.modules.get('app')
+    if app_module is None:
+        return
+
+    from models import db
+    from replicas import replica_engines
+    with app_module.app.app_context():
+        for engine in [ *db.engines.values(), *replica_engines(app_module.app) ]:
+            engine.dispose(close=False)
@@ -1,48 +1,111 @@
-from models import db, Monster, Spell, MonsterSpell
+from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell
+from sqlalchemy import select, insert
+from loaders import monster_loader_options
+from conditional import record_bulk_insert
+
+# nested resource key: (model, attributes accepted from request data,
+# natural key matching request items to existing rows without an id)
+NESTED_MONSTER_DATA = {
+    'skills': (Skill, ['name', 'value'], ['name']),
+    'saving_throws': (SavingThrow, ['name', 'value'], ['name']),
+    'special_abilities': (SpecialAbility, ['name', 'description'], ['name']),
+    'senses': (Sense, ['name', 'distance'], ['name']),
+    'speeds': (Speed, ['name', 'distance'], ['name']),
+    'languages': (Language, ['name'], ['name']),
+    'damage_resistances': (DamageResistance, ['damage_type'], ['damage_type']),
+    'damage_immunities': (DamageImmunity, ['damage_type'], ['damage_type']),
+    'damage_vulnerabilities': (DamageVulnerability, ['damage_type'], ['damage_type']),
+    'condition_immunities': (ConditionImmunity, ['condition_type'], ['condition_type']),
+    'actions': (Action, ['legendary_action', 'lair_action', 'bonus_action', 'reaction', 'name', 'description'], ['name']),
+}
 
 # ----------- HELPER METHODS ----------- #
 
 
 # find_monster_by_id ##########
-# params: id:str
+# params: id:str, load_relationships:bool,
+# options:list[sqlalchemy.orm.Load]
 # return Monster
+#
+# load_relationships batches every relationship
+# needed by Monster.to_dict, pass False when only
+# checking that the monster exists. options
+# replace the default loader options
 # ############################
-def find_monster_by_id(id):
-    return Monster.query.where(Monster.id == id).first()
+def find_monster_by_id(id, load_relationships=True, options=None):
+    query = Monster.query.where(Monster.id == id)
+    if options is not None:
+        query = query.options(*options)
+    elif load_relationships:
+        query = query.options(*monster_loader_options())
+    return query.first()
 
 
 # find_spell_by_id ##########
-# params: id:str
+# params: id:str, options:list[sqlalchemy.orm.Load]
 # return Spell
 # ############################
-def find_spell_by_id(id):
-    return Spell.query.where(Spell.id == id).first()
+def find_spell_by_id(id, options=()):
+    return Spell.query.options(*options).where(Spell.id == id).first()
 
 
 # find_spell_by_name ##########
 # params: name:str
 # return Spell
+#
+# compares lower(name) so the lookup can use the
+# ix_spells_table_lower_name index
 # ############################
 def find_spell_by_name(name):
-    return Spell.query.where(Spell.name.ilike(name)).first()
+    if name is None:
+        return None
+    return Spell.query.where(db.func.lower(Spell.name) == name.lower()).first()
 
 
-# replace_nested_monster_data #################
-# params: data:list[dict], parent:Monster, 
-# child_class:class, valid_attributes:list[str]
-# 
-# return list[child_class_instance]
+# reconcile_nested_monster_data #################
+# params: data:list[dict], parent:Monster,
+# child_class:class, valid_attributes:list[str],
+# natural_key:list[str]
+#
+# makes the monster's rows match data with the fewest
+# writes. items are matched to existing rows by id,
+# then by natural key (compared without case or
+# surrounding spaces). matched rows only get the
+# attributes that changed, unmatched items are inserted
+# and unmatched rows deleted. nothing is flushed
 # ###########################################
-def replace_nested_monster_data(data, parent, child_class, valid_attributes):
-    child_class.query.where(child_class.monster_id == parent.id).delete()
-    new_items = []
-    for item_dict in data:
-        filtered_item_dict = { k: v for k, v in item_dict.items() if k in valid_attributes }
-        new_item = child_class(**filtered_item_dict)
-        new_item.monster = parent
-        db.session.add(new_item)
-        new_items.append(new_item)
-    return new_item
+def reconcile_nested_monster_data(data, parent, child_class, valid_attributes, natural_key):
+    existing = list(getattr(parent, child_class.monster.property.back_populates)) if parent.id is not None else []
+    unmatched = { child.id: child for child in existing }
+
+    items = [ (item_dict.get('id'), { k: v for k, v in item_dict.items() if k in valid_attributes }) for item_dict in data ]
+    matches = [ unmatched.pop(id, None) for id, _ in items ]
+
+    by_natural_key = {}
+    for child in unmatched.values():
+        by_natural_key.setdefault(natural_key_of(child.__dict__, natural_key), []).append(child)
+    for index, (_, filtered_item_dict) in enumerate(items):
+        if matches[index] is None:
+            candidates = by_natural_key.get(natural_key_of(filtered_item_dict, natural_key))
+            if candidates:
+                matches[index] = candidates.pop(0)
+                del unmatched[matches[index].id]
+
+    for child, (_, filtered_item_dict) in zip(matches, items):
+        if child is None:
+            new_item = child_class(**filtered_item_dict)
+            new_item.monster = parent
+            db.session.add(new_item)
+            continue
+        for k, v in filtered_item_dict.items():
+            setattr(child, k, v)
+
+    for child in unmatched.values():
+        db.session.delete(child)
+
+
+def natural_key_of(values, natural_key):
+    return tuple( v.lower().strip() if isinstance(v, str) else v for v in ( values.get(k) for k in natural_key ) )
 
 
 # append_nested_monster_data #################
@@ -61,24 +124,57 @@ def append_nested_monster_data(data:list, parent:Monster, child_class, valid_att
         new_items.append(new_item)
     return new_item
 
+# find_spell_ids_by_name ##########
+# params: names:list[str]
+# return dict[lower name, spell id]
+#
+# one query for every name against the
+# ix_spells_table_lower_name index, the lowest
+# id wins when names only differ by case
+# #################################
+def find_spell_ids_by_name(names):
+    lowered = { n.lower() for n in names if isinstance(n, str) }
+    if not lowered:
+        return {}
+    rows = db.session.execute(
+        select(Spell.id, db.func.lower(Spell.name)).where(db.func.lower(Spell.name).in_(lowered)).order_by(Spell.id)
+    ).all()
+    ids = {}
+    for id, name in rows:
+        ids.setdefault(name, id)
+    return ids
+
+
 # replace_associated_monster_spells #################
-# params: spell_names:list[str], parent:Monster, 
-# 
-# return list[MonsterSpell:instance]
+# params: spell_names:list[str], parent:Monster
+#
+# return missing spell names:list[str]
+#
+# resolves every name in one query, deletes the
+# links that are no longer wanted and inserts the
+# new ones in one statement. does not commit
 # ###########################################
 def replace_associated_monster_spells(spell_names, parent):
-    MonsterSpell.query.where(MonsterSpell.monster == parent).delete()
-    new_joins = []
-    for s_name in spell_names:
-        spell = find_spell_by_name(s_name)
-        print(spell, s_name)
-        if spell:
-            try:
-                ms = MonsterSpell(monster=parent, spell=spell)
-                db.session.add(ms)
-                db.session.commit()
-                new_joins.append(ms)
-            except Exception as e:
-                print(f"An exception has occurred: {e}")
-    print(new_joins)
-    return new_joins
\ No newline at end of file
+    if not isinstance(spell_names, list):
+        raise ValueError("spells must be a list of spell names")
+    spell_ids = find_spell_ids_by_name(spell_names)
+    missing = [ name for name in spell_names if not isinstance(name, str) or name.lower() not in spell_ids ]
+    # monster_spells is unique on (monster_id, spell_id)
+    wanted = list(dict.fromkeys( spell_ids[name.lower()] for name in spell_names if isinstance(name, str) and name.lower() in spell_ids ))
+
+    if parent.id is None:
+        # the join rows need the new monster's id
+        db.session.flush()
+
+    linked = set()
+    for ms in parent.monster_spells:
+        if ms.spell_id in wanted:
+            linked.add(ms.spell_id)
+        else:
+            db.session.delete(ms)
+
+    rows = [ { 'monster_id': parent.id, 'spell_id': spell_id } for spell_id in wanted if spell_id not in linked ]
+    if rows:
+        db.session.execute(insert(MonsterSpell), rows)
+        record_bulk_insert(db.session, MonsterSpell, rows)
+    return missing
@@ -0,0 +1,92 @@
+from sqlalchemy.orm import selectinload, load_only, raiseload
+from models import Monster, MonsterSpell
+
+# ----------- LOADER STRATEGIES ----------- #
+
+# every collection walked by Monster.to_dict
+MONSTER_RELATIONSHIPS = [
+    'skills',
+    'saving_throws',
+    'special_abilities',
+    'senses',
+    'speeds',
+    'languages',
+    'damage_resistances',
+    'damage_immunities',
+    'damage_vulnerabilities',
+    'condition_immunities',
+    'actions',
+]
+
+
+# monster_relationship_loaders ##########
+# return dict[name:str, sqlalchemy.orm.Load]
+#
+# one selectin loader per relationship serialized
+# by Monster.to_dict, batched into one IN query
+# per relationship so the number of queries per
+# request does not grow with the page size
+# ################################
+def monster_relationship_loaders():
+    loaders = { name: selectinload(getattr(Monster, name)) for name in MONSTER_RELATIONSHIPS }
+    # the spells association proxy reads monster_spells then each spell
+    loaders['spells'] = selectinload(Monster.monster_spells).selectinload(MonsterSpell.spell)
+    return loaders
+
+
+# monster_loader_options ##########
+# return list[sqlalchemy.orm.Load]
+# ################################
+def monster_loader_options():
+    return list(monster_relationship_loaders().values())
+
+
+# parse_list_param ##########
+# params: value:str|None
+# return list[str]|None
+#
+# example: "id, name,category" -> ["id", "name", "category"]
+# ##########################
+def parse_list_param(value):
+    if value is None:
+        return None
+    return [ v.strip() for v in value.split(',') if v.strip() ]
+
+
+# fieldset_loader_options ##########
+# params: model:class, fields:str|None, include:str|None,
+# relationship_loaders:dict[str, Load], loaded_columns:list[str]
+#
+# return (only:tuple[str], options:list[sqlalchemy.orm.Load])
+#
+# with no fields or include every column and
+# relationship is loaded and only is empty so
+# to_dict serializes the full model.
+#
+# otherwise only the requested columns (always
+# with id) are selected, the rest are deferred,
+# only the included relationships are loaded and
+# every other relationship raises if touched.
+# loaded_columns are selected without being
+# serialized, e.g. a sort column for a cursor.
+# unknown names are ignored
+# ################################
+def fieldset_loader_options(model, fields, include, relationship_loaders={}, loaded_columns=()):
+    fields = parse_list_param(fields)
+    include = parse_list_param(include)
+
+    if fields is None and include is None:
+        return (), list(relationship_loaders.values())
+
+    column_names = model.__table__.columns.keys()
+    # columns the model never serializes, e.g. version
+    hidden = [ r[1:] for r in model.serialize_rules if r.startswith('-') and '.' not in r ]
+    columns = [ c for c in column_names if (fields is None or c in fields or c == 'id') and c not in hidden ]
+    relationships = [ r for r in relationship_loaders if include and r in include ]
+    loaded = columns + [ c for c in loaded_columns if c in column_names and c not in columns ]
+
+    options = [ load_only(*[ getattr(model, c) for c in loaded ], raiseload=True) ]
+    options += [ relationship_loaders[r] for r in relationships ]
+    options.append( raiseload('*') )
+
+    return tuple(columns + relationships), options
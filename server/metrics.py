@@ -0,0 +1,316 @@
+import time
+import threading
+from flask import request, g, current_app, has_app_context, has_request_context
+from sqlalchemy import event
+
+# ----------- METRICS ----------- #
+#
+# Request and database metrics kept in process and
+# served at /metrics in the Prometheus text format.
+#
+# Per request, labelled by blueprint, endpoint and
+# method (and status for the counter):
+#     http_requests_total
+#     http_request_duration_seconds     histogram
+#     http_response_size_bytes          histogram
+#     db_statements_per_request         histogram
+#     db_seconds_per_request            histogram
+#
+# Per engine ('primary', 'replica_<n>'):
+#     db_statements_total
+#     db_statement_seconds_total
+#     db_pool_checkout_seconds          histogram
+#     db_pool_checked_out               gauge
+#     db_pool_size                      gauge
+#
+# Statements are timed with the engine's cursor
+# events. Pool checkout time is the time spent
+# getting a DBAPI connection, waiting on a full pool
+# and opening new connections included. Streamed
+# responses are measured when their last chunk has
+# been sent. Each worker process has its own metrics.
+# ###############################
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+REQUEST_LABELS = ('blueprint', 'endpoint', 'method')
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join( f'{name}="{escape_label(value)}"' for name, value in zip(names, values) ) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Counter ##########
+# params: name:str, help:str, labels:tuple[str]
+# ##################
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, values=(), amount=1):
+        with self.lock:
+            self.values[values] = self.values.get(values, 0) + amount
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def samples(self):
+        with self.lock:
+            return [ (self.name, format_labels(self.labels, values), value) for values, value in sorted(self.values.items()) ]
+
+# END Counter #
+
+
+# Histogram ##########
+# params: name:str, help:str, labels:tuple[str], buckets:tuple[float]
+# ####################
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, values, amount):
+        with self.lock:
+            series = self.series.get(values)
+            if series is None:
+                series = self.series[values] = { 'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0 }
+            for i, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += amount
+            series['count'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+    # samples ##########
+    # buckets are cumulative, the +Inf bucket is the count
+    # ##################
+    def samples(self):
+        samples = []
+        with self.lock:
+            for values, series in sorted(self.series.items()):
+                for bound, count in [ *zip(self.buckets, series['buckets']), (float('inf'), series['count']) ]:
+                    samples.append((f"{self.name}_bucket", format_labels((*self.labels, 'le'), (*values, format_value(bound))), count))
+                samples.append((f"{self.name}_sum", format_labels(self.labels, values), series['sum']))
+                samples.append((f"{self.name}_count", format_labels(self.labels, values), series['count']))
+        return samples
+
+# END Histogram #
+
+
+# Metrics ##########
+# every metric of one app, and the engines it reports
+# the pool gauges of
+# ##################
+class Metrics:
+
+    def __init__(self):
+        self.engines = {}
+        self.requests = Counter('http_requests_total', "HTTP requests", (*REQUEST_LABELS, 'status'))
+        self.request_duration = Histogram('http_request_duration_seconds', "HTTP request latency", REQUEST_LABELS, LATENCY_BUCKETS)
+        self.response_size = Histogram('http_response_size_bytes', "HTTP response body size", REQUEST_LABELS, SIZE_BUCKETS)
+        self.request_statements = Histogram('db_statements_per_request', "SQL statements run by one request", REQUEST_LABELS, STATEMENT_BUCKETS)
+        self.request_db_seconds = Histogram('db_seconds_per_request', "Time one request spent running SQL statements", REQUEST_LABELS, LATENCY_BUCKETS)
+        self.statements = Counter('db_statements_total', "SQL statements run", ('engine',))
+        self.statement_seconds = Counter('db_statement_seconds_total', "Time spent running SQL statements", ('engine',))
+        self.checkout = Histogram('db_pool_checkout_seconds', "Time spent getting a connection from the pool", ('engine',), CHECKOUT_BUCKETS)
+
+    def all(self):
+        return [ self.requests, self.request_duration, self.response_size, self.request_statements, self.request_db_seconds, self.statements, self.statement_seconds, self.checkout ]
+
+    def clear(self):
+        for metric in self.all():
+            metric.clear()
+
+    # record_request ##########
+    # params: labels:tuple, status:int, seconds:float,
+    #         size:int, db:dict of statements and seconds
+    # #########################
+    def record_request(self, labels, status, seconds, size, db):
+        self.requests.inc((*labels, str(status)))
+        self.request_duration.observe(labels, seconds)
+        self.response_size.observe(labels, size)
+        self.request_statements.observe(labels, db['statements'])
+        self.request_db_seconds.observe(labels, db['seconds'])
+
+    def pool_gauges(self):
+        checked_out = []
+        size = []
+        for name, engine in sorted(self.engines.items()):
+            pool = engine.pool
+            labels = format_labels(('engine',), (name,))
+            if hasattr(pool, 'checkedout'):
+                checked_out.append(('db_pool_checked_out', labels, pool.checkedout()))
+            if hasattr(pool, 'size'):
+                size.append(('db_pool_size', labels, pool.size()))
+        return [
+            ('db_pool_checked_out', 'gauge', "Connections checked out of the pool", checked_out),
+            ('db_pool_size', 'gauge', "Connections the pool keeps open", size),
+        ]
+
+    # render ##########
+    # return str in the Prometheus text format 0.0.4
+    # #################
+    def render(self):
+        families = [ (m.name, m.kind, m.help, m.samples()) for m in self.all() ] + self.pool_gauges()
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend( f"{sample}{labels} {format_value(value)}" for sample, labels, value in samples )
+        return '\n'.join(lines) + '\n'
+
+# END Metrics #
+
+
+def get_metrics():
+    if has_app_context():
+        return current_app.extensions.get('metrics')
+    return None
+
+
+# ----------- DATABASE ----------- #
+
+# request_db ##########
+# return dict of statements and seconds for the
+# current request, None outside of a request
+# #####################
+def request_db():
+    if has_request_context():
+        return g.get('metrics_db')
+    return None
+
+
+# instrument_engine ##########
+# params: metrics:Metrics, engine:sqlalchemy.Engine, name:str
+#
+# times the engine's statements and pool checkouts,
+# an engine is only instrumented once per name
+# ############################
+def instrument_engine(metrics, engine, name):
+    if metrics.engines.get(name) is engine:
+        return
+    metrics.engines[name] = engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_started')
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        metrics.statements.inc((name,))
+        metrics.statement_seconds.inc((name,), seconds)
+        db = request_db()
+        if db is not None:
+            db['statements'] += 1
+            db['seconds'] += seconds
+
+    def handle_error(context):
+        # a failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get('metrics_started'):
+            context.connection.info['metrics_started'].pop()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+
+    # Connection calls engine.raw_connection for every
+    # checkout, and the pool has no event before one
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+        try:
+            return raw_connection()
+        finally:
+            metrics.checkout.observe((name,), time.perf_counter() - started)
+
+    engine.raw_connection = timed_raw_connection
+
+
+# ----------- REQUESTS ----------- #
+
+def request_labels():
+    endpoint = request.endpoint or 'none'
+    return (request.blueprint or '', endpoint, request.method)
+
+
+def start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_db = { 'statements': 0, 'seconds': 0.0 }
+
+
+# record_response ##########
+# streamed bodies are counted as they are sent and
+# recorded when the response is closed
+# ##########################
+def record_response(response):
+    metrics = get_metrics()
+    started = g.get('metrics_started')
+    if metrics is None or started is None:
+        return response
+    labels = request_labels()
+    db = g.metrics_db
+
+    if not response.is_streamed:
+        metrics.record_request(labels, response.status_code, time.perf_counter() - started, response.calculate_content_length() or 0, db)
+        return response
+
+    sent = { 'bytes': 0 }
+    chunks = response.response
+
+    def counted():
+        for chunk in chunks:
+            sent['bytes'] += len(chunk)
+            yield chunk
+
+    response.response = counted()
+    response.call_on_close(lambda: metrics.record_request(labels, response.status_code, time.perf_counter() - started, sent['bytes'], db))
+    return response
+
+
+# init_metrics ##########
+# params: app:flask.app.Flask, engines:dict of name: Engine
+#
+# reads METRICS_ENABLED from the app config
+# #######################
+def init_metrics(app, engines):
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    metrics = app.extensions['metrics'] = Metrics()
+    for name, engine in engines.items():
+        instrument_engine(metrics, engine, name)
+    app.before_request(start_request)
+    app.after_request(record_response)
@@ -0,0 +1,30 @@
+"""added version and updated_at to monsters and spells
+
+Revision ID: a7d3c5e19b42
+Revises: e2b7a9c4d613
+Create Date: 2026-10-18 11:42:05.117302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c5e19b42'
+down_revision = 'e2b7a9c4d613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ['monsters_table', 'spells_table']:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    # plain drops so sqlite keeps the full text search triggers
+    for table in ['monsters_table', 'spells_table']:
+        op.drop_column(table, 'updated_at')
+        op.drop_column(table, 'version')
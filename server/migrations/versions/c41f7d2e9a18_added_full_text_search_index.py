@@ -0,0 +1,62 @@
+"""added full text search index
+
+Revision ID: c41f7d2e9a18
+Revises: 75a11461774b
+Create Date: 2026-10-18 10:12:41.503117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f7d2e9a18'
+down_revision = '75a11461774b'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_SOURCES = [
+    ('monsters_table', ['name', 'category', 'sub_category', 'alignment']),
+    ('spells_table', ['name', 'description', 'school', 'at_higher_levels']),
+    ('actions_table', ['name', 'description']),
+    ('special_abilities_table', ['name', 'description']),
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, column_list in SEARCH_SOURCES:
+        columns = ', '.join(column_list)
+        new_values = ', '.join( f"new.{c}" for c in column_list )
+        old_values = ', '.join( f"old.{c}" for c in column_list )
+        fts = f"{table}_fts"
+
+        if dialect == 'sqlite':
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', content_rowid='id', tokenize='porter unicode61')")
+            op.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+            op.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            END""")
+            op.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+            END""")
+            op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        elif dialect == 'postgresql':
+            document = " || ' ' || ".join( f"coalesce({c}, '')" for c in column_list )
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (to_tsvector('english', {document}))")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, column_list in SEARCH_SOURCES:
+        if dialect == 'sqlite':
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_insert")
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_delete")
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_update")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+        elif dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
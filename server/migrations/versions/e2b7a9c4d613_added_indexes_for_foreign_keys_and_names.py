@@ -0,0 +1,63 @@
+"""added indexes for foreign keys and names
+
+Revision ID: e2b7a9c4d613
+Revises: c41f7d2e9a18
+Create Date: 2026-10-18 11:02:17.284519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7a9c4d613'
+down_revision = 'c41f7d2e9a18'
+branch_labels = None
+depends_on = None
+
+
+MONSTER_CHILD_TABLES = [
+    'skills_table',
+    'saving_throws_table',
+    'special_abilities_table',
+    'senses_table',
+    'speed_table',
+    'languages_table',
+    'damage_resistances_table',
+    'damage_immunities_table',
+    'damage_vulnerabilities_table',
+    'condition_immunities_table',
+    'actions_table',
+]
+
+
+def upgrade():
+    for table in MONSTER_CHILD_TABLES:
+        op.create_index(op.f(f'ix_{table}_monster_id'), table, ['monster_id'], unique=False)
+
+    # keep the first association of any duplicated monster / spell pair
+    op.execute("""
+        DELETE FROM monster_spells_table WHERE id NOT IN (
+            SELECT MIN(id) FROM monster_spells_table GROUP BY monster_id, spell_id
+        )
+    """)
+    op.create_index('ix_monster_spells_table_monster_id_spell_id', 'monster_spells_table', ['monster_id', 'spell_id'], unique=True)
+    op.create_index(op.f('ix_monster_spells_table_spell_id'), 'monster_spells_table', ['spell_id'], unique=False)
+
+    op.create_index(op.f('ix_monsters_table_name'), 'monsters_table', ['name'], unique=False)
+    op.create_index('ix_monsters_table_lower_name', 'monsters_table', [sa.text('lower(name)')], unique=False)
+    op.create_index(op.f('ix_spells_table_name'), 'spells_table', ['name'], unique=False)
+    op.create_index('ix_spells_table_lower_name', 'spells_table', [sa.text('lower(name)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_spells_table_lower_name', table_name='spells_table')
+    op.drop_index(op.f('ix_spells_table_name'), table_name='spells_table')
+    op.drop_index('ix_monsters_table_lower_name', table_name='monsters_table')
+    op.drop_index(op.f('ix_monsters_table_name'), table_name='monsters_table')
+
+    op.drop_index(op.f('ix_monster_spells_table_spell_id'), table_name='monster_spells_table')
+    op.drop_index('ix_monster_spells_table_monster_id_spell_id', table_name='monster_spells_table')
+
+    for table in MONSTER_CHILD_TABLES:
+        op.drop_index(op.f(f'ix_{table}_monster_id'), table_name=table)
@@ -1,15 +1,26 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 from sqlalchemy.orm import validates
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy_serializer import SerializerMixin
 from damage_types import DAMAGE_TYPES
+from replicas import RoutingSession
 
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
 
-db = SQLAlchemy(metadata=metadata)
+db = SQLAlchemy(metadata=metadata, session_options={ 'class_': RoutingSession })
+
+
+# utc_now ##########
+# return naive utc datetime, the format stored in
+# the updated_at columns
+# ##################
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
 
 # MONSTER #############################################
 # Relationships:
@@ -32,7 +43,7 @@ class Monster(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    name = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
     size = db.Column(db.String, default="medium")
     alignment = db.Column(db.String)
 
@@ -73,9 +84,22 @@ class Monster(db.Model, SerializerMixin):
 
     source = db.Column(db.String)
 
+    # VERSION #
+    # bumped on every change to the row or anything
+    # it serializes, see conditional.py
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=utc_now)
+
+    # INDEXES #
+
+    __table_args__ = (
+        db.Index("ix_monsters_table_lower_name", db.func.lower(name)),
+    )
+
     # SERIALIZER #
 
-    serialize_rules = ("-skills.monster", "-saving_throws.monster", "-special_abilities.monster", "-senses.monster", "-speeds.monster", "-languages.monster", "-damage_resistances.monster", "-damage_immunities.monster", "-damage_vulnerabilities.monster", "-condition_immunities.monster", "-actions.monster", "-monster_spells", "spells", "-spells.monster_spells")
+    serialize_rules = ("-version", "-updated_at", "-skills.monster", "-saving_throws.monster", "-special_abilities.monster", "-senses.monster", "-speeds.monster", "-languages.monster", "-damage_resistances.monster", "-damage_immunities.monster", "-damage_vulnerabilities.monster", "-condition_immunities.monster", "-actions.monster", "-monster_spells", "spells", "-spells.monster_spells")
 
     # VALIDATIONS #
 
@@ -151,7 +175,7 @@ class Skill(db.Model, SerializerMixin):
     value = db.Column(db.Integer, default=0)
     name = db.Column(db.String, nullable=False)
 
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="skills")
 
     # SERIALIZER #
@@ -186,7 +210,7 @@ class SavingThrow(db.Model, SerializerMixin):
     name = db.Column(db.String)
     value = db.Column(db.Integer)
 
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="saving_throws")
 
     # SERIALIZER #
@@ -222,7 +246,7 @@ class SpecialAbility(db.Model, SerializerMixin):
     name = db.Column(db.String, nullable=False)
     description = db.Column(db.String, nullable=False)
 
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="special_abilities")
 
     serialize_rules = ("-monster",)
@@ -240,7 +264,7 @@ class Sense(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     distance = db.Column(db.Integer)
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="senses")
 
     serialize_rules = ("-monster",)
@@ -258,7 +282,7 @@ class Speed(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     distance = db.Column(db.Integer)
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="speeds")
 
     serialize_rules = ("-monster",)
@@ -275,7 +299,7 @@ class Language(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="languages")
 
     serialize_rules = ("-monster",)
@@ -300,7 +324,7 @@ class DamageResistance(db.Model, SerializerMixin):
     damage_type = db.Column(db.String, nullable=False)
     
     monster = db.relationship("Monster", back_populates="damage_resistances")
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
 
     # @validates("damage_type")
     # def validate_damage_type(self, k, v):
@@ -318,7 +342,7 @@ class DamageImmunity(db.Model, SerializerMixin):
 
     damage_type = db.Column(db.String, nullable=False)
 
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="damage_immunities")
 
 
@@ -339,7 +363,7 @@ class DamageVulnerability(db.Model, SerializerMixin):
     damage_type = db.Column(db.String, nullable=False)
     
     monster = db.relationship("Monster", back_populates="damage_vulnerabilities")
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
 
     # @validates("damage_type")
     # def validate_damage_type(self, k, v):
@@ -362,7 +386,7 @@ class ConditionImmunity(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
     condition_type = db.Column(db.String, nullable=False)
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="condition_immunities")
 
     serialize_rules = ("-monster",)
@@ -394,7 +418,7 @@ class Action(db.Model, SerializerMixin):
     reaction = db.Column(db.Boolean, default=False)
     name = db.Column(db.String)
     description = db.Column(db.String, nullable=False)
-    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
+    monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"), index=True)
     monster = db.relationship("Monster", back_populates="actions")
 
     serialize_rules = ("-monster",)
@@ -420,7 +444,7 @@ class Spell(db.Model, SerializerMixin):
     # COLUMNS #
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
     description = db.Column(db.String)
     level = db.Column(db.Integer, default=0)
     casting_time = db.Column(db.String)
@@ -440,13 +464,26 @@ class Spell(db.Model, SerializerMixin):
 
     source = db.Column(db.String)
 
+    # VERSION #
+    # bumped on every change to the row or anything
+    # it serializes, see conditional.py
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    updated_at = db.Column(db.DateTime, default=utc_now)
+
+    # INDEXES #
+
+    __table_args__ = (
+        db.Index("ix_spells_table_lower_name", db.func.lower(name)),
+    )
+
     # RELATIONSHIPS #
 
     monster_spells = db.relationship("MonsterSpell", back_populates="spell")
 
     # SERIALIZER #
 
-    serialize_rules = ("-monster_spells",)
+    serialize_rules = ("-monster_spells", "-version", "-updated_at")
 
     # VALIDATIONS #
 
@@ -472,14 +509,42 @@ class MonsterSpell(db.Model, SerializerMixin):
 
     id = db.Column(db.Integer, primary_key=True)
 
-    spell_id = db.Column(db.Integer, db.ForeignKey("spells_table.id"))
+    spell_id = db.Column(db.Integer, db.ForeignKey("spells_table.id"), index=True)
     spell = db.relationship("Spell", back_populates="monster_spells")
 
     monster_id = db.Column(db.Integer, db.ForeignKey("monsters_table.id"))
     monster = db.relationship("Monster", back_populates="monster_spells")
 
+    # a monster knows each spell once, also serves lookups by monster_id
+    __table_args__ = (
+        db.Index("ix_monster_spells_table_monster_id_spell_id", "monster_id", "spell_id", unique=True),
+    )
+
     serialize_rules = ("-monster",)
 
 # END MonsterSpell #
     
+# CATALOG FILE ########################################
+# Example: CatalogFile(entity="monster", path="abjurer.json",
+#          content_hash="9f86d0...", entity_id=1)
+#
+# manifest of the files the catalog import read,
+# path is relative to the entity's source directory
+# ####################################################
+
+class CatalogFile(db.Model, SerializerMixin):
+    __tablename__ = "catalog_files_table"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String, nullable=False)
+    path = db.Column(db.String, nullable=False)
+    content_hash = db.Column(db.String, nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_catalog_files_table_entity_path", "entity", "path", unique=True),
+    )
+
+# END CatalogFile #
+
 # TODO: Build Speed model for monster speeds OR add column for speeds
\ No newline at end of file
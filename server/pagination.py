@@ -0,0 +1,80 @@
+import json
+import base64
+from sqlalchemy import tuple_
+
+# ----------- KEYSET PAGINATION ----------- #
+
+
+# encode_cursor ##########
+# params: sort:str, value:any, id:int
+# return str
+#
+# cursors are opaque to clients, they hold the
+# sort column name and the (sort value, id) of
+# the last row on the previous page
+# ########################
+def encode_cursor(sort, value, id):
+    raw = json.dumps([sort, value, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+# decode_cursor ##########
+# params: cursor:str, sort:str
+# return (value:any, id:int)
+#
+# raises ValueError if the cursor is malformed, was
+# created for a different sort column or holds a
+# value that is not a str, int, float or None
+# ########################
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError(f"cursor {cursor} is not a valid cursor")
+    if cursor_sort != sort or not isinstance(id, int):
+        raise ValueError(f"cursor {cursor} is not a valid cursor for sort {sort}")
+    if isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))):
+        raise ValueError(f"cursor {cursor} is not a valid cursor")
+    return value, id
+
+
+# paginate_by_cursor ##########
+# params: query:Query, model:class, sort:str,
+# sortable:list[str], cursor:str, page_count:int
+#
+# return (items:list[model], next_cursor:str|None)
+#
+# orders by (sort column, id) and seeks past the
+# cursor instead of using OFFSET so every page
+# costs the same as the first one
+# #############################
+def paginate_by_cursor(query, model, sort, sortable, cursor, page_count):
+    if sort not in sortable:
+        raise ValueError(f"sort must be one of ({ ', '.join(sortable) }) but got {sort}")
+    page_count = int(page_count)
+    if page_count < 1:
+        raise ValueError(f"page_count must be 1 or greater but received {page_count}")
+
+    sort_column = getattr(model, sort)
+    if sort == 'id':
+        order = [ model.id ]
+    else:
+        order = [ sort_column, model.id ]
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        if sort == 'id':
+            query = query.where(model.id > last_id)
+        else:
+            query = query.where(tuple_(sort_column, model.id) > tuple_(value, last_id))
+
+    items = query.order_by(*order).limit(page_count + 1).all()
+
+    next_cursor = None
+    if len(items) > page_count:
+        items = items[:page_count]
+        last = items[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort), last.id)
+
+    return items, next_cursor
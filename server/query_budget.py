@@ -0,0 +1,178 @@
+import os
+import re
+import traceback
+from flask import request, g, current_app, has_request_context
+from sqlalchemy import event
+
+# ----------- QUERY BUDGET ----------- #
+#
+# Counts and fingerprints every SQL statement a
+# request runs. A fingerprint is the statement with
+# its literals, placeholders and IN lists collapsed,
+# so the lazy loads of one relationship for twenty
+# monsters share a fingerprint.
+#
+# When one fingerprint runs QUERY_REPEAT_THRESHOLD
+# times in a request it is flagged as an N+1 pattern:
+# the endpoint, the statement and the call stack of
+# the repeat that reached the threshold are logged.
+#
+# Every endpoint has a budget of statements, from
+# QUERY_BUDGETS[endpoint], then @query_budget(n) on
+# the view, then QUERY_BUDGET. With QUERY_BUDGET_STRICT
+# (on in tests) a request over its budget raises
+# QueryBudgetExceeded, otherwise it is logged.
+# Statements run while a streamed body is sent come
+# after the check and are not counted.
+# ####################################
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+STACK_DEPTH = 8
+
+LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|\$\d+|:\w+'), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?)'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+# fingerprint ##########
+# params: statement:str
+# return str
+# ######################
+def fingerprint(statement):
+    for pattern, replacement in LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+# app_stack ##########
+# return list[str] the innermost frames of the app's
+# own modules, without this one
+# ####################
+def app_stack():
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(SERVER_DIR) and frame.filename != __file__ and 'site-packages' not in frame.filename
+    ]
+    return [ f"{os.path.relpath(frame.filename, SERVER_DIR)}:{frame.lineno} in {frame.name}: {frame.line}" for frame in frames[-STACK_DEPTH:] ]
+
+
+# ----------- STATEMENTS ----------- #
+
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    log = g.get('query_log') if has_request_context() else None
+    if log is None:
+        return
+    log['count'] += 1
+    key = fingerprint(statement)
+    seen = log['fingerprints'].get(key)
+    if seen is None:
+        seen = log['fingerprints'][key] = { 'count': 0, 'stack': None }
+    seen['count'] += 1
+    if seen['count'] == log['repeat_threshold']:
+        seen['stack'] = app_stack()
+
+
+# watch_engine ##########
+# params: engine:sqlalchemy.Engine
+# #######################
+def watch_engine(engine):
+    if not event.contains(engine, 'before_cursor_execute', record_statement):
+        event.listen(engine, 'before_cursor_execute', record_statement)
+
+
+# ----------- BUDGETS ----------- #
+
+# query_budget ##########
+# params: statements:int most statements a request to
+# the view may run
+#
+# goes right under the route decorator so the budget
+# is set on the registered view
+# example: @query_budget(4)
+# #######################
+def query_budget(statements):
+    def decorator(view):
+        view.query_budget = statements
+        return view
+    return decorator
+
+
+# endpoint_budget ##########
+# return int or None for no budget
+# ##########################
+def endpoint_budget():
+    budgets = current_app.config.get('QUERY_BUDGETS') or {}
+    if request.endpoint in budgets:
+        return budgets[request.endpoint]
+    view = current_app.view_functions.get(request.endpoint)
+    if view is not None and getattr(view, 'query_budget', None) is not None:
+        return view.query_budget
+    return current_app.config.get('QUERY_BUDGET')
+
+
+def repeated_statements(log):
+    return sorted(
+        ( (key, seen) for key, seen in log['fingerprints'].items() if seen['count'] >= log['repeat_threshold'] ),
+        key=lambda item: -item[1]['count']
+    )
+
+
+# query_report ##########
+# params: log:dict
+# return str the statement count and the repeated
+# statements with their stacks
+# #######################
+def query_report(log):
+    lines = [ f"{request.endpoint} ({request.method} {request.path}) ran {log['count']} statements" ]
+    for key, seen in repeated_statements(log):
+        lines.append(f"  {seen['count']}x {key}")
+        lines.extend( f"      {frame}" for frame in seen['stack'] or [] )
+    return '\n'.join(lines)
+
+
+# ----------- REQUESTS ----------- #
+
+def start_query_log():
+    g.query_log = { 'count': 0, 'fingerprints': {}, 'repeat_threshold': int(current_app.config['QUERY_REPEAT_THRESHOLD']) }
+
+
+def check_query_log(response):
+    log = g.pop('query_log', None)
+    if log is None:
+        return response
+    response.headers['X-Query-Count'] = str(log['count'])
+
+    budget = endpoint_budget()
+    if budget is not None and log['count'] > budget:
+        message = f"query budget of {budget} exceeded: {query_report(log)}"
+        if current_app.config.get('QUERY_BUDGET_STRICT'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    elif repeated_statements(log):
+        current_app.logger.warning(f"repeated statements, possible N+1: {query_report(log)}")
+    return response
+
+
+# init_query_budget ##########
+# params: app:flask.app.Flask, engines:list[Engine]
+#
+# reads QUERY_BUDGET_ENABLED, QUERY_BUDGET,
+# QUERY_BUDGETS, QUERY_BUDGET_STRICT and
+# QUERY_REPEAT_THRESHOLD from the app config
+# ############################
+def init_query_budget(app, engines):
+    if not app.config.get('QUERY_BUDGET_ENABLED'):
+        return
+    app.extensions['query_budget'] = True
+    for engine in engines:
+        watch_engine(engine)
+    app.before_request(start_query_log)
+    app.after_request(check_query_log)
@@ -0,0 +1,123 @@
+import time
+import itertools
+from flask import request, g, current_app, has_request_context, has_app_context
+from sqlalchemy import create_engine
+from flask_sqlalchemy.session import Session
+
+# ----------- READ REPLICAS ----------- #
+#
+# With REPLICA_DATABASE_URIS set, every replica gets
+# an engine of its own, built with the same
+# SQLALCHEMY_ENGINE_OPTIONS as the primary. A GET or
+# HEAD request is given the next replica in turn and
+# RoutingSession sends its queries there.
+# Everything else, flushes
+# and insert/update/delete statements included, goes
+# to the primary, as do the cli commands and
+# migrations.
+# An app can also replace the primary engine, as the
+# asgi app does with async engines, by setting
+# app.extensions['primary_engine'].
+#
+# A request that writes sets the READ_PRIMARY_COOKIE
+# for READ_YOUR_WRITES_SECONDS, and while the client
+# sends it back its reads go to the primary too, so
+# a client sees its own writes even before the
+# replicas have caught up.
+# #####################################
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+READ_PRIMARY_COOKIE = 'read_primary_until'
+
+
+# RoutingSession ##########
+# db.session class, see models.py
+# #########################
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = read_replica()
+        if replica is not None and bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return replica
+        primary = primary_engine()
+        if primary is not None and bind is None:
+            return primary
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+# END RoutingSession #
+
+
+# read_replica ##########
+# return engine of the replica serving this request,
+# None for the primary
+# #######################
+def read_replica():
+    if has_request_context():
+        return g.get('db_replica')
+    return None
+
+
+# primary_engine ##########
+# return engine replacing the primary for this app,
+# None for the flask-sqlalchemy engine
+# #########################
+def primary_engine():
+    if has_app_context():
+        return current_app.extensions.get('primary_engine')
+    return None
+
+
+# reads_own_writes ##########
+# return True while the client's last write is
+# inside its READ_YOUR_WRITES_SECONDS window
+# ############################
+def reads_own_writes():
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE) or 0) > time.time()
+    except ValueError:
+        return False
+
+
+# init_replicas ##########
+# params: app:flask.app.Flask
+#
+# reads REPLICA_DATABASE_URIS and
+# READ_YOUR_WRITES_SECONDS from the app config
+# ########################
+def init_replicas(app):
+    uris = app.config.get('REPLICA_DATABASE_URIS') or []
+    if not uris:
+        return
+
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    set_replica_engines(app, [ create_engine(uri, **options) for uri in uris ])
+
+    window = int(app.config.get('READ_YOUR_WRITES_SECONDS') or 0)
+
+    @app.before_request
+    def choose_database():
+        if request.method in READ_METHODS and not reads_own_writes():
+            g.db_replica = next(app.extensions['replicas']['next'])
+        else:
+            g.db_replica = None
+
+    @app.after_request
+    def stick_to_primary(response):
+        if window and request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(READ_PRIMARY_COOKIE, str(int(time.time()) + window), max_age=window, httponly=True, samesite='Lax')
+        return response
+
+
+# replica_engines ##########
+# params: app:flask.app.Flask
+# return list[sqlalchemy.Engine]
+# ##########################
+def replica_engines(app):
+    return app.extensions.get('replicas', {}).get('engines', [])
+
+
+# set_replica_engines ##########
+# params: app:flask.app.Flask, engines:list[sqlalchemy.Engine]
+# ##############################
+def set_replica_engines(app, engines):
+    app.extensions['replicas'] = { 'engines': engines, 'next': itertools.cycle(engines) }
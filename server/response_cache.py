@@ -0,0 +1,317 @@
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from models import db, Monster, Spell
+from conditional import request_key
+from replicas import reads_own_writes
+from helpers import NESTED_MONSTER_DATA
+from search import SEARCH_SOURCES
+
+# ----------- RESPONSE CACHE ----------- #
+#
+# GET responses are kept in process, keyed by path
+# and normalized query string, until they expire,
+# are evicted to stay under the memory bound (least
+# recently used first) or are invalidated by a write.
+#
+# Every cached response carries tags:
+#     monster:<id>              /monsters/:id
+#     monster:<id>:<resource>   /monsters/:id/<resource>
+#     spell:<id>     /spells/:id
+#     monsters       /monsters pages
+#     spells         /spells pages
+#     search         /search results
+#
+# Writes are collected from each flush and from
+# conditional.record_bulk_insert, and the tags
+# they affect are invalidated when the session
+# commits, so a rolled back write invalidates nothing.
+# /search results are only invalidated by writes to
+# the rows and columns the search index is built from.
+# A write to one nested resource only invalidates
+# the monster and that resource, and a write to the
+# monster's own columns leaves its nested routes alone.
+# A client reading its own writes from the primary
+# (see replicas.py) never gets a cached body, which
+# may have come from a replica that is behind.
+# Each worker process has its own cache.
+# ######################################
+
+# nested model: resource name used in its tag
+NESTED_RESOURCES = { model: key for key, (model, _, _) in NESTED_MONSTER_DATA.items() }
+
+# searched model: columns its search hits are built from
+SEARCH_COLUMNS = {
+    mapper.class_: source['columns'] + ([ source['monster_id'] ] if source['monster_id'] else [])
+    for source in SEARCH_SOURCES
+    for mapper in db.Model.registry.mappers if mapper.local_table.name == source['table']
+}
+
+
+# ResponseCache ##########
+# params: max_bytes:int, ttl:int seconds
+# ########################
+class ResponseCache:
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tags = {}
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    # get ##########
+    # params: key:str
+    # return (status:int, headers:list, body:bytes) or None
+    # ##############
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry['expires_at'] <= time.monotonic():
+                self.remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry['response']
+
+    # set ##########
+    # params: key:str, response:tuple, tags:list[str]
+    # ##############
+    def set(self, key, response, tags):
+        size = len(key) + len(response[2]) + sum( len(k) + len(v) for k, v in response[1] )
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = { 'response': response, 'tags': tags, 'size': size, 'expires_at': time.monotonic() + self.ttl }
+            self.size += size
+            for tag in tags:
+                self.tags.setdefault(tag, set()).add(key)
+            while self.size > self.max_bytes:
+                self.remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    # invalidate ##########
+    # params: tags:list[str]
+    # #####################
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                for key in list(self.tags.get(tag, ())):
+                    self.remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tags.clear()
+            self.size = 0
+
+    # remove ##########
+    # callers hold the lock
+    # #################
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        self.size -= entry['size']
+        for tag in entry['tags']:
+            keys = self.tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+# END ResponseCache #
+
+
+# init_response_cache ##########
+# params: app:flask.app.Flask
+#
+# reads RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_BYTES
+# and RESPONSE_CACHE_TTL from the app config
+# ##############################
+def init_response_cache(app):
+    if app.config.get('RESPONSE_CACHE_ENABLED'):
+        app.extensions['response_cache'] = ResponseCache(
+            int(app.config['RESPONSE_CACHE_MAX_BYTES']),
+            int(app.config['RESPONSE_CACHE_TTL'])
+        )
+
+
+def get_response_cache():
+    if has_app_context():
+        return current_app.extensions.get('response_cache')
+    return None
+
+
+# ----------- DECORATOR ----------- #
+
+# cached ##########
+# params: tag:str formatted with the url parameters
+#
+# example: @cached('monster:{id}')
+# #################
+def cached(tag):
+    def decorator(view):
+        @wraps(view)
+        def cached_view(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+
+            key = request_key()
+            # a client reading its own writes may be ahead of
+            # a body cached from a replica, so it only refreshes
+            # the cache from the primary
+            hit = None if reads_own_writes() else cache.get(key)
+            if hit:
+                status, headers, body = hit
+                response = current_app.response_class(body, status, headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response.make_conditional(request)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, (200, list(response.headers.items()), response.get_data()), [tag.format(**kwargs)])
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return cached_view
+    return decorator
+
+
+# ----------- INVALIDATION ----------- #
+
+# nested_resource_tags ##########
+# params: session:Session
+# return set[str]
+#
+# monster:<id>:<resource> for every nested row added,
+# changed or removed by this flush, and for every
+# resource of a deleted monster
+# ###############################
+def nested_resource_tags(session):
+    tags = set()
+    for instance in session.new:
+        if type(instance) in NESTED_RESOURCES:
+            tags.add(f"monster:{instance.monster_id}:{NESTED_RESOURCES[type(instance)]}")
+
+    for instance in session.dirty:
+        if type(instance) in NESTED_RESOURCES and session.is_modified(instance, include_collections=False):
+            # a moved row changes the old and the new monster
+            for monster_id in db.inspect(instance).attrs.monster_id.history.sum():
+                tags.add(f"monster:{monster_id}:{NESTED_RESOURCES[type(instance)]}")
+
+    for instance in session.deleted:
+        if type(instance) in NESTED_RESOURCES:
+            tags.add(f"monster:{instance.monster_id}:{NESTED_RESOURCES[type(instance)]}")
+        elif isinstance(instance, Monster):
+            tags.update( f"monster:{instance.id}:{resource}" for resource in NESTED_RESOURCES.values() )
+    return tags
+
+
+# search_changed ##########
+# params: session:Session
+# return True when this flush adds or removes a
+# searched row or changes one of its searched columns
+# ##########################
+def search_changed(session):
+    if any( type(instance) in SEARCH_COLUMNS for instance in list(session.new) + list(session.deleted) ):
+        return True
+    for instance in session.dirty:
+        columns = SEARCH_COLUMNS.get(type(instance))
+        if columns and any( db.inspect(instance).attrs[c].history.has_changes() for c in columns ):
+            return True
+    return False
+
+
+# collect_invalidated_tags ##########
+# runs after every flush, after conditional.py has
+# worked out which monsters and spells were bumped
+# ###################################
+def collect_invalidated_tags(session, flush_context):
+    monster_ids, spell_ids = session.info.get('bumped_rows', ((), ()))
+    monster_ids = set(monster_ids)
+    spell_ids = set(spell_ids)
+
+    for instance in list(session.new) + list(session.deleted):
+        if isinstance(instance, Monster):
+            monster_ids.add(instance.id)
+        elif isinstance(instance, Spell):
+            spell_ids.add(instance.id)
+
+    tags = session.info.setdefault('invalidated_tags', set())
+    if search_changed(session):
+        tags.add('search')
+    tags.update( f"monster:{id}" for id in monster_ids )
+    tags.update( f"spell:{id}" for id in spell_ids )
+    tags.update(nested_resource_tags(session))
+    if monster_ids:
+        tags.add('monsters')
+    if spell_ids:
+        tags.add('spells')
+
+
+# bulk_insert_tags ##########
+# params: session:Session
+# return set[str]
+#
+# tags for the rows recorded by
+# conditional.record_bulk_insert
+# ###########################
+def bulk_insert_tags(session):
+    tags = set()
+    for model, monster_ids in session.info.pop('bulk_inserted', {}).items():
+        if model in SEARCH_COLUMNS:
+            tags.add('search')
+        tags.add('spells' if model is Spell else 'monsters')
+        tags.update( f"monster:{id}" for id in monster_ids )
+        if model in NESTED_RESOURCES:
+            tags.update( f"monster:{id}:{NESTED_RESOURCES[model]}" for id in monster_ids )
+    return tags
+
+
+def invalidate_committed_tags(session):
+    tags = session.info.pop('invalidated_tags', set()) | bulk_insert_tags(session)
+    cache = get_response_cache()
+    if tags and cache is not None:
+        cache.invalidate(tags)
+
+
+def discard_invalidated_tags(session):
+    session.info.pop('invalidated_tags', None)
+
+
+event.listen(Session, 'after_flush', collect_invalidated_tags)
+event.listen(Session, 'after_commit', invalidate_committed_tags)
+event.listen(Session, 'after_rollback', discard_invalidated_tags)
@@ -1,3 +1,8 @@
 from .monster_routes import monster_routes_blueprint
 from .spell_routes import spell_routes_blueprint
 from .create_nested_monster_routes_blueprint import create_nested_monster_routes_blueprint
+from .search_routes import search_routes_blueprint
+
+from .cache_routes import cache_routes_blueprint
+from .metrics_routes import metrics_routes_blueprint
+from .admin_routes import admin_routes_blueprint
\ No newline at end of file
@@ -0,0 +1,48 @@
+import hmac
+from flask import Blueprint, request, current_app
+from slow_queries import get_slow_query_log
+admin_routes_blueprint = Blueprint('admin_routes_blueprint', __name__)
+
+# ------------------- ADMIN ROUTES ------------------- #
+
+# REQUIRE ADMIN TOKEN #########
+# every admin route needs Authorization: Bearer <ADMIN_TOKEN>,
+# and they are all off while ADMIN_TOKEN is not set
+#######################
+@admin_routes_blueprint.before_request
+def require_admin_token():
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        return { "error": "admin routes are disabled, set ADMIN_TOKEN to enable them" }, 404
+    header = request.headers.get('Authorization', '')
+    sent = header[len('Bearer '):].strip() if header.startswith('Bearer ') else ''
+    if not hmac.compare_digest(sent.encode(), token.encode()):
+        return { "error": "invalid admin token" }, 401, { 'WWW-Authenticate': 'Bearer' }
+
+
+# GET SLOW QUERIES #########
+# query params: sort:str 'duration' (default) or 'recent'
+# return { enabled:bool, threshold_ms, size, kept, slow_queries,
+# queries:list[{ sql, parameters, duration_ms, engine, endpoint, route, at, plan }] }
+#######################
+@admin_routes_blueprint.get('/admin/slow-queries')
+def get_slow_queries():
+    log = get_slow_query_log()
+    if log is None:
+        return { "enabled": False }, 200
+    SORT = request.args.get('sort') or 'duration'
+    if SORT not in ('duration', 'recent'):
+        return { "error": "sort must be one of duration, recent" }, 400
+    queries = log.worst() if SORT == 'duration' else log.recent()
+    return { "enabled": True, **log.stats(), "queries": queries }, 200
+
+
+# DELETE SLOW QUERIES #########
+# return None
+#######################
+@admin_routes_blueprint.delete('/admin/slow-queries')
+def delete_slow_queries():
+    log = get_slow_query_log()
+    if log is not None:
+        log.clear()
+    return {}, 204
@@ -0,0 +1,16 @@
+from flask import Blueprint
+from response_cache import get_response_cache
+cache_routes_blueprint = Blueprint('cache_routes_blueprint', __name__)
+
+# ------------------- CACHE ROUTES ------------------- #
+
+# GET CACHE STATS #########
+# return { enabled:bool, entries, size_bytes, max_bytes, ttl, hits, misses,
+# hit_ratio, evictions, expirations, invalidations }
+#######################
+@cache_routes_blueprint.get('/cache/stats')
+def get_cache_stats():
+    cache = get_response_cache()
+    if cache is None:
+        return { "enabled": False }, 200
+    return { "enabled": True, **cache.stats() }, 200
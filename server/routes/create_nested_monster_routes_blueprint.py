@@ -1,6 +1,11 @@
 from flask import Blueprint, request
 from models import db, Monster
-from helpers import replace_nested_monster_data, find_monster_by_id
+from helpers import find_monster_by_id
+from loaders import fieldset_loader_options
+from serializers import serialize, compile_serializer
+from conditional import conditional_on
+from response_cache import cached
+from query_budget import query_budget
 
 # create_nested_monster_routes_blueprint ####################
 # name:str = pluralized name of resource being added
@@ -10,15 +15,21 @@ from helpers import replace_nested_monster_data, find_monster_by_id
 # ################################################
 def create_nested_monster_routes_blueprint(name, model):
     nested_blueprint = Blueprint(f'{name}_routes_blueprint', __name__)
+    compile_serializer(model, (), ("-monster", "-monster_id"))
     
     # GET MONSTERS RESOURCES #########
+    # query params: optional fields:str
     # return models:list[model:dict]
     #################################
     @nested_blueprint.get(f"/monsters/<int:id>/{name.replace('_', '-')}")
+    @query_budget(4)
+    @cached('monster:{id}:' + name)
+    @conditional_on(Monster)
     def get_monster_languages(id):
-        m = find_monster_by_id(id)
+        only, options = fieldset_loader_options(model, request.args.get('fields'), None)
+        m = find_monster_by_id(id, load_relationships=False)
         if m:
-            return [ item.to_dict(rules=("-monster", "-monster_id")) for item in model.query.where(model.monster_id == id).all() ]
+            return [ serialize(item, only=only, rules=("-monster", "-monster_id")) for item in model.query.options(*options).where(model.monster_id == id).all() ]
         else:
             return { "error": "Not found" }, 404
 
@@ -26,10 +37,11 @@ def create_nested_monster_routes_blueprint(name, model):
     # return model:dict
     ##################################
     @nested_blueprint.patch(f"/monsters/<int:monster_id>/{name.replace('_', '-')}/<int:id>")
+    @query_budget(6)
     def patch_monster_language(monster_id, id):
         data = request.json
         filtered_data = { k: v for k, v in data.items() if k in model.__table__.columns.keys() and k != 'id' }
-        m = find_monster_by_id(monster_id)
+        m = find_monster_by_id(monster_id, load_relationships=False)
         item = model.query.where(model.id == id).first()
         if m and item:
             try:
@@ -46,8 +58,9 @@ def create_nested_monster_routes_blueprint(name, model):
     # return None
     ###################################
     @nested_blueprint.delete(f"/monsters/<int:monster_id>/{name.replace('_', '-')}/<int:id>")
+    @query_budget(5)
     def delete_monster_language(monster_id, id):
-        m = find_monster_by_id(monster_id)
+        m = find_monster_by_id(monster_id, load_relationships=False)
         item = model.query.where(model.id == id).first()
         if m and item:
             db.session.delete(item)
@@ -0,0 +1,16 @@
+from flask import Blueprint
+from metrics import get_metrics
+metrics_routes_blueprint = Blueprint('metrics_routes_blueprint', __name__)
+
+# ------------------- METRICS ROUTES ------------------- #
+
+# GET METRICS #########
+# return text/plain Prometheus exposition format,
+# see metrics.py
+#######################
+@metrics_routes_blueprint.get('/metrics')
+def get_metrics_text():
+    metrics = get_metrics()
+    if metrics is None:
+        return { "error": "metrics are disabled" }, 404
+    return metrics.render(), 200, { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8' }
@@ -1,106 +1,232 @@
 from flask import Blueprint, request
-from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, MonsterSpell
+from sqlalchemy.exc import IntegrityError
+from models import db, Monster, MonsterSpell
 monster_routes_blueprint = Blueprint('monster_routes_blueprint', __name__)
-from helpers import replace_nested_monster_data, find_monster_by_id, find_spell_by_name, find_spell_by_id, replace_associated_monster_spells
+from helpers import NESTED_MONSTER_DATA, reconcile_nested_monster_data, find_monster_by_id, find_spell_by_name, find_spell_by_id, replace_associated_monster_spells
+from loaders import monster_relationship_loaders, fieldset_loader_options
+from pagination import paginate_by_cursor
+from serializers import serialize
+from conditional import conditional_on, conditional_body, VERSION_COLUMNS
+from response_cache import cached
+from export import ndjson_response
+from bulk import parse_bulk_items, prepare_bulk_monster, insert_bulk_monsters, BULK_MAX_ITEMS
+from query_budget import query_budget
+
+MONSTER_SORT_COLUMNS = ['id', 'name']
 
 # ------------------- MONSTERS ROUTES ------------------- #
 
-# GET MONSTERS #########
-# query params: page:int and page_count:int
-# return monsters:list[Monster:dict]
+# FILTER MONSTERS #########
+# query params: name, category, sub_category, size
+# params: options:list[sqlalchemy.orm.Load]
+# return Query
 #######################
-@monster_routes_blueprint.get('/monsters')
-def get_monsters():
-    PAGE = request.args.get('page') or 1
-    PAGE_COUNT = request.args.get('page_count') or 10
+def filtered_monsters_query(options):
     NAME_QUERY = request.args.get('name')
     CATEGORY_QUERY = request.args.get('category')
     SUBCATEGORY_QUERY = request.args.get('sub_category')
     SIZE_QUERY = request.args.get('size')
-    OFFSET = (int(PAGE) - 1) * int(PAGE_COUNT)
+
+    query = Monster.query.options(*options)
 
     if NAME_QUERY or CATEGORY_QUERY or SUBCATEGORY_QUERY or SIZE_QUERY:
-        monsters = Monster.query.where(
+        query = query.where(
             Monster.name.like(f"%{NAME_QUERY}%") | 
             Monster.category.like(f"%{CATEGORY_QUERY}%") | 
             Monster.sub_category.like(f"%{SUBCATEGORY_QUERY}%") | 
             Monster.size.like(f"%{SIZE_QUERY}%")
-        ).limit(PAGE_COUNT).offset(OFFSET).all()
-    else:
-        monsters = Monster.query.limit(PAGE_COUNT).offset(OFFSET).all()
+        )
+
+    return query
+
 
-    return [ m.to_dict() for m in monsters ], 200
+# GET MONSTERS #########
+# query params: page:int and page_count:int
+# or cursor:str, sort:str and page_count:int
+# optional fields:str and include:str
+#
+# return monsters:list[Monster:dict]
+# or { results:list[Monster:dict], next_cursor:str }
+#######################
+@monster_routes_blueprint.get('/monsters')
+@query_budget(15)
+@cached('monsters')
+@conditional_body
+def get_monsters():
+    PAGE = request.args.get('page') or 1
+    PAGE_COUNT = request.args.get('page_count') or 10
+    SORT = request.args.get('sort') or 'id'
+
+    only, options = fieldset_loader_options(
+        Monster,
+        request.args.get('fields'),
+        request.args.get('include'),
+        monster_relationship_loaders(),
+        loaded_columns=[SORT]
+    )
+
+    if 'cursor' in request.args:
+        try:
+            monsters, next_cursor = paginate_by_cursor(
+                filtered_monsters_query(options),
+                Monster,
+                SORT,
+                MONSTER_SORT_COLUMNS,
+                request.args.get('cursor'),
+                PAGE_COUNT
+            )
+        except ValueError as e:
+            return { "error": f"{e}" }, 400
+        return { "results": [ serialize(m, only=only) for m in monsters ], "next_cursor": next_cursor }, 200
+
+    OFFSET = (int(PAGE) - 1) * int(PAGE_COUNT)
+    monsters = filtered_monsters_query(options).limit(PAGE_COUNT).offset(OFFSET).all()
+
+    return [ serialize(m, only=only) for m in monsters ], 200
+
+
+# EXPORT MONSTERS #########
+# query params: same filters as GET /monsters
+# and optional fields:str and include:str
+#
+# return every matching monster as ndjson, gzipped
+# when the client accepts gzip
+#######################
+@monster_routes_blueprint.get('/monsters/export')
+def export_monsters():
+    only, options = fieldset_loader_options(
+        Monster,
+        request.args.get('fields'),
+        request.args.get('include'),
+        monster_relationship_loaders()
+    )
+    query = filtered_monsters_query(options).order_by(Monster.id)
+    return ndjson_response(query, only, 'monsters.ndjson')
 
 
 # GET MONSTER #########
+# query params: optional fields:str and include:str
 # return Monster:dict
 #######################
 @monster_routes_blueprint.get('/monsters/<int:id>')
+@query_budget(16)
+@cached('monster:{id}')
+@conditional_on(Monster)
 def get_monster_by_id(id):
-    m = find_monster_by_id(id)
+    only, options = fieldset_loader_options(
+        Monster,
+        request.args.get('fields'),
+        request.args.get('include'),
+        monster_relationship_loaders(),
+        loaded_columns=VERSION_COLUMNS
+    )
+    m = find_monster_by_id(id, options=options)
     if m:
-        return m.to_dict(), 200
+        return serialize(m, only=only), 200
     else:
         return { "error": "Not found" }, 404
 
 
+# with_missing_spells ##########
+# params: monster:dict, missing_spells:list[str] | None
+# return monster:dict
+#
+# spell names that matched no spell are returned
+# alongside the monster when spells were sent
+# ###############################
+def with_missing_spells(monster, missing_spells):
+    if missing_spells is not None:
+        monster['missing_spells'] = missing_spells
+    return monster
+
+
 # POST MONSTER #########
-# return Monster:dict
+# return Monster:dict, with missing_spells:list[str]
+# when spells are sent
 #######################
 # TODO: able to accept list of skills to associate
 @monster_routes_blueprint.post('/monsters')
+@query_budget(40)
 def post_monster():
     data = request.json
     filtered_data = { k: v for k, v in data.items() 
-                     if k in Monster.__table__.columns.keys() and k != 'id' } 
+                     if k in Monster.__table__.columns.keys() and k not in ['id', *VERSION_COLUMNS] } 
 
     try:
         NEW_M = Monster(**filtered_data)
         db.session.add(NEW_M)
 
-        if data.get('skills'):
-            replace_nested_monster_data(data['skills'], NEW_M, Skill, ['name', 'value'])
-        if data.get('saving_throws'):
-            replace_nested_monster_data(data['saving_throws'], NEW_M, SavingThrow, ['name', 'value'])
-        if data.get('special_abilities'):
-            replace_nested_monster_data(data['special_abilities'], NEW_M, SpecialAbility, ['name', 'description'])
-        if data.get('senses'):
-            replace_nested_monster_data(data['senses'], NEW_M, Sense, ['name', 'distance'])
-        if data.get('speeds'):
-            replace_nested_monster_data(data['speeds'], NEW_M, Speed, ['name', 'distance'])
-        if data.get('languages'):
-            replace_nested_monster_data(data['languages'], NEW_M, Language, ['name'])
-        if data.get('damage_resistances'):
-            replace_nested_monster_data(data['damage_resistances'], NEW_M, DamageResistance, ['damage_type'])
-        if data.get('damage_immunities'):
-            replace_nested_monster_data(data['damage_immunities'], NEW_M, DamageImmunity, ['damage_type'])
-        if data.get('damage_vulnerabilities'):
-            replace_nested_monster_data(data['damage_vulnerabilities'], NEW_M, DamageVulnerability, ['damage_type'])
-        if data.get('condition_immunities'):
-            replace_nested_monster_data(data['condition_immunities'], NEW_M, ConditionImmunity, ['condition_type'])
-        if data.get('actions'):
-            replace_nested_monster_data(data['actions'], NEW_M, Action, ['legendary_action', 'lair_action', 'name', 'description'])
+        for key, (model, attributes, natural_key) in NESTED_MONSTER_DATA.items():
+            if data.get(key):
+                reconcile_nested_monster_data(data[key], NEW_M, model, attributes, natural_key)
         
+        missing_spells = None
         if data.get('spells'):
-            replace_associated_monster_spells(data['spells'], NEW_M)
-            
+            missing_spells = replace_associated_monster_spells(data['spells'], NEW_M)
 
         db.session.commit()
 
-        return NEW_M.to_dict(), 201
+        return with_missing_spells(find_monster_by_id(NEW_M.id).to_dict(), missing_spells), 201
     except ValueError as e:
         return { "error": f"{e}" }, 422
 
+# POST MONSTERS BULK #########
+# body: json array or ndjson (Content-Type: application/x-ndjson)
+# of monsters shaped like POST /monsters
+# query params: optional atomic:bool
+#
+# return { created:list[{ index, id, missing_spells }], errors:list[{ index, error }] }
+# 201 when every monster is created, 207 when some are
+# and 422 when none are. with atomic=true any invalid
+# monster fails the whole request
+#######################
+@monster_routes_blueprint.post('/monsters/bulk')
+def post_monsters_bulk():
+    ATOMIC = (request.args.get('atomic') or '').lower() in ['true', '1']
+
+    try:
+        items = parse_bulk_items(request.get_data(as_text=True), request.content_type)
+    except ValueError as e:
+        return { "error": f"{e}" }, 400
+    if len(items) > BULK_MAX_ITEMS:
+        return { "error": f"at most {BULK_MAX_ITEMS} monsters can be created per request but got {len(items)}" }, 413
+
+    prepared = []
+    indexes = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            prepared.append(prepare_bulk_monster(item))
+            indexes.append(index)
+        except ValueError as e:
+            errors.append({ "index": index, "error": f"{e}" })
+
+    if errors and ATOMIC:
+        return { "created": [], "errors": errors }, 422
+
+    try:
+        results = insert_bulk_monsters(prepared)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        return { "created": [], "errors": [ { "index": None, "error": f"{e.orig}" } ] }, 422
+
+    created = [ { "index": index, **result } for index, result in zip(indexes, results) ]
+    status = 201 if not errors else 207 if created else 422
+    return { "created": created, "errors": errors }, status
+
 # PATCH MONSTER #########
-# return Monster:dict
+# return Monster:dict, with missing_spells:list[str]
+# when spells are sent
 #######################
 @monster_routes_blueprint.patch('/monsters/<int:id>')
+@query_budget(60)
 def patch_monster(id):
     data = request.json
     filtered_data = { k: v for k, v in data.items() 
                         if k in dir(Monster) 
                         and '__' not in k 
-                        and k not in ['skills', 'saving_throws', 'special_abilities', 'senses', 'languages', 'damage_resistances', 'damage_immunities', 'damage_vulnerabilities', 'condition_immunities', 'actions', 'spells', 'monster_spells'] } 
+                        and k not in [*NESTED_MONSTER_DATA, 'spells', 'monster_spells', *VERSION_COLUMNS] } 
                     # add any additional validations for filtering data here including new associations
 
     m = find_monster_by_id(id)
@@ -110,34 +236,16 @@ def patch_monster(id):
             for k in filtered_data:
                 setattr(m, k, filtered_data[k])
 
-            if data.get('skills'):
-                replace_nested_monster_data(data['skills'], m, Skill, ['name', 'value'])
-            if data.get('saving_throws'):
-                replace_nested_monster_data(data['saving_throws'], m, SavingThrow, ['name', 'value'])
-            if data.get('special_abilities'):
-                replace_nested_monster_data(data['special_abilities'], m, SpecialAbility, ['name', 'description'])
-            if data.get('senses'):
-                replace_nested_monster_data(data['senses'], m, Sense, ['name', 'distance'])
-            if data.get('speeds'):
-                replace_nested_monster_data(data['speeds'], m, Speed, ['name', 'distance'])
-            if data.get('languages'):
-                replace_nested_monster_data(data['languages'], m, Language, ['name'])
-            if data.get('damage_resistances'):
-                replace_nested_monster_data(data['damage_resistances'], m, DamageResistance, ['damage_type'])
-            if data.get('damage_immunities'):
-                replace_nested_monster_data(data['damage_immunities'], m, DamageImmunity, ['damage_type'])
-            if data.get('damage_vulnerabilities'):
-                replace_nested_monster_data(data['damage_vulnerabilities'], m, DamageVulnerability, ['damage_type'])
-            if data.get('condition_immunities'):
-                replace_nested_monster_data(data['condition_immunities'], m, ConditionImmunity, ['condition_type'])
-            if data.get('actions'):
-                replace_nested_monster_data(data['actions'], m, Action, ['legendary_action', 'lair_action', 'name', 'description'])
+            for key, (model, attributes, natural_key) in NESTED_MONSTER_DATA.items():
+                if data.get(key):
+                    reconcile_nested_monster_data(data[key], m, model, attributes, natural_key)
 
+            missing_spells = None
             if data.get('spells'):
-                replace_associated_monster_spells(data['spells'], m)
+                missing_spells = replace_associated_monster_spells(data['spells'], m)
 
             db.session.commit()
-            return m.to_dict(), 202
+            return with_missing_spells(find_monster_by_id(m.id).to_dict(), missing_spells), 202
         except ValueError as e:
             return { "error": f"{e}" }, 422
     else:
@@ -147,8 +255,9 @@ def patch_monster(id):
 # return None
 #######################
 @monster_routes_blueprint.delete('/monsters/<int:id>')
+@query_budget(20)
 def delete_monster(id):
-    m = find_monster_by_id(id)
+    m = find_monster_by_id(id, load_relationships=False)
 
     if m:
         db.session.delete(m)
@@ -164,12 +273,13 @@ def delete_monster(id):
 # return MonsterSpell:dict
 #######################
 @monster_routes_blueprint.post('/monsters/<int:id>/spells')
+@query_budget(6)
 def create_monster_spell(id):
     data = request.json
     spell_name = data.get('spell_name')
     spell_id = data.get('spell_id')
 
-    m = find_monster_by_id(id)
+    m = find_monster_by_id(id, load_relationships=False)
     s = find_spell_by_name(data.get('name')) or find_spell_by_id(data.get('id'))
 
     if m and s:
@@ -180,6 +290,9 @@ def create_monster_spell(id):
             return s.to_dict(), 201
         except ValueError as e:
             return { "error": f"{e}" }, 422
+        except IntegrityError:
+            db.session.rollback()
+            return { "error": "Monster already has this spell" }, 422
     else:
         return { "error": "Monster or spell not found" }, 404
 
@@ -187,6 +300,7 @@ def create_monster_spell(id):
 # return None
 #######################
 @monster_routes_blueprint.delete('/monsters/<int:monster_id>/spells/<int:spell_id>')
+@query_budget(4)
 def delete_monster_spell(monster_id, spell_id):
     ms = MonsterSpell.query.where(
         (MonsterSpell.monster_id == monster_id) & 
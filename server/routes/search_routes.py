@@ -0,0 +1,44 @@
+from flask import Blueprint, request
+from search import search_catalog, SEARCH_TYPES, SEARCH_LIMIT, SEARCH_MAX_LIMIT
+from loaders import parse_list_param
+from conditional import conditional_body
+from response_cache import cached
+from query_budget import query_budget
+search_routes_blueprint = Blueprint('search_routes_blueprint', __name__)
+
+# ------------------- SEARCH ROUTES ------------------- #
+
+# SEARCH #########
+# query params: q:str, type:str and limit:int (at
+# most SEARCH_MAX_LIMIT)
+# return hits:list[{ type, id, monster_id, name, highlight, snippet, score }]
+#
+# example: /search?q=acid&type=spell,action
+#######################
+@search_routes_blueprint.get('/search')
+@query_budget(2)
+@cached('search')
+@conditional_body
+def search():
+    QUERY = request.args.get('q')
+    TYPES = parse_list_param(request.args.get('type'))
+    LIMIT = request.args.get('limit') or SEARCH_LIMIT
+
+    if not QUERY or not QUERY.strip():
+        return { "error": "q is required" }, 400
+    if TYPES and any(t not in SEARCH_TYPES for t in TYPES):
+        return { "error": f"type must be one of ({ ', '.join(SEARCH_TYPES) }) but got {', '.join(TYPES)}" }, 400
+
+    try:
+        limit = int(LIMIT)
+    except ValueError:
+        return { "error": f"limit must be an integer but received {LIMIT}" }, 400
+    if limit < 1:
+        return { "error": f"limit must be 1 or greater but received {limit}" }, 400
+
+    try:
+        hits = search_catalog(QUERY, TYPES, min(limit, SEARCH_MAX_LIMIT))
+    except NotImplementedError as e:
+        return { "error": f"{e}" }, 501
+
+    return hits, 200
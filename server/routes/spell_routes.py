@@ -2,40 +2,109 @@ from flask import Blueprint, request
 from models import db, Spell, MonsterSpell
 spell_routes_blueprint = Blueprint('spell_routes_blueprint', __name__)
 from helpers import find_spell_by_id
+from loaders import fieldset_loader_options
+from pagination import paginate_by_cursor
+from serializers import serialize
+from conditional import conditional_on, conditional_body, VERSION_COLUMNS
+from response_cache import cached
+from export import ndjson_response
+from query_budget import query_budget
+
+SPELL_SORT_COLUMNS = ['id', 'name']
 
 # ------------------- SPELLS ROUTES ------------------- #
 
+# FILTER SPELLS #########
+# query params: name, school
+# params: options:list[sqlalchemy.orm.Load]
+# return Query
+#######################
+def filtered_spells_query(options):
+    NAME_QUERY = request.args.get('name')
+    SCHOOL_QUERY = request.args.get('school')
+
+    query = Spell.query.options(*options)
+
+    if NAME_QUERY or SCHOOL_QUERY:
+        query = query.where(
+            Spell.name.like(f"%{NAME_QUERY}%") | 
+            Spell.school.like(f"%{SCHOOL_QUERY}%")
+        )
+
+    return query
+
+
 # GET SPELLS #########
 # query params: page:int and page_count:int
+# or cursor:str, sort:str and page_count:int
+# optional fields:str
+#
 # return spells:list[Spell:dict]
+# or { results:list[Spell:dict], next_cursor:str }
 #######################
 @spell_routes_blueprint.get('/spells')
+@query_budget(2)
+@cached('spells')
+@conditional_body
 def get_spells():
     PAGE = request.args.get('page') or 1
     PAGE_COUNT = request.args.get('page_count') or 10
-    NAME_QUERY = request.args.get('name')
-    SCHOOL_QUERY = request.args.get('school')
+    SORT = request.args.get('sort') or 'id'
+
+    only, options = fieldset_loader_options(
+        Spell,
+        request.args.get('fields'),
+        None,
+        loaded_columns=[SORT]
+    )
+
+    if 'cursor' in request.args:
+        try:
+            spells, next_cursor = paginate_by_cursor(
+                filtered_spells_query(options),
+                Spell,
+                SORT,
+                SPELL_SORT_COLUMNS,
+                request.args.get('cursor'),
+                PAGE_COUNT
+            )
+        except ValueError as e:
+            return { "error": f"{e}" }, 400
+        return { "results": [ serialize(s, only=only) for s in spells ], "next_cursor": next_cursor }, 200
+
     OFFSET = (int(PAGE) - 1) * int(PAGE_COUNT)
+    spells = filtered_spells_query(options).limit(PAGE_COUNT).offset(OFFSET).all()
 
-    if NAME_QUERY or SCHOOL_QUERY:
-        spells = Spell.query.where(
-            Spell.name.like(f"%{NAME_QUERY}%") | 
-            Spell.school.like(f"%{SCHOOL_QUERY}%")
-        ).limit(PAGE_COUNT).offset(OFFSET).all()
-    else:
-        spells = Spell.query.limit(PAGE_COUNT).offset(OFFSET).all()
+    return [ serialize(s, only=only) for s in spells ], 200
 
-    return [ s.to_dict() for s in spells ], 200
+
+# EXPORT SPELLS #########
+# query params: same filters as GET /spells
+# and optional fields:str
+#
+# return every matching spell as ndjson, gzipped
+# when the client accepts gzip
+#######################
+@spell_routes_blueprint.get('/spells/export')
+def export_spells():
+    only, options = fieldset_loader_options(Spell, request.args.get('fields'), None)
+    query = filtered_spells_query(options).order_by(Spell.id)
+    return ndjson_response(query, only, 'spells.ndjson')
 
 
 # GET SPELL #########
+# query params: optional fields:str
 # return Spell:dict
 #######################
 @spell_routes_blueprint.get('/spells/<int:id>')
+@query_budget(3)
+@cached('spell:{id}')
+@conditional_on(Spell)
 def get_spell_by_id(id):
-    s = find_spell_by_id(id)
+    only, options = fieldset_loader_options(Spell, request.args.get('fields'), None, loaded_columns=VERSION_COLUMNS)
+    s = find_spell_by_id(id, options=options)
     if s:
-        return s.to_dict(), 200
+        return serialize(s, only=only), 200
     else:
         return { "error": "Not found" }, 404
 
@@ -44,10 +113,11 @@ def get_spell_by_id(id):
 # return Spell:dict
 #######################
 @spell_routes_blueprint.post('/spells')
+@query_budget(3)
 def post_spell():
     data = request.json
     filtered_data = { k: v for k, v in data.items() 
-                     if k in Spell.__table__.columns.keys() and k != 'id' } 
+                     if k in Spell.__table__.columns.keys() and k not in ['id', *VERSION_COLUMNS] } 
 
     try:
         NEW_S = Spell(**filtered_data)
@@ -62,10 +132,11 @@ def post_spell():
 # return Spell:dict
 #######################
 @spell_routes_blueprint.patch('/spells/<int:id>')
+@query_budget(8)
 def patch_spells(id):
     data = request.json
     filtered_data = { k: v for k, v in data.items() 
-                     if k in Spell.__table__.columns.keys() and k != 'id' } 
+                     if k in Spell.__table__.columns.keys() and k not in ['id', *VERSION_COLUMNS] } 
 
     s = find_spell_by_id(id)
 
@@ -88,6 +159,7 @@ def patch_spells(id):
 # return None
 #######################
 @spell_routes_blueprint.delete('/spells/<int:id>')
+@query_budget(8)
 def delete_spell(id):
     m = find_spell_by_id(id)
 
@@ -0,0 +1,218 @@
+import re
+import html
+from sqlalchemy import event, text
+from models import db
+
+# ----------- FULL TEXT SEARCH ----------- #
+#
+# SQLite: one external content FTS5 table per source
+# table, kept in sync by AFTER INSERT/UPDATE/DELETE
+# triggers so every write path (routes, bulk deletes,
+# seeds and imports) updates the index.
+#
+# PostgreSQL: a GIN index over the to_tsvector of the
+# searchable columns, which postgres maintains itself.
+#
+# highlight and snippet are html: the catalog text is
+# escaped and <mark> is the only tag in them.
+# ########################################
+
+SEARCH_SOURCES = [
+    {
+        'type': 'monster',
+        'table': 'monsters_table',
+        'columns': ['name', 'category', 'sub_category', 'alignment'],
+        'monster_id': None,
+    },
+    {
+        'type': 'spell',
+        'table': 'spells_table',
+        'columns': ['name', 'description', 'school', 'at_higher_levels'],
+        'monster_id': None,
+    },
+    {
+        'type': 'action',
+        'table': 'actions_table',
+        'columns': ['name', 'description'],
+        'monster_id': 'monster_id',
+    },
+    {
+        'type': 'special_ability',
+        'table': 'special_abilities_table',
+        'columns': ['name', 'description'],
+        'monster_id': 'monster_id',
+    },
+]
+
+SEARCH_TYPES = [ source['type'] for source in SEARCH_SOURCES ]
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+# the database marks matches with these private use
+# characters, replaced by the tags once the text has
+# been escaped
+MATCH_START = '\ue000'
+MATCH_END = '\ue001'
+
+
+# ----------- INDEX DDL ----------- #
+
+def fts_table(source):
+    return f"{source['table']}_fts"
+
+
+def pg_document(source, alias=None):
+    prefix = f"{alias}." if alias else ''
+    return " || ' ' || ".join( f"coalesce({prefix}{c}, '')" for c in source['columns'] )
+
+
+# search_index_ddl ##########
+# params: dialect:str
+# return list[str]
+# ###########################
+def search_index_ddl(dialect):
+    statements = []
+    for source in SEARCH_SOURCES:
+        table = source['table']
+        columns = ', '.join(source['columns'])
+        new_values = ', '.join( f"new.{c}" for c in source['columns'] )
+        old_values = ', '.join( f"old.{c}" for c in source['columns'] )
+
+        if dialect == 'sqlite':
+            fts = fts_table(source)
+            statements += [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+                f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+                END""",
+                f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                END""",
+                f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {columns} ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+                    INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});
+                END""",
+                f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+            ]
+        elif dialect == 'postgresql':
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING GIN (to_tsvector('english', {pg_document(source)}))"
+            )
+    return statements
+
+
+# create_search_index ##########
+# runs after metadata.create_all
+# ##############################
+def create_search_index(target, connection, **kw):
+    for statement in search_index_ddl(connection.dialect.name):
+        connection.exec_driver_sql(statement)
+
+
+# drop_search_index ##########
+# runs before metadata.drop_all
+# ############################
+def drop_search_index(target, connection, **kw):
+    for source in SEARCH_SOURCES:
+        if connection.dialect.name == 'sqlite':
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {fts_table(source)}")
+        elif connection.dialect.name == 'postgresql':
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{source['table']}_search")
+
+
+# include_migration_object ##########
+# passed to Migrate so autogenerate does not try
+# to drop the search tables and indexes that are
+# not part of the models
+# ##################################
+def include_migration_object(object, name, type_, reflected, compare_to):
+    if reflected and compare_to is None and name:
+        if re.search(r"_fts(_data|_idx|_docsize|_config)?$", name) or re.search(r"^ix_\w+_search$", name):
+            return False
+    return True
+
+
+event.listen(db.metadata, 'after_create', create_search_index)
+event.listen(db.metadata, 'before_drop', drop_search_index)
+
+
+# ----------- QUERIES ----------- #
+
+# search_terms ##########
+# params: q:str
+# return list[str]
+#
+# only word characters are kept so user input can
+# never be parsed as query syntax
+# #######################
+# mark_matches ##########
+# params: fragment:str|None with MATCH_START and
+# MATCH_END around the matches
+# return str|None html
+# #######################
+def mark_matches(fragment):
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+
+def search_terms(q):
+    return re.findall(r"\w+", q or '')
+
+
+def sqlite_source_query(source):
+    fts = fts_table(source)
+    monster_id = f"t.{source['monster_id']}" if source['monster_id'] else 'NULL'
+    return f"""
+        SELECT '{source['type']}' AS type, t.id AS id, {monster_id} AS monster_id, t.name AS name,
+            highlight({fts}, 0, '{MATCH_START}', '{MATCH_END}') AS highlight,
+            snippet({fts}, -1, '{MATCH_START}', '{MATCH_END}', '...', 16) AS snippet,
+            -bm25({fts}) AS score
+        FROM {fts} JOIN {source['table']} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH :query
+    """
+
+
+def postgresql_source_query(source):
+    monster_id = f"t.{source['monster_id']}" if source['monster_id'] else 'NULL'
+    document = pg_document(source, 't')
+    return f"""
+        SELECT '{source['type']}' AS type, t.id AS id, {monster_id} AS monster_id, t.name AS name,
+            ts_headline('english', coalesce(t.name, ''), q, 'StartSel={MATCH_START}, StopSel={MATCH_END}, HighlightAll=true') AS highlight,
+            ts_headline('english', {document}, q, 'StartSel={MATCH_START}, StopSel={MATCH_END}, MaxWords=24, MinWords=8') AS snippet,
+            ts_rank(to_tsvector('english', {document}), q) AS score
+        FROM {source['table']} t, to_tsquery('english', :query) q
+        WHERE to_tsvector('english', {document}) @@ q
+    """
+
+
+# search_catalog ##########
+# params: q:str, types:list[str], limit:int
+# return list[dict]
+#
+# every term must match, the last term also matches
+# as a prefix. hits from every source are ranked
+# together, best first
+# #########################
+def search_catalog(q, types=None, limit=SEARCH_LIMIT):
+    terms = search_terms(q)
+    sources = [ s for s in SEARCH_SOURCES if not types or s['type'] in types ]
+    if not terms or not sources:
+        return []
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        query = ' '.join( f'"{t}"' for t in terms ) + '*'
+        source_queries = [ sqlite_source_query(s) for s in sources ]
+    elif dialect == 'postgresql':
+        query = ' & '.join( terms ) + ':*'
+        source_queries = [ postgresql_source_query(s) for s in sources ]
+    else:
+        raise NotImplementedError(f"full text search requires sqlite or postgresql but the database is {dialect}")
+
+    statement = text(' UNION ALL '.join(source_queries) + ' ORDER BY score DESC, type, id LIMIT :limit')
+    rows = db.session.execute(statement, { 'query': query, 'limit': limit }).mappings().all()
+    return [ { **row, 'highlight': mark_matches(row['highlight']), 'snippet': mark_matches(row['snippet']) } for row in rows ]
@@ -0,0 +1,207 @@
+import uuid
+from enum import Enum
+from decimal import Decimal
+from operator import attrgetter
+from functools import lru_cache
+from datetime import datetime, date, time
+from sqlalchemy import inspect as sql_inspect
+from sqlalchemy.orm import RelationshipProperty, ColumnProperty
+from sqlalchemy.ext.associationproxy import AssociationProxy
+from sqlalchemy_serializer.serializer import Serializer
+from sqlalchemy_serializer.lib.schema import Schema
+
+# ----------- COMPILED SERIALIZERS ----------- #
+#
+# SerializerMixin.to_dict rebuilds its rule tree and
+# introspects the mapper for every row it serializes.
+# The rules only depend on the model class, so here the
+# same Schema is resolved once per (model, rules, only)
+# into a plan of the included attributes, and the plan
+# into one reader function per attribute.
+#
+# Output is identical to to_dict for the same arguments.
+# only comes from a client's ?fields=, so it is reduced
+# to a sorted set of the model's attributes and at most
+# SERIALIZER_CACHE_SIZE serializers are kept.
+# ############################################
+
+SERIALIZER_CACHE_SIZE = 256
+
+SIMPLE_PYTHON_TYPES = (int, str, float, bool)
+
+# column types whose values to_dict converts
+CONVERTED_PYTHON_TYPES = (bytes, uuid.UUID, time, datetime, date, Decimal, Enum)
+
+
+# serialize ##########
+# params: instance:SerializerMixin, only:tuple[str], rules:tuple[str]
+# return dict
+#
+# drop in replacement for instance.to_dict(only, rules)
+# ####################
+def serialize(instance, only=(), rules=()):
+    model = type(instance)
+    return compile_serializer(model, normalize_only(model, only), tuple(rules))(instance)
+
+
+# normalize_only ##########
+# params: model:class, only:iterable[str]
+# return tuple[str] sorted, without duplicates and
+# without names that are not attributes of the model
+#
+# to_dict output does not depend on the order of only
+# #########################
+def normalize_only(model, only):
+    if not only:
+        return ()
+    attributes = sql_inspect(model).all_orm_descriptors
+    return tuple(sorted({ key for key in only if key.split('.')[0] in attributes }))
+
+
+# compile_serializer ##########
+# params: model:class, only:tuple[str], rules:tuple[str]
+# return function(instance) -> dict
+#
+# compiled once per combination and cached, least
+# recently used first out
+# #############################
+@lru_cache(maxsize=SERIALIZER_CACHE_SIZE)
+def compile_serializer(model, only=(), rules=()):
+    schema = Schema()
+    schema.update(only=only, extend=rules)
+    plan = build_plan(model, schema)
+    return plan_function(plan)
+
+
+# build_plan ##########
+# params: model:class, schema:Schema
+# return plan:list[tuple(key:str, kind:str, value:any)]
+#
+# mirrors Serializer.serialize_model: applies the
+# model's own rules to the schema then resolves
+# which keys are included, recursing into
+# relationships and association proxies with the
+# forked schema for that key
+# #####################
+def build_plan(model, schema):
+    schema.update(only=model.serialize_only, extend=model.serialize_rules)
+
+    mapper = sql_inspect(model)
+    keys = schema.keys
+    if schema.is_greedy:
+        keys.update(a.key for a in mapper.attrs)
+
+    plan = []
+    for key in sorted(keys):
+        if not schema.is_included(key=key):
+            continue
+
+        attr = mapper.attrs.get(key)
+        descriptor = mapper.all_orm_descriptors.get(key)
+
+        if isinstance(attr, ColumnProperty):
+            plan.append( (key, column_kind(model, attr), None) )
+        elif isinstance(attr, RelationshipProperty):
+            nested = build_plan(attr.mapper.class_, schema.fork(key=key))
+            plan.append( (key, 'many' if attr.uselist else 'one', nested) )
+        elif isinstance(descriptor, AssociationProxy):
+            target = getattr(model, key).remote_attr.property.mapper.class_
+            nested = build_plan(target, schema.fork(key=key))
+            plan.append( (key, 'many', nested) )
+        else:
+            # methods, properties and other extras keep the to_dict behavior
+            plan.append( (key, 'generic', (model, schema.fork(key=key))) )
+
+    return plan
+
+
+# column_kind ##########
+# params: model:class, attr:ColumnProperty
+# return 'simple' | 'convert'
+# ######################
+def column_kind(model, attr):
+    if model.serialize_types:
+        return 'convert'
+    try:
+        python_type = attr.columns[0].type.python_type
+    except NotImplementedError:
+        return 'convert'
+    if issubclass(python_type, SIMPLE_PYTHON_TYPES) and not issubclass(python_type, CONVERTED_PYTHON_TYPES):
+        return 'simple'
+    return 'convert'
+
+
+# plan_function ##########
+# params: plan:list
+# return function(instance) -> dict
+#
+# each row costs one attribute read per key, plus
+# the conversion its kind needs
+# ########################
+def plan_function(plan):
+    readers = [ (key, field_reader(key, kind, value)) for key, kind, value in plan ]
+
+    def serialize_instance(obj):
+        return { key: read(obj) for key, read in readers }
+
+    return serialize_instance
+
+
+# field_reader ##########
+# params: key:str, kind:str, value:any
+# return function(instance) -> json compatible value
+# #######################
+def field_reader(key, kind, value):
+    get = attrgetter(key)
+
+    if kind == 'simple':
+        return get
+    if kind == 'convert':
+        return lambda obj: convert_value(obj, get(obj))
+    if kind == 'many':
+        serialize_item = plan_function(value)
+        return lambda obj: [ serialize_item(item) for item in get(obj) ]
+    if kind == 'one':
+        serialize_item = plan_function(value)
+        def read_one(obj):
+            item = get(obj)
+            return None if item is None else serialize_item(item)
+        return read_one
+    return lambda obj: convert_generic(value, get(obj))
+
+
+# convert_value ##########
+# params: instance:SerializerMixin, value:any
+# return json compatible value
+#
+# dates, decimals and friends use the formats of
+# the instance exactly like to_dict
+# ########################
+def convert_value(instance, value):
+    if not instance.serialize_types and (value is None or isinstance(value, SIMPLE_PYTHON_TYPES)):
+        return value
+    return instance_serializer(instance).serialize(value)
+
+
+def convert_generic(model_and_schema, value):
+    model, schema = model_and_schema
+    serializer = Serializer(**serializer_options(model, None))
+    serializer.schema = schema
+    return serializer.fork(value=value)
+
+
+def instance_serializer(instance):
+    serializer = Serializer(**serializer_options(type(instance), instance.get_tzinfo()))
+    serializer.schema = Schema()
+    return serializer
+
+
+def serializer_options(model, tzinfo):
+    return {
+        'date_format': model.date_format,
+        'datetime_format': model.datetime_format,
+        'time_format': model.time_format,
+        'decimal_format': model.decimal_format,
+        'tzinfo': tzinfo,
+        'serialize_types': model.serialize_types,
+    }
@@ -0,0 +1,204 @@
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from flask import request, current_app, has_app_context, has_request_context
+from sqlalchemy import event
+
+# ----------- SLOW QUERY LOG ----------- #
+#
+# Every statement is timed with the engine's cursor
+# events. One that takes longer than SLOW_QUERY_MS is
+# logged with its SQL, its parameters redacted, its
+# duration and the route that ran it, and kept in a
+# ring buffer of the last SLOW_QUERY_LOG_SIZE slow
+# statements served by /admin/slow-queries.
+#
+# With SLOW_QUERY_EXPLAIN the plan of the statement is
+# captured right after it runs, on the same DBAPI
+# connection and with the same parameters:
+#     sqlite      EXPLAIN QUERY PLAN
+#     postgresql  EXPLAIN (ANALYZE off)
+#     mysql       EXPLAIN
+# Only SELECT, INSERT, UPDATE, DELETE and WITH
+# statements are explained, and a plan that can't be
+# captured records its error instead. The plan runs
+# inside a savepoint, so a failed EXPLAIN is rolled
+# back and does not abort the request's transaction
+# on postgres.
+# Each worker process keeps its own log.
+# ######################################
+
+EXPLAIN_PREFIXES = { 'sqlite': 'EXPLAIN QUERY PLAN', 'postgresql': 'EXPLAIN (ANALYZE off)', 'mysql': 'EXPLAIN' }
+EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+EXPLAIN_SAVEPOINT = 'slow_query_explain'
+
+
+# redact ##########
+# params: parameters:tuple | list | dict | None
+# return the parameters with every value but None,
+# booleans and numbers replaced by its type
+# #################
+def redact(parameters):
+    def value(v):
+        if v is None or isinstance(v, (bool, int, float)):
+            return v
+        return f"<{type(v).__name__}>"
+    if isinstance(parameters, dict):
+        return { k: value(v) for k, v in parameters.items() }
+    if isinstance(parameters, (list, tuple)):
+        return [ value(v) for v in parameters ]
+    return parameters
+
+
+# plan_line ##########
+# sqlite plans end with the detail of each step and
+# postgres plans are one line per row
+# ####################
+def plan_line(dialect, row):
+    if dialect in ('sqlite', 'postgresql'):
+        return str(row[-1])
+    return ' '.join( str(column) for column in row )
+
+
+# explain ##########
+# params: conn:Connection, statement:str, parameters
+# return list[str] plan lines
+#
+# runs on a DBAPI cursor of its own so the plan is
+# not seen by the engine's events, and in a savepoint
+# so a failure leaves the transaction as it was
+# ##################
+def explain(conn, statement, parameters):
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None:
+        return [ f"no EXPLAIN for {conn.dialect.name}" ]
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return []
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        try:
+            cursor.execute(f"{prefix} {statement}", parameters)
+            return [ plan_line(conn.dialect.name, row) for row in cursor.fetchall() ]
+        except Exception as e:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            return [ f"EXPLAIN failed: {e}" ]
+        finally:
+            cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    except Exception as e:
+        # e.g. no savepoints outside of a transaction
+        return [ f"EXPLAIN failed: {e}" ]
+    finally:
+        cursor.close()
+
+
+# SlowQueryLog ##########
+# params: threshold_ms:float, size:int, explain:bool,
+#         logger:logging.Logger
+# #######################
+class SlowQueryLog:
+
+    def __init__(self, threshold_ms, size, explain, logger):
+        self.threshold = threshold_ms / 1000
+        self.explain = explain
+        self.logger = logger
+        self.entries = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.count = 0
+
+    # record ##########
+    # params: conn:Connection, statement:str, parameters,
+    #         executemany:bool, seconds:float, engine:str
+    # #################
+    def record(self, conn, statement, parameters, executemany, seconds, engine):
+        parameters = parameters[0] if executemany and parameters else parameters
+        entry = {
+            'sql': statement,
+            'parameters': redact(parameters),
+            'executemany': executemany,
+            'duration_ms': round(seconds * 1000, 3),
+            'engine': engine,
+            'endpoint': request.endpoint if has_request_context() else None,
+            'route': f"{request.method} {request.path}" if has_request_context() else None,
+            'at': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'plan': explain(conn, statement, parameters) if self.explain else None,
+        }
+        with self.lock:
+            self.entries.append(entry)
+            self.count += 1
+        self.logger.warning(
+            f"slow query {entry['duration_ms']} ms on {engine} from {entry['route'] or 'outside a request'}: "
+            f"{statement} {entry['parameters']}" + ''.join( f"\n    {line}" for line in entry['plan'] or [] )
+        )
+
+    # worst ##########
+    # return list[dict] the kept entries, slowest first
+    # ################
+    def worst(self):
+        with self.lock:
+            return sorted(self.entries, key=lambda e: -e['duration_ms'])
+
+    def recent(self):
+        with self.lock:
+            return list(reversed(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return { 'threshold_ms': self.threshold * 1000, 'size': self.entries.maxlen, 'kept': len(self.entries), 'slow_queries': self.count }
+
+# END SlowQueryLog #
+
+
+def get_slow_query_log():
+    if has_app_context():
+        return current_app.extensions.get('slow_query_log')
+    return None
+
+
+# watch_slow_queries ##########
+# params: log:SlowQueryLog, engine:sqlalchemy.Engine, name:str
+# #############################
+def watch_slow_queries(log, engine, name):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('slow_query_started')
+        if not started:
+            return
+        seconds = time.perf_counter() - started.pop()
+        if seconds >= log.threshold:
+            log.record(conn, statement, parameters, executemany, seconds, name)
+
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get('slow_query_started'):
+            context.connection.info['slow_query_started'].pop()
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    event.listen(engine, 'handle_error', handle_error)
+
+
+# init_slow_query_log ##########
+# params: app:flask.app.Flask, engines:dict of name: Engine
+#
+# reads SLOW_QUERY_LOG_ENABLED, SLOW_QUERY_MS,
+# SLOW_QUERY_LOG_SIZE and SLOW_QUERY_EXPLAIN from the
+# app config
+# ##############################
+def init_slow_query_log(app, engines):
+    if not app.config.get('SLOW_QUERY_LOG_ENABLED'):
+        return
+    log = app.extensions['slow_query_log'] = SlowQueryLog(
+        float(app.config['SLOW_QUERY_MS']),
+        int(app.config['SLOW_QUERY_LOG_SIZE']),
+        bool(app.config.get('SLOW_QUERY_EXPLAIN')),
+        app.logger
+    )
+    for name, engine in engines.items():
+        watch_slow_queries(log, engine, name)
@@ -0,0 +1,58 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# ----------- SQLITE TUNING ----------- #
+#
+# SQLite defaults to a rollback journal, where a
+# writer locks out every reader and concurrent
+# gunicorn workers see "database is locked".
+# set_sqlite_pragmas runs SQLITE_PRAGMAS on every new
+# connection:
+#     journal_mode=WAL      readers and a writer run concurrently
+#     synchronous=NORMAL    fsync at checkpoints only, safe with WAL
+#     mmap_size             read pages through the page cache of the os
+#     cache_size            page cache per connection, negative is KiB
+#     busy_timeout          ms a writer waits for the lock instead of failing
+#     temp_store=MEMORY     sorts and temp tables stay in memory
+#
+# read_only_uri opens a database read only, and with
+# immutable=True sqlite also skips all locking and
+# change detection. Only use immutable on a file
+# nothing writes to, such as a catalog shipped to a
+# read only replica, and checkpoint it first since
+# immutable connections ignore the -wal file.
+# #####################################
+
+# set_sqlite_pragmas ##########
+# params: engine:sqlalchemy.Engine, pragmas:dict[str, str]
+#
+# does nothing for other databases
+# #############################
+def set_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    def run_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', run_pragmas)
+
+
+# read_only_uri ##########
+# params: uri:str sqlite database uri, immutable:bool
+# return sqlite uri opening the same file read only
+#
+# example: read_only_uri('sqlite:////data/app.db', True)
+#     'sqlite:///file:/data/app.db?mode=ro&immutable=1&uri=true'
+# ########################
+def read_only_uri(uri, immutable=False):
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise ValueError(f"read only uris need an sqlite database file but got {uri}")
+    params = 'mode=ro&immutable=1' if immutable else 'mode=ro'
+    return f"sqlite:///file:{url.database}?{params}&uri=true"
@@ -0,0 +1,178 @@
+import json
+import asyncio
+import pytest
+from sqlalchemy.pool import StaticPool
+
+from models import db, Monster, Skill, Spell
+from create_app import create_app
+from create_asgi_app import AsgiBridge, create_asgi_app, wsgi_environ, async_url, async_engine_options
+from testing.test_monsters import MONSTER_ONE
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+        m = Monster(**MONSTER_ONE)
+        db.session.add_all([ m, Spell(name='Aid', school='abjuration'), Skill(name='history', value=2, monster=m) ])
+        db.session.commit()
+        db.session.remove()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+# call ##########
+# sends one request through an asgi app
+# return (status:int, headers:dict, body:bytes, body messages:int)
+# ###############
+async def call(asgi_app, method, path, query=b'', body=b'', headers=()):
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query, 'root_path': '',
+        'headers': [ (k.encode(), v.encode()) for k, v in headers ], 'http_version': '1.1',
+        'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+    }
+    requests = [ { 'type': 'http.request', 'body': body[:2], 'more_body': True }, { 'type': 'http.request', 'body': body[2:], 'more_body': False } ]
+    messages = []
+
+    async def receive():
+        return requests.pop(0)
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_app(scope, receive, send)
+    start, *bodies = messages
+    assert not bodies[-1]['more_body']
+    return start['status'], { k.decode(): v.decode() for k, v in start['headers'] }, b''.join( m['body'] for m in bodies ), len(bodies)
+
+def run(*calls):
+    async def gather():
+        return await asyncio.gather(*calls)
+    return asyncio.run(gather())
+
+class TestAsgiBridge:
+    """ [TESTING SUITE: <ASGI bridge>] """
+
+    def test_get_routes_match_wsgi(self):
+        """ GET routes answer through asgi with the same status, headers and body as wsgi """
+
+        bridge = AsgiBridge(app)
+        client = app.test_client()
+        for path, query in [ ('/monsters/1', b''), ('/monsters', b'fields=name'), ('/monsters/1/skills', b''), ('/spells/1', b''), ('/spells', b'name=Aid'), ('/spells/100', b'') ]:
+            [(status, headers, body, _)] = run(call(bridge, 'GET', path, query))
+            res = client.get(path, query_string=query.decode())
+            assert status == res.status_code
+            assert headers['content-type'] == res.content_type
+            assert headers.get('etag') == res.headers.get('ETag')
+            assert json.loads(body) == res.json
+
+    def test_conditional_get(self):
+        """ If-None-Match is passed through and answered with 304 """
+
+        bridge = AsgiBridge(app)
+        [(_, headers, _, _)] = run(call(bridge, 'GET', '/spells/1'))
+        [(status, _, body, _)] = run(call(bridge, 'GET', '/spells/1', headers=[ ('If-None-Match', headers['etag']) ]))
+        assert status == 304
+        assert body == b''
+
+    def test_write_with_body(self):
+        """ request bodies sent in several messages reach the app whole """
+
+        bridge = AsgiBridge(app)
+        [(status, _, body, _)] = run(call(bridge, 'POST', '/spells', body=json.dumps({ 'name': 'Bless', 'school': 'enchantment' }).encode(), headers=[ ('Content-Type', 'application/json') ]))
+        assert status == 201
+        assert json.loads(body)['name'] == 'Bless'
+        with app.app_context():
+            assert Spell.query.count() == 2
+
+    def test_streams_export(self):
+        """ a streamed response is sent as several body messages """
+
+        bridge = AsgiBridge(app)
+        [(status, headers, body, messages)] = run(call(bridge, 'GET', '/spells/export'))
+        assert status == 200
+        assert headers['content-type'].startswith('application/x-ndjson')
+        assert [ json.loads(line)['name'] for line in body.decode().splitlines() ] == ['Aid']
+        assert messages > 1
+
+    def test_concurrent_requests(self):
+        """ concurrent requests each get their own flask context """
+
+        bridge = AsgiBridge(app)
+        results = run(*[ call(bridge, 'GET', path) for path in ['/spells/1', '/monsters/1', '/spells/100'] * 5 ])
+        assert [ status for status, _, _, _ in results ] == [200, 200, 404] * 5
+        assert { json.loads(body).get('name') for _, _, body, _ in results[::3] } == { 'Aid' }
+
+    def test_lifespan(self):
+        """ the lifespan protocol completes startup and shutdown """
+
+        messages = [ { 'type': 'lifespan.startup' }, { 'type': 'lifespan.shutdown' } ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(AsgiBridge(app)({ 'type': 'lifespan' }, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+
+    def test_wsgi_environ(self):
+        """ wsgi_environ maps the asgi scope to a wsgi environ """
+
+        environ = wsgi_environ({
+            'type': 'http', 'method': 'GET', 'path': '/api/spells', 'root_path': '/api', 'query_string': b'page=2',
+            'headers': [ (b'accept', b'text/html'), (b'accept', b'application/json'), (b'content-type', b'application/json') ],
+        }, b'{}')
+        assert (environ['SCRIPT_NAME'], environ['PATH_INFO'], environ['QUERY_STRING']) == ('/api', '/spells', 'page=2')
+        assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+        assert (environ['CONTENT_TYPE'], environ['CONTENT_LENGTH']) == ('application/json', '2')
+        assert environ['wsgi.input'].read() == b'{}'
+
+
+class TestAsyncEngines:
+    """ [TESTING SUITE: <ASGI async engines>] """
+
+    def test_async_url(self):
+        """ async_url swaps in the async driver of the database """
+
+        assert async_url('sqlite:////data/app.db').render_as_string() == 'sqlite+aiosqlite:////data/app.db'
+        assert async_url('postgresql://user:pw@db/monsters').drivername == 'postgresql+asyncpg'
+        with pytest.raises(ValueError):
+            async_url('mysql://db/monsters')
+
+    def test_async_engine_options(self):
+        """ async_engine_options hands the statement timeout to asyncpg and shares one in memory sqlite connection """
+
+        options = { 'pool_size': 5, 'connect_args': { 'options': '-c statement_timeout=2500' } }
+        assert async_engine_options(options, async_url('postgresql://db/monsters')) == { 'pool_size': 5, 'connect_args': { 'server_settings': { 'statement_timeout': '2500' } } }
+        assert async_engine_options({}, async_url('sqlite://')) == { 'poolclass': StaticPool }
+
+    def test_routes_on_async_engine(self, tmp_path):
+        """ with aiosqlite the routes read and write through the async engine """
+
+        pytest.importorskip('aiosqlite')
+        uri = f"sqlite:///{tmp_path / 'app.db'}"
+        sync_app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': uri })
+        with sync_app.app_context():
+            db.create_all()
+            m = Monster(**MONSTER_ONE)
+            db.session.add_all([ m, Spell(name='Aid', school='abjuration'), Skill(name='history', value=2, monster=m) ])
+            db.session.commit()
+            db.session.remove()
+
+        bridge = create_asgi_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': uri })
+        assert bridge.engines[0].url.drivername == 'sqlite+aiosqlite'
+        client = sync_app.test_client()
+        for path in ['/monsters/1', '/monsters/1/skills', '/spells/1', '/spells']:
+            [(status, _, body, _)] = run(call(bridge, 'GET', path))
+            assert (status, json.loads(body)) == (200, client.get(path).json)
+
+        [(status, _, _, _)] = run(call(bridge, 'PATCH', '/spells/1', body=b'{"level": 3}', headers=[ ('Content-Type', 'application/json') ]))
+        assert status == 202
+        assert client.get('/spells/1').json['level'] == 3
+        asyncio.run(bridge.engines[0].dispose())
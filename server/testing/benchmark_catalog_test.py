@@ -0,0 +1,59 @@
+from sqlalchemy import select, func
+
+from models import db, Monster, MonsterSpell
+from create_app import create_app
+from benchmarks.catalog_generator import CatalogGenerator, load_catalog, catalog_size
+from benchmarks.route_benchmark import summarize, compare
+
+class TestBenchmarkCatalog:
+    """ [TESTING SUITE: <Benchmark catalog>] """
+
+    def test_same_seed_same_catalog(self):
+        """ the generator returns the same catalog for the same seed """
+
+        first = CatalogGenerator(7)
+        second = CatalogGenerator(7)
+        spells = first.spells(20)
+        assert spells == second.spells(20)
+        names = [ s['name'] for s in spells ]
+        assert first.monsters(10, names) == second.monsters(10, names)
+        assert CatalogGenerator(8).spells(20) != spells
+
+    def test_generated_monsters_post(self):
+        """ generated monsters pass the validation of POST /monsters """
+
+        app = create_app('TESTING')
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            generator = CatalogGenerator(1)
+            spells = generator.spells(5)
+            for spell in spells:
+                assert client.post('/spells', json=spell).status_code == 201
+            for monster in generator.monsters(5, [ s['name'] for s in spells ]):
+                response = client.post('/monsters', json=monster)
+                assert response.status_code == 201, response.json
+            db.drop_all()
+
+    def test_load_catalog(self):
+        """ load_catalog bulk loads the monsters with their spells """
+
+        app = create_app('TESTING')
+        with app.app_context():
+            db.create_all()
+            loaded = load_catalog(250, seed=3)
+            assert loaded == { 'monsters': 250, 'spells': 100, 'missing_spells': 0 }
+            assert catalog_size() == { 'monsters': 250, 'spells': 100 }
+            assert db.session.execute(select(func.count()).select_from(MonsterSpell)).scalar() > 0
+            assert db.session.execute(select(func.count(func.distinct(Monster.name)))).scalar() == 250
+            db.drop_all()
+
+    def test_compare_flags_regressions(self):
+        """ compare flags scenarios whose p50 grew past the threshold """
+
+        old = { 'scenarios': { 'a': summarize([0.010] * 10, 0), 'b': summarize([0.010] * 10, 0), 'c': summarize([], 0) } }
+        new = { 'scenarios': { 'a': summarize([0.011] * 10, 0), 'b': summarize([0.020] * 10, 0), 'c': summarize([0.010], 0) } }
+        rows = { row['name']: row for row in compare(old, new, 0.2) }
+        assert not rows['a']['regressed']
+        assert rows['b']['regressed']
+        assert 'c' not in rows
@@ -0,0 +1,228 @@
+import os
+import json
+import pytest
+
+from models import db, Monster, Spell, Skill, CatalogFile
+from create_app import create_app
+from catalog import normalize_monster, run_import, format_import_stats
+from catalog.normalize import normalize_challenge_rating
+
+app = create_app('TESTING')
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', '..', 'examples')
+
+def example(name):
+    with open(os.path.join(EXAMPLES, name)) as json_file:
+        return json.load(json_file)
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def source(tmp_path):
+    spells = tmp_path / 'spells'
+    monsters = tmp_path / 'monsters'
+    spells.mkdir()
+    monsters.mkdir()
+
+    acid_splash = example('acid-splash.json')
+    for name in ['Acid Splash', 'Blade Ward', 'Mending']:
+        (spells / f"{name}.json").write_text(json.dumps({ **acid_splash, 'name': name }))
+
+    abjurer = example('abjurer.json')
+    for i in range(12):
+        (monsters / f"abjurer-{i:02}.json").write_text(json.dumps({ **abjurer, 'name': f"Abjurer {i}" }))
+    (monsters / 'abjurer-copy.json').write_text(json.dumps({ **abjurer, 'name': 'ABJURER 0' }))
+    (monsters / 'broken.json').write_text(json.dumps({ 'name': 'Broken' }))
+    return str(spells), str(monsters)
+
+
+class TestNormalizeMonster:
+    """ [TESTING SUITE: <Catalog normalization>] """
+
+    def test_normalize_monster(self):
+        """ normalize_monster turns a scraped monster into a POST /monsters body """
+
+        monster = normalize_monster(example('abjurer.json'))
+
+        assert (monster['category'], monster['sub_category']) == ('Humanoid', 'Any Race')
+        assert (monster['hit_dice_count'], monster['hit_dice_size']) == (13, 8)
+        assert monster['challenge_rating'] == 9
+        assert monster['spell_save_dc'] == 16
+        assert monster['saving_throws'] == [ { 'name': 'INT', 'value': 8 }, { 'name': 'WIS', 'value': 5 } ]
+        assert monster['skills'] == [ { 'name': 'Arcana', 'value': 8 }, { 'name': 'History', 'value': 8 } ]
+        assert monster['passive_perception'] == 11
+        assert monster['senses'] == []
+        assert monster['speeds'] == [ { 'name': 'walk', 'distance': 30 } ]
+        assert monster['spellcasting_ability'] == 'Intelligence'
+        assert monster['spell_slots_seventh_level'] == 1
+        assert 'blade ward' in monster['spells']
+
+    def test_normalize_monster_fractions_and_reactions(self):
+        """ normalize_monster reads fractional challenge ratings, senses and reactions """
+
+        monster = normalize_monster({
+            **example('abjurer.json'),
+            'challenge_rating': '1/4',
+            'senses': 'Darkvision 60 ft. | Passive Perception 9',
+            'proficiencies': 'Skill: Sleight of Hand +4',
+            'reactions': [ { 'name': 'Parry', 'desc': 'Adds 2 to its AC.' } ],
+        })
+
+        assert monster['challenge_rating'] == 0.25
+        assert monster['senses'] == [ { 'name': 'darkvision', 'distance': 60 } ]
+        assert monster['skills'] == [ { 'name': 'Sleight of Hand', 'value': 4 } ]
+        assert monster['actions'][-1] == { 'name': 'Parry', 'description': 'Adds 2 to its AC.', 'reaction': True }
+
+    def test_normalize_challenge_rating(self):
+        """ normalize_challenge_rating keeps numbers and reads fractions and decimal strings """
+
+        assert normalize_challenge_rating(None) == 0
+        assert normalize_challenge_rating(2) == 2
+        assert normalize_challenge_rating(0.5) == 0.5
+        assert normalize_challenge_rating('1/8') == 0.125
+        assert normalize_challenge_rating('0.25') == 0.25
+        assert normalize_challenge_rating('12') == 12
+        with pytest.raises(ValueError):
+            normalize_challenge_rating('a lot')
+
+
+class TestRunImport:
+    """ [TESTING SUITE: <Catalog import pipeline>] """
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_run_import(self, source, workers):
+        """ run_import parses in worker processes and inserts every monster, spell and nested row """
+
+        stats = run_import(*source, workers=workers, batch_size=5)
+
+        assert stats['files'] == 17
+        assert [ os.path.basename(path) for path, _ in stats['errors'] ] == ['broken.json']
+        assert [ os.path.basename(path) for path in stats['duplicates'] ] == ['abjurer-copy.json']
+        assert Monster.query.count() == stats['rows']['monsters_table'] == 12
+        assert Spell.query.count() == stats['rows']['spells_table'] == 3
+        assert Skill.query.count() == stats['rows']['skills_table'] == 24
+        assert stats['rows']['monster_spells_table'] == 24
+
+        m = Monster.query.where(Monster.name == 'Abjurer 3').first()
+        assert sorted( s.name for s in m.spells ) == ['Blade Ward', 'Mending']
+        assert m.spellcasting_ability == 'Intelligence'
+        assert any( 'rows/sec' in line for line in format_import_stats(stats) )
+
+    def test_run_import_replaces_catalog(self, source):
+        """ run_import removes rows that are not in the source directories """
+
+        db.session.add(Spell(name='Wish', school='conjuration'))
+        db.session.commit()
+
+        run_import(*source, workers=1)
+        assert Spell.query.where(Spell.name == 'Wish').first() is None
+        assert Monster.query.count() == 12
+
+
+class TestIncrementalImport:
+    """ [TESTING SUITE: <Incremental catalog import>] """
+
+    def test_unchanged_files_are_skipped(self, source):
+        """ run_import with incremental only parses files that changed since the last import """
+
+        run_import(*source, workers=1)
+        assert CatalogFile.query.count() == 15
+
+        stats = run_import(*source, workers=1, incremental=True)
+        assert stats['unchanged'] == 15
+        # the broken file and the duplicate are read again
+        assert stats['files'] == 2
+        assert sum(stats['rows'].values()) == 0
+        assert Monster.query.count() == 12
+
+    def test_changed_and_vanished_files(self, source):
+        """ run_import with incremental rewrites changed rows in place and deletes rows whose file is gone """
+
+        spells, monsters = source
+        run_import(*source, workers=1)
+        m = Monster.query.where(Monster.name == 'Abjurer 1').first()
+        id, version = m.id, m.version
+
+        changed = json.loads(open(os.path.join(monsters, 'abjurer-01.json')).read())
+        with open(os.path.join(monsters, 'abjurer-01.json'), 'w') as f:
+            f.write(json.dumps({ **changed, 'hit_points': 90 }))
+        os.remove(os.path.join(monsters, 'abjurer-02.json'))
+        with open(os.path.join(monsters, 'new.json'), 'w') as f:
+            f.write(json.dumps({ **changed, 'name': 'Abjurer 99' }))
+        db.session.expunge_all()
+
+        stats = run_import(*source, workers=2, incremental=True)
+        db.session.expunge_all()
+
+        assert stats['deleted'] == 1
+        assert stats['rows']['monsters_table'] == 2
+        m = Monster.query.where(Monster.name == 'Abjurer 1').first()
+        assert (m.id, m.hit_points) == (id, 90)
+        assert m.version > version
+        assert sorted( s.name for s in m.spells ) == ['Blade Ward', 'Mending']
+        assert Monster.query.where(Monster.name == 'Abjurer 2').first() is None
+        assert Monster.query.where(Monster.name == 'Abjurer 99').first()
+        assert Skill.query.count() == 24
+        assert CatalogFile.query.count() == 15
+
+    def test_changed_spell_keeps_links(self, source):
+        """ run_import with incremental updates a changed spell without unlinking its monsters """
+
+        spells, monsters = source
+        run_import(*source, workers=1)
+        version = Monster.query.first().version
+
+        path = os.path.join(spells, 'Mending.json')
+        changed = json.loads(open(path).read())
+        with open(path, 'w') as f:
+            f.write(json.dumps({ **changed, 'level': 2 }))
+        db.session.expunge_all()
+
+        run_import(*source, workers=1, incremental=True)
+        db.session.expunge_all()
+
+        mending = Spell.query.where(Spell.name == 'Mending').first()
+        assert mending.level == 2
+        assert len(mending.monster_spells) == 12
+        assert Monster.query.first().version == version + 1
+
+
+class TestCatalogCommand:
+    """ [TESTING SUITE: <flask catalog import>] """
+
+    def test_import_command(self, source, tmp_path):
+        """ flask catalog import writes the catalog, prints a summary and appends errors to --log """
+
+        spells, monsters = source
+        log = tmp_path / 'log.txt'
+        result = app.test_cli_runner().invoke(args=['catalog', 'import', '--spells', spells, '--monsters', monsters, '--workers', '2', '--batch-size', '4', '--log', str(log)])
+
+        assert result.exit_code == 1
+        assert 'monsters: 14/14 files' in result.output
+        assert 'monsters_table: 12' in result.output
+        assert 'Parse:' in result.output
+        assert 'broken.json' in log.read_text()
+        assert Monster.query.count() == 12
+
+    def test_dry_run(self, source):
+        """ flask catalog import --dry-run validates every file without writing """
+
+        spells, monsters = source
+        db.session.add(Spell(name='Wish', school='conjuration'))
+        db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['catalog', 'import', '--spells', spells, '--monsters', monsters, '--workers', '1', '--dry-run'])
+
+        assert 'monsters_table: 12' in result.output
+        assert 'broken.json' in result.output
+        assert [ s.name for s in Spell.query.all() ] == ['Wish']
+        assert Monster.query.count() == 0
+        assert CatalogFile.query.count() == 0
@@ -0,0 +1,152 @@
+import gzip
+import json
+import pytest
+
+from models import db, Monster, Spell, Skill, MonsterSpell, CatalogFile
+from create_app import create_app
+from catalog import run_import, write_snapshot, read_snapshot_header, restore_snapshot, SNAPSHOT_VERSION
+from catalog.snapshot import copy_csv
+from catalog_import_test import source
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+def catalog_rows():
+    return {
+        model.__tablename__: [ tuple(row) for row in db.session.execute(db.select(model.__table__).order_by(model.id)) ]
+        for model in [ Monster, Spell, Skill, MonsterSpell, CatalogFile ]
+    }
+
+class TestCatalogSnapshot:
+    """ [TESTING SUITE: <Catalog snapshots>] """
+
+    def test_snapshot_round_trip(self, source, tmp_path):
+        """ restore_snapshot brings back every row with its id, version and timestamps """
+
+        spells, monsters = source
+        with app.app_context():
+            run_import(spells, monsters, workers=1, incremental=True)
+            before = catalog_rows()
+            path = str(tmp_path / 'catalog.snapshot')
+            header = write_snapshot(path, batch_size=5)
+
+            assert header['version'] == SNAPSHOT_VERSION
+            assert header['tables']['monsters_table']['rows'] == 12
+            # one header line and batches of at most five rows
+            with gzip.open(path, 'rt') as snapshot:
+                lines = snapshot.read().splitlines()
+            batches = [ json.loads(line) for line in lines[1:] ]
+            assert [ len(b['data'][0]) for b in batches if b['table'] == 'monsters_table' ] == [5, 5, 2]
+
+            db.session.execute(db.delete(Skill))
+            Monster.query.first().name = 'Renamed'
+            db.session.add(Spell(name='Not In Snapshot', school='abjuration'))
+            db.session.commit()
+
+            restored = restore_snapshot(path)
+            db.session.expire_all()
+            assert restored['monsters_table'] == 12
+            assert catalog_rows() == before
+
+    def test_restore_keeps_search_index(self, source, tmp_path):
+        """ restored rows are searchable and new rows continue after the restored ids """
+
+        spells, monsters = source
+        with app.app_context():
+            run_import(spells, monsters, workers=1)
+            path = str(tmp_path / 'catalog.snapshot')
+            write_snapshot(path)
+            restore_snapshot(path)
+
+            res = app.test_client().get('/search?q=mending')
+            assert [ hit['name'] for hit in res.json ] == ['Mending']
+
+            spell = Spell(name='New Spell', school='abjuration')
+            db.session.add(spell)
+            db.session.commit()
+            assert spell.id > max( s.id for s in Spell.query.where(Spell.name != 'New Spell') )
+
+    def test_round_trip_keeps_empty_strings(self, tmp_path):
+        """ an empty string comes back as an empty string and a null as a null """
+
+        with app.app_context():
+            db.session.add(Spell(name='Blank', school='abjuration', description='', duration=None, range_area='say "hi"'))
+            db.session.commit()
+            path = str(tmp_path / 'catalog.snapshot')
+            write_snapshot(path)
+            restore_snapshot(path)
+            db.session.expire_all()
+
+            spell = Spell.query.one()
+            assert (spell.description, spell.duration, spell.range_area) == ('', None, 'say "hi"')
+
+    def test_copy_csv(self):
+        """ COPY rows quote every value so postgres tells an empty string from a null """
+
+        assert copy_csv([ (1, '', None, 'say "hi"', True), (2, None, 'a,b\nc', '', False) ]) == (
+            '"1","",,"say ""hi""","True"\n'
+            '"2",,"a,b\nc","","False"\n'
+        )
+
+    def test_restore_rejects_other_versions(self, tmp_path):
+        """ a snapshot of another version or with unknown columns is refused before anything is deleted """
+
+        with app.app_context():
+            db.session.add(Spell(name='Kept', school='abjuration'))
+            db.session.commit()
+            path = str(tmp_path / 'catalog.snapshot')
+            header = write_snapshot(path)
+
+            with gzip.open(path, 'wt') as snapshot:
+                snapshot.write(json.dumps({ **header, 'version': SNAPSHOT_VERSION + 1 }) + '\n')
+            with pytest.raises(ValueError, match='version'):
+                restore_snapshot(path)
+
+            header['tables']['spells_table']['columns'].append('mana_cost')
+            with gzip.open(path, 'wt') as snapshot:
+                snapshot.write(json.dumps(header) + '\n')
+            with pytest.raises(ValueError, match='mana_cost'):
+                read_snapshot_header(path)
+
+            (tmp_path / 'not-a-snapshot').write_text('{}')
+            with pytest.raises(ValueError):
+                read_snapshot_header(str(tmp_path / 'not-a-snapshot'))
+
+            assert [ s.name for s in Spell.query.all() ] == ['Kept']
+
+    def test_snapshot_and_restore_commands(self, source, tmp_path):
+        """ flask catalog snapshot and flask catalog restore """
+
+        spells, monsters = source
+        path = str(tmp_path / 'catalog.snapshot')
+        with app.app_context():
+            run_import(spells, monsters, workers=1)
+
+        result = app.test_cli_runner().invoke(args=['catalog', 'snapshot', path])
+        assert result.exit_code == 0
+        assert 'monsters_table: 12' in result.output
+
+        with app.app_context():
+            db.session.execute(db.delete(MonsterSpell))
+            db.session.execute(db.delete(Monster))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['catalog', 'restore', path])
+        assert result.exit_code == 0
+        assert 'monsters_table: 12' in result.output
+        with app.app_context():
+            assert Monster.query.count() == 12
+
+        (tmp_path / 'bad').write_text('nope')
+        result = app.test_cli_runner().invoke(args=['catalog', 'restore', str(tmp_path / 'bad')])
+        assert result.exit_code == 1
+        assert 'not a catalog snapshot' in result.output
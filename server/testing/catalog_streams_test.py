@@ -0,0 +1,122 @@
+import io
+import json
+import zipfile
+import pytest
+
+from models import db, Monster
+from create_app import create_app
+from catalog import run_import
+from catalog.streams import iter_json_values, iter_records
+from testing.catalog_import_test import example
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def spells(tmp_path):
+    path = tmp_path / 'spells.json'
+    path.write_text(json.dumps([ { **example('acid-splash.json'), 'name': name } for name in ['Blade Ward', 'Mending'] ]))
+    return str(path)
+
+def monsters(count):
+    abjurer = example('abjurer.json')
+    return [ { **abjurer, 'name': f"Abjurer {i}" } for i in range(count) ]
+
+
+class TestStreams:
+    """ [TESTING SUITE: <Catalog streaming sources>] """
+
+    def test_json_array_across_chunks(self):
+        """ iter_json_values decodes array elements that span many reads """
+
+        values = [ { 'name': f"Monster {i}", 'tags': [ 'x' * i, { 'n': i, 'cr': i / 8, 'legendary': i % 2 == 0, 'lair': None } ] } for i in range(50) ]
+        stream = io.StringIO(' \n' + json.dumps(values, indent=2))
+        assert list(iter_json_values(stream, chunk_size=7)) == values
+
+        assert list(iter_json_values(io.StringIO('{ "name": "One" }'), chunk_size=4)) == [ { 'name': 'One' } ]
+        assert list(iter_json_values(io.StringIO('[]'))) == []
+
+    def test_truncated_array(self):
+        """ iter_json_values raises a ValueError for an array that never ends """
+
+        with pytest.raises(ValueError):
+            list(iter_json_values(io.StringIO('[{ "name": "One" }, { "name"'), chunk_size=4))
+
+    def test_malformed_element(self):
+        """ iter_json_values raises at a malformed element without reading the rest of the array """
+
+        good = json.dumps({ 'name': 'One', 'text': 'x' * 100 })
+        stream = io.StringIO('[' + good + ', { "name": "Two", oops }, ' + ', '.join([ good ] * 1000) + ']')
+        values = iter_json_values(stream, chunk_size=64)
+        assert next(values)['name'] == 'One'
+        with pytest.raises(ValueError, match=f"element 2 at offset {len(good) + 3}"):
+            next(values)
+        assert stream.tell() < 64 * 5
+
+    def test_element_too_long(self):
+        """ iter_json_values raises once an element grows past max_size """
+
+        stream = io.StringIO('[{ "name": "' + 'x' * 10_000 + '" }]')
+        with pytest.raises(ValueError, match="longer than 1000 characters"):
+            list(iter_json_values(stream, chunk_size=64, max_size=1000))
+        assert stream.tell() < 1200
+
+    def test_ndjson_and_zip(self, tmp_path):
+        """ iter_records reads ndjson line by line and every json member of a zip """
+
+        ndjson = tmp_path / 'monsters.ndjson'
+        ndjson.write_text('{ "name": "One" }\n\n{ oops\n{ "name": "Two" }\n')
+        records = list(iter_records(str(ndjson)))
+        assert [ label.split(':')[-1] for label, _ in records ] == ['1', '2', '3']
+        assert isinstance(records[1][1], ValueError)
+
+        archive = tmp_path / 'monsters.zip'
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.write(ndjson, 'a.ndjson')
+            z.writestr('b.json', '[{ "name": "Three" }]')
+            z.writestr('README.txt', 'not json')
+        names = [ record.get('name') for _, record in iter_records(str(archive)) if isinstance(record, dict) ]
+        assert names == ['One', 'Two', 'Three']
+
+
+class TestStreamImport:
+    """ [TESTING SUITE: <Catalog import from one file>] """
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_import_ndjson(self, tmp_path, spells, workers):
+        """ run_import reads a monster ndjson file in batches and records bad lines as errors """
+
+        path = tmp_path / 'monsters.ndjson'
+        path.write_text(''.join( json.dumps(m) + '\n' for m in monsters(25) ) + '{ oops\n')
+
+        stats = run_import(spells, str(path), workers=workers, batch_size=4)
+
+        assert Monster.query.count() == 25
+        assert stats['rows']['monster_spells_table'] == 50
+        assert [ label for label, _ in stats['errors'] ] == [ f"{path}:26" ]
+
+    def test_import_zip(self, tmp_path, spells):
+        """ run_import reads a zip of json arrays """
+
+        archive = tmp_path / 'monsters.zip'
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('part-1.json', json.dumps(monsters(3)))
+            z.writestr('part-2.json', json.dumps(monsters(6)[3:]))
+
+        run_import(spells, str(archive), workers=1, batch_size=2)
+        assert Monster.query.count() == 6
+
+    def test_incremental_needs_directories(self, tmp_path, spells):
+        """ run_import with incremental refuses single file sources """
+
+        with pytest.raises(ValueError):
+            run_import(spells, spells, incremental=True)
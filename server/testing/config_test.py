@@ -0,0 +1,93 @@
+import os
+import sys
+import runpy
+import types
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool, QueuePool
+
+from models import db
+from create_app import create_app
+from config import engine_options
+
+GUNICORN_CONF = os.path.join(os.path.dirname(__file__), '..', 'gunicorn.conf.py')
+
+DATABASE_ENV = [ 'DATABASE_POOL', 'DATABASE_POOL_SIZE', 'DATABASE_MAX_OVERFLOW', 'DATABASE_POOL_TIMEOUT', 'DATABASE_POOL_RECYCLE', 'DATABASE_POOL_PRE_PING', 'DATABASE_STATEMENT_TIMEOUT' ]
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in DATABASE_ENV:
+        monkeypatch.delenv(name, raising=False)
+
+class TestEngineOptions:
+    """ [TESTING SUITE: <Engine options>] """
+
+    def test_pool_defaults(self):
+        """ engine_options pings and recycles pooled connections by default """
+
+        assert engine_options('postgresql://db/monsters') == {
+            'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': True
+        }
+
+    def test_pool_from_env(self, monkeypatch):
+        """ engine_options reads the pool settings and statement timeout from the environment """
+
+        monkeypatch.setenv('DATABASE_POOL_SIZE', '20')
+        monkeypatch.setenv('DATABASE_MAX_OVERFLOW', '0')
+        monkeypatch.setenv('DATABASE_POOL_TIMEOUT', '5')
+        monkeypatch.setenv('DATABASE_POOL_RECYCLE', '300')
+        monkeypatch.setenv('DATABASE_POOL_PRE_PING', 'false')
+        monkeypatch.setenv('DATABASE_STATEMENT_TIMEOUT', '2500')
+
+        assert engine_options('postgresql://db/monsters') == {
+            'pool_size': 20, 'max_overflow': 0, 'pool_timeout': 5, 'pool_recycle': 300, 'pool_pre_ping': False,
+            'connect_args': { 'options': '-c statement_timeout=2500' },
+        }
+        assert engine_options('mysql://db/monsters')['connect_args'] == { 'init_command': 'SET SESSION max_execution_time=2500' }
+        assert 'connect_args' not in engine_options('sqlite:///app.db')
+
+    def test_null_pool(self, monkeypatch):
+        """ DATABASE_POOL=null opens a connection per checkout """
+
+        monkeypatch.setenv('DATABASE_POOL', 'null')
+        monkeypatch.setenv('DATABASE_POOL_SIZE', '20')
+        assert engine_options('postgresql://db/monsters') == { 'poolclass': NullPool }
+
+    def test_app_engine_uses_options(self, monkeypatch, tmp_path):
+        """ the app's engine is built from SQLALCHEMY_ENGINE_OPTIONS """
+
+        uri = f"sqlite:///{tmp_path / 'app.db'}"
+        monkeypatch.setenv('DATABASE_POOL_SIZE', '3')
+        app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': uri, 'SQLALCHEMY_ENGINE_OPTIONS': engine_options(uri) })
+        with app.app_context():
+            assert isinstance(db.engine.pool, QueuePool)
+            assert db.engine.pool.size() == 3
+
+        monkeypatch.setenv('DATABASE_POOL', 'null')
+        app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': uri, 'SQLALCHEMY_ENGINE_OPTIONS': engine_options(uri) })
+        with app.app_context():
+            assert isinstance(db.engine.pool, NullPool)
+
+
+class TestGunicornConfig:
+    """ [TESTING SUITE: <Gunicorn config>] """
+
+    def test_post_fork_replaces_inherited_pool(self, monkeypatch, tmp_path):
+        """ post_fork gives a forked worker a fresh pool instead of the master's connections """
+
+        uri = f"sqlite:///{tmp_path / 'app.db'}"
+        app = create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': uri, 'SQLALCHEMY_ENGINE_OPTIONS': engine_options(uri) })
+        monkeypatch.setitem(sys.modules, 'app', types.SimpleNamespace(app=app))
+        gunicorn_conf = runpy.run_path(GUNICORN_CONF)
+        assert gunicorn_conf['preload_app']
+
+        with app.app_context():
+            with db.engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            inherited = db.engine.pool
+            assert inherited.checkedin() == 1
+
+            gunicorn_conf['post_fork'](None, None)
+
+            assert db.engine.pool is not inherited
+            assert db.engine.pool.checkedin() == 0
@@ -0,0 +1,34 @@
+from metrics import Counter, Histogram, format_labels
+
+
+class TestMetrics:
+    """ [TESTING SUITE: <Metrics>] """
+
+    def test_histogram_buckets(self):
+        """ Histogram buckets are cumulative and end with +Inf """
+
+        histogram = Histogram('latency', "latency", ('endpoint',), (0.1, 1))
+        for seconds in [0.05, 0.5, 5]:
+            histogram.observe(('a',), seconds)
+        samples = { name + labels: value for name, labels, value in histogram.samples() }
+
+        assert samples['latency_bucket{endpoint="a",le="0.1"}'] == 1
+        assert samples['latency_bucket{endpoint="a",le="1"}'] == 2
+        assert samples['latency_bucket{endpoint="a",le="+Inf"}'] == 3
+        assert samples['latency_sum{endpoint="a"}'] == 5.55
+        assert samples['latency_count{endpoint="a"}'] == 3
+
+    def test_counter(self):
+        """ Counter adds up each set of label values """
+
+        counter = Counter('requests_total', "requests", ('status',))
+        counter.inc(('200',))
+        counter.inc(('200',), 2)
+        counter.inc(('404',))
+        assert counter.samples() == [ ('requests_total', '{status="200"}', 3), ('requests_total', '{status="404"}', 1) ]
+
+    def test_label_escaping(self):
+        """ label values escape backslashes, quotes and newlines """
+
+        assert format_labels(('q',), ('a"b\\c\nd',)) == '{q="a\\"b\\\\c\\nd"}'
+        assert format_labels((), ()) == ''
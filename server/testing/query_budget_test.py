@@ -0,0 +1,22 @@
+from query_budget import fingerprint
+
+
+class TestQueryBudget:
+    """ [TESTING SUITE: <Query budget>] """
+
+    def test_fingerprint_literals(self):
+        """ fingerprint collapses literals, placeholders and whitespace """
+
+        assert fingerprint("SELECT * FROM t WHERE id = 4 AND name = 'it''s'") == "SELECT * FROM t WHERE id = ? AND name = ?"
+        assert fingerprint("SELECT *\n  FROM t WHERE id = %(id_1)s") == "SELECT * FROM t WHERE id = ?"
+        assert fingerprint("SELECT * FROM t WHERE id = $1") == "SELECT * FROM t WHERE id = ?"
+
+    def test_fingerprint_in_lists(self):
+        """ fingerprint collapses IN lists of any length """
+
+        assert fingerprint("SELECT * FROM t WHERE id IN (?, ?, ?)") == fingerprint("SELECT * FROM t WHERE id IN (?)")
+
+    def test_fingerprint_keeps_identifiers(self):
+        """ fingerprint keeps digits that are part of names """
+
+        assert fingerprint("SELECT anon_1.id FROM spell_slots_2 AS anon_1") == "SELECT anon_1.id FROM spell_slots_2 AS anon_1"
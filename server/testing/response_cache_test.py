@@ -0,0 +1,62 @@
+import time
+
+from response_cache import ResponseCache
+
+
+def response(body):
+    return (200, [('Content-Type', 'application/json')], body)
+
+
+class TestResponseCache:
+    """ [TESTING SUITE: <ResponseCache>] """
+
+    def test_get_and_set(self):
+        """ ResponseCache.get returns what was set and counts hits and misses """
+
+        cache = ResponseCache(1024, 60)
+        assert cache.get('/monsters?') is None
+        cache.set('/monsters?', response(b'[]'), ['monsters'])
+        assert cache.get('/monsters?') == response(b'[]')
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    def test_lru_eviction(self):
+        """ ResponseCache evicts the least recently used entries to stay under max_bytes """
+
+        cache = ResponseCache(200, 60)
+        cache.set('a', response(b'x' * 50), ['a'])
+        cache.set('b', response(b'x' * 50), ['b'])
+        cache.get('a')
+        cache.set('c', response(b'x' * 50), ['c'])
+
+        assert cache.get('b') is None
+        assert cache.get('a') and cache.get('c')
+        assert cache.stats()['size_bytes'] <= 200
+        assert cache.stats()['evictions'] == 1
+
+        cache.set('d', response(b'x' * 500), ['d'])
+        assert cache.get('d') is None
+
+    def test_ttl(self):
+        """ ResponseCache drops entries older than the ttl """
+
+        cache = ResponseCache(1024, 0.05)
+        cache.set('a', response(b'{}'), ['a'])
+        time.sleep(0.06)
+        assert cache.get('a') is None
+        assert cache.stats()['expirations'] == 1
+        assert cache.stats()['entries'] == 0
+
+    def test_invalidate_by_tag(self):
+        """ ResponseCache.invalidate removes only the entries with the given tags """
+
+        cache = ResponseCache(1024, 60)
+        cache.set('/monsters/1?', response(b'{}'), ['monster:1'])
+        cache.set('/monsters/1/skills?', response(b'[]'), ['monster:1'])
+        cache.set('/monsters/2?', response(b'{}'), ['monster:2'])
+
+        cache.invalidate(['monster:1'])
+        assert cache.get('/monsters/1?') is None
+        assert cache.get('/monsters/1/skills?') is None
+        assert cache.get('/monsters/2?')
+        assert cache.stats()['invalidations'] == 2
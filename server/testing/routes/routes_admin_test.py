@@ -0,0 +1,94 @@
+import pytest
+
+import slow_queries
+from models import db, Monster, Spell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE
+
+app = create_app('TESTING', { 'ADMIN_TOKEN': 'secret', 'SLOW_QUERY_MS': 0 })
+ADMIN = { 'Authorization': 'Bearer secret' }
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([ Monster(**MONSTER_ONE), Spell(name="Aid", school="abjuration") ])
+        db.session.commit()
+        app.extensions['slow_query_log'].clear()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestAdminRoutes:
+    """ [TESTING SUITE: <Admin routes>] """
+
+    def test_admin_token(self):
+        """ <GET /admin/slow-queries> needs the admin token """
+
+        client = app.test_client()
+        assert client.get('/admin/slow-queries').status_code == 401
+        res = client.get('/admin/slow-queries', headers={ 'Authorization': 'Bearer wrong' })
+        assert res.status_code == 401
+        assert res.json == { "error": "invalid admin token" }
+        assert client.get('/admin/slow-queries', headers={ 'Authorization': 'secret' }).status_code == 401
+        assert client.get('/admin/slow-queries', headers=ADMIN).status_code == 200
+
+    def test_admin_disabled(self):
+        """ <GET /admin/slow-queries> returns 404 while ADMIN_TOKEN is not set """
+
+        res = create_app('TESTING').test_client().get('/admin/slow-queries', headers=ADMIN)
+        assert res.status_code == 404
+
+    def test_slow_queries(self):
+        """ <GET /admin/slow-queries> lists statements over SLOW_QUERY_MS with their route, redacted parameters and plan """
+
+        app.test_client().get('/spells?name=Aid')
+        res = app.test_client().get('/admin/slow-queries?sort=recent', headers=ADMIN)
+
+        assert res.status_code == 200
+        assert res.json['enabled'] == True
+        query = res.json['queries'][0]
+        assert query['route'] == 'GET /spells'
+        assert query['endpoint'] == 'spell_routes_blueprint.get_spells'
+        assert query['sql'].startswith('SELECT')
+        assert 'Aid' not in str(query['parameters'])
+        assert '<str>' in query['parameters']
+        assert any( line.startswith('SCAN spells_table') for line in query['plan'] )
+
+    def test_failed_explain_keeps_the_request(self, monkeypatch):
+        """ a plan that can't be captured is recorded and the request's writes still commit """
+
+        monkeypatch.setitem(slow_queries.EXPLAIN_PREFIXES, 'sqlite', 'EXPLAIN NOTHING')
+        res = app.test_client().post('/spells', json={ 'name': 'Mending', 'school': 'transmutation' })
+        assert res.status_code == 201
+        assert Spell.query.filter_by(name='Mending').count() == 1
+
+        queries = app.test_client().get('/admin/slow-queries', headers=ADMIN).json['queries']
+        insert = next( q for q in queries if q['sql'].startswith('INSERT') )
+        assert insert['plan'][0].startswith('EXPLAIN failed')
+
+    def test_slowest_first(self):
+        """ <GET /admin/slow-queries> lists the slowest statements first """
+
+        app.test_client().get('/monsters/1')
+        queries = app.test_client().get('/admin/slow-queries', headers=ADMIN).json['queries']
+        durations = [ q['duration_ms'] for q in queries ]
+        assert durations and durations == sorted(durations, reverse=True)
+
+    def test_sort_validation(self):
+        """ <GET /admin/slow-queries> returns a 400 error for an unknown sort """
+
+        res = app.test_client().get('/admin/slow-queries?sort=name', headers=ADMIN)
+        assert res.status_code == 400
+        assert res.json == { "error": "sort must be one of duration, recent" }
+
+    def test_delete_slow_queries(self):
+        """ <DELETE /admin/slow-queries> clears the log """
+
+        app.test_client().get('/monsters/1')
+        assert app.test_client().delete('/admin/slow-queries', headers=ADMIN).status_code == 204
+        queries = app.test_client().get('/admin/slow-queries', headers=ADMIN).json['queries']
+        assert all( q['route'] == 'GET /admin/slow-queries' for q in queries )
@@ -0,0 +1,188 @@
+import pytest
+
+from models import db, Monster, Skill, Action, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING', { 'RESPONSE_CACHE_ENABLED': True })
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+        app.extensions['response_cache'].clear()
+
+        spells = [ Spell(name="Aid", school="abjuration"), Spell(name="Mage Hand", school="conjuration") ]
+        m1 = Monster(**MONSTER_ONE)
+        m2 = Monster(**MONSTER_TWO)
+        db.session.add_all([
+            m1,
+            m2,
+            *spells,
+            Skill(name='history', value=2, monster=m1),
+            Action(name='Bite', description='Bites something', monster=m1),
+            MonsterSpell(monster=m1, spell=spells[0]),
+        ])
+        db.session.commit()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def cache_status(url):
+    return app.test_client().get(url).headers['X-Cache']
+
+
+def warm(*urls):
+    for url in urls:
+        app.test_client().get(url)
+
+
+class TestResponseCacheRoutes:
+    """ [TESTING SUITE: <Response cache routes>] """
+
+    def test_get_routes_are_cached(self):
+        """ <GET> routes are served from the cache the second time """
+
+        for url in ['/monsters', '/monsters/1', '/monsters/1/skills', '/spells?page_count=1', '/spells/1', '/search?q=aid']:
+            res = app.test_client().get(url)
+            assert res.headers['X-Cache'] == 'MISS'
+            cached = app.test_client().get(url)
+            assert cached.headers['X-Cache'] == 'HIT'
+            assert cached.status_code == 200
+            assert cached.json == res.json
+            assert cached.headers['ETag'] == res.headers['ETag']
+
+    def test_query_string_is_normalized(self):
+        """ <GET /monsters?:query> shares an entry between orderings of the same query """
+
+        warm('/monsters?page=1&page_count=5')
+        assert cache_status('/monsters?page_count=5&page=1') == 'HIT'
+        assert cache_status('/monsters?page_count=4&page=1') == 'MISS'
+
+    def test_cached_responses_are_conditional(self):
+        """ <GET /monsters/:id> answers If-None-Match from the cache with a 304 """
+
+        etag = app.test_client().get('/monsters/1').headers['ETag']
+        res = app.test_client().get('/monsters/1', headers={ 'If-None-Match': etag })
+        assert res.status_code == 304
+        assert res.headers['X-Cache'] == 'HIT'
+
+    def test_errors_are_not_cached(self):
+        """ <GET /monsters/:id> does not cache a 404 """
+
+        warm('/monsters/99')
+        assert cache_status('/monsters/99') == 'MISS'
+
+    def test_stats(self):
+        """ <GET /cache/stats> returns the hit and miss counters """
+
+        before = app.test_client().get('/cache/stats').json
+        warm('/spells/1', '/spells/1')
+        res = app.test_client().get('/cache/stats')
+        assert res.status_code == 200
+        assert res.json['enabled'] == True
+        assert res.json['hits'] == before['hits'] + 1
+        assert res.json['misses'] == before['misses'] + 1
+        assert res.json['entries'] == 1
+
+
+class TestResponseCacheInvalidation:
+    """ [TESTING SUITE: <Response cache invalidation>] """
+
+    def test_patch_monster_invalidates_monster(self):
+        """ <PATCH /monsters/:id> invalidates that monster and the monster pages but not its nested routes """
+
+        warm('/monsters/1', '/monsters/1/skills', '/monsters/2', '/monsters', '/spells/1')
+        app.test_client().patch('/monsters/1', json={ 'name': 'Imp' })
+
+        assert app.test_client().get('/monsters/1').json['name'] == 'Imp'
+        assert cache_status('/monsters/1/skills') == 'HIT'
+        assert app.test_client().get('/monsters').json[0]['name'] == 'Imp'
+        assert cache_status('/monsters/2') == 'HIT'
+        assert cache_status('/spells/1') == 'HIT'
+
+    def test_post_and_delete_monster(self):
+        """ <POST DELETE /monsters> invalidate the monster pages and the deleted monster """
+
+        warm('/monsters', '/monsters/2')
+        app.test_client().post('/monsters', json=MONSTER_ONE)
+        assert len(app.test_client().get('/monsters').json) == 3
+
+        app.test_client().delete('/monsters/2')
+        assert app.test_client().get('/monsters/2').status_code == 404
+        assert len(app.test_client().get('/monsters').json) == 2
+
+    def test_nested_writes_invalidate_monster(self):
+        """ <PATCH DELETE /monsters/:id/:resource> invalidate the monster routes """
+
+        warm('/monsters/1', '/monsters/1/skills', '/monsters/2/skills')
+        app.test_client().patch('/monsters/1/skills/1', json={ 'value': 7 })
+        assert app.test_client().get('/monsters/1/skills').json[0]['value'] == 7
+        assert app.test_client().get('/monsters/1').json['skills'][0]['value'] == 7
+        assert cache_status('/monsters/2/skills') == 'HIT'
+
+        warm('/monsters/1/actions')
+        app.test_client().delete('/monsters/1/actions/1')
+        assert app.test_client().get('/monsters/1/actions').json == []
+
+    def test_nested_writes_only_invalidate_their_resource(self):
+        """ <PATCH /monsters/:id> with nested data invalidates only the nested routes that changed """
+
+        warm('/monsters/1', '/monsters/1/skills', '/monsters/1/actions')
+        app.test_client().patch('/monsters/1', json={ 'skills': [ { 'name': 'history', 'value': 4 } ], 'actions': [ { 'name': 'Bite', 'description': 'Bites something' } ] })
+
+        assert app.test_client().get('/monsters/1/skills').json[0]['value'] == 4
+        assert app.test_client().get('/monsters/1').json['skills'][0]['value'] == 4
+        assert cache_status('/monsters/1/actions') == 'HIT'
+
+        app.test_client().delete('/monsters/1')
+        assert app.test_client().get('/monsters/1/actions').status_code == 404
+
+    def test_spell_writes_invalidate_monsters_that_know_it(self):
+        """ <PATCH /spells/:id> invalidates the spell and the monsters that know it """
+
+        warm('/spells/1', '/spells', '/monsters/1', '/monsters/2', '/search?q=aid')
+        app.test_client().patch('/spells/1', json={ 'name': 'Greater Aid' })
+
+        assert app.test_client().get('/spells/1').json['name'] == 'Greater Aid'
+        assert app.test_client().get('/spells').json[0]['name'] == 'Greater Aid'
+        assert app.test_client().get('/monsters/1').json['spells'][0]['name'] == 'Greater Aid'
+        assert app.test_client().get('/search?q=aid').json[0]['name'] == 'Greater Aid'
+        assert cache_status('/monsters/2') == 'HIT'
+
+    def test_only_searched_columns_invalidate_search(self):
+        """ <GET /search> stays cached through writes to columns that are not searched """
+
+        warm('/search?q=something')
+        app.test_client().patch('/monsters/1/skills/1', json={ 'value': 7 })
+        app.test_client().patch('/monsters/1', json={ 'armor_class': 12 })
+        app.test_client().patch('/spells/2', json={ 'level': 1 })
+        assert cache_status('/search?q=something') == 'HIT'
+
+        app.test_client().patch('/monsters/1/actions/1', json={ 'description': 'Chomps' })
+        assert app.test_client().get('/search?q=something').json == []
+
+        warm('/search?q=aid')
+        app.test_client().post('/spells', json={ 'name': 'Aid Again', 'school': 'abjuration' })
+        assert len(app.test_client().get('/search?q=aid').json) == 2
+
+    def test_monster_spell_writes_invalidate_monster(self):
+        """ <POST DELETE /monsters/:id/spells> invalidate the monster """
+
+        warm('/monsters/2')
+        app.test_client().post('/monsters/2/spells', json={ 'name': 'Mage Hand' })
+        assert [ s['name'] for s in app.test_client().get('/monsters/2').json['spells'] ] == ['Mage Hand']
+
+        app.test_client().delete('/monsters/2/spells/2')
+        assert app.test_client().get('/monsters/2').json['spells'] == []
+
+    def test_rollback_does_not_invalidate(self):
+        """ a failed write leaves the cache alone """
+
+        warm('/monsters/1')
+        res = app.test_client().post('/monsters/1/spells', json={ 'name': 'Aid' })
+        assert res.status_code == 422
+        assert cache_status('/monsters/1') == 'HIT'
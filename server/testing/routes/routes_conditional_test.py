@@ -0,0 +1,188 @@
+import pytest
+from datetime import timedelta
+from sqlalchemy import event
+from werkzeug.http import http_date
+
+from models import db, Monster, Skill, Action, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        spells = [ Spell(name="Aid", school="abjuration"), Spell(name="Mage Hand", school="conjuration") ]
+        m1 = Monster(**MONSTER_ONE)
+        m2 = Monster(**MONSTER_TWO)
+        db.session.add_all([
+            m1,
+            m2,
+            *spells,
+            Skill(name='history', value=2, monster=m1),
+            Action(name='Bite', description='Bites something', monster=m1),
+            Action(name='Claw', description='Claws something', monster=m2),
+            MonsterSpell(monster=m1, spell=spells[0]),
+        ])
+        db.session.commit()
+        db.session.expunge_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def count_queries(url, headers):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        res = app.test_client().get(url, headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return res, len(statements)
+
+
+def is_fresh(url, etag):
+    return app.test_client().get(url, headers={ 'If-None-Match': etag }).status_code == 304
+
+
+class TestConditionalItemRoutes:
+    """ [TESTING SUITE: <Conditional GET item routes>] """
+
+    def test_item_routes_return_validators(self):
+        """ <GET /monsters/:id>, <GET /spells/:id> and nested routes return an ETag and Last-Modified """
+
+        for url in ['/monsters/1', '/spells/1', '/monsters/1/skills', '/monsters/1/actions']:
+            res = app.test_client().get(url)
+            assert res.status_code == 200
+            assert res.headers['ETag'].startswith('"')
+            assert res.headers['Last-Modified']
+            assert 'no-cache' in res.headers['Cache-Control']
+
+        res = app.test_client().get('/monsters/1')
+        assert 'version' not in res.json
+        assert 'updated_at' not in res.json
+
+    def test_if_none_match_returns_304(self):
+        """ <GET /monsters/:id> returns a 304 from a single query when the ETag matches """
+
+        for url in ['/monsters/1', '/monsters/1?fields=name&include=skills', '/spells/1', '/monsters/1/skills']:
+            etag = app.test_client().get(url).headers['ETag']
+            db.session.expunge_all()
+            res, query_count = count_queries(url, { 'If-None-Match': etag })
+            assert res.status_code == 304
+            assert res.data == b''
+            assert res.headers['ETag'] == etag
+            assert query_count == 1
+
+    def test_if_modified_since_returns_304(self):
+        """ <GET /spells/:id> returns a 304 unless the spell changed after If-Modified-Since """
+
+        last_modified = app.test_client().get('/spells/1').headers['Last-Modified']
+        res = app.test_client().get('/spells/1', headers={ 'If-Modified-Since': last_modified })
+        assert res.status_code == 304
+
+        earlier = http_date(Spell.query.first().updated_at - timedelta(minutes=1))
+        res = app.test_client().get('/spells/1', headers={ 'If-Modified-Since': earlier })
+        assert res.status_code == 200
+        assert res.json['name'] == 'Aid'
+
+    def test_etag_depends_on_representation(self):
+        """ <GET /monsters/:id?fields=:str> has a different ETag for every fieldset """
+
+        full = app.test_client().get('/monsters/1').headers['ETag']
+        partial = app.test_client().get('/monsters/1?fields=name').headers['ETag']
+        nested = app.test_client().get('/monsters/1/skills').headers['ETag']
+        assert len({ full, partial, nested }) == 3
+        assert not is_fresh('/monsters/1?fields=name', full)
+
+    def test_missing_rows_are_not_modified(self):
+        """ <GET /monsters/:id> still returns a 404 for a missing monster with If-None-Match """
+
+        res = app.test_client().get('/monsters/99', headers={ 'If-None-Match': '"monsters_table-99-1-00000000"' })
+        assert res.status_code == 404
+        assert 'ETag' not in res.headers
+
+
+class TestRowVersions:
+    """ [TESTING SUITE: <Row versions>] """
+
+    def test_patch_monster_changes_etag(self):
+        """ <PATCH /monsters/:id> changes the monster ETag but not the other monsters """
+
+        etag = app.test_client().get('/monsters/1').headers['ETag']
+        other_etag = app.test_client().get('/monsters/2').headers['ETag']
+
+        app.test_client().patch('/monsters/1', json={ 'name': 'Imp' })
+        assert not is_fresh('/monsters/1', etag)
+        assert is_fresh('/monsters/2', other_etag)
+
+    def test_nested_writes_change_monster_etag(self):
+        """ <PATCH DELETE /monsters/:id/:resource> change the monster ETag """
+
+        etag = app.test_client().get('/monsters/1').headers['ETag']
+        skills_etag = app.test_client().get('/monsters/1/skills').headers['ETag']
+        app.test_client().patch('/monsters/1/skills/1', json={ 'value': 5 })
+        assert not is_fresh('/monsters/1', etag)
+        assert not is_fresh('/monsters/1/skills', skills_etag)
+
+        etag = app.test_client().get('/monsters/1').headers['ETag']
+        app.test_client().delete('/monsters/1/actions/1')
+        assert not is_fresh('/monsters/1', etag)
+
+    def test_monster_spell_writes_change_monster_etag(self):
+        """ <POST DELETE /monsters/:id/spells> change the monster ETag """
+
+        etag = app.test_client().get('/monsters/2').headers['ETag']
+        app.test_client().post('/monsters/2/spells', json={ 'name': 'Aid' })
+        assert not is_fresh('/monsters/2', etag)
+
+        etag = app.test_client().get('/monsters/2').headers['ETag']
+        app.test_client().delete('/monsters/2/spells/1')
+        assert not is_fresh('/monsters/2', etag)
+
+    def test_patch_spell_changes_monster_etag(self):
+        """ <PATCH /spells/:id> changes the ETag of the spell and of the monsters that know it """
+
+        spell_etag = app.test_client().get('/spells/1').headers['ETag']
+        etag = app.test_client().get('/monsters/1').headers['ETag']
+        other_etag = app.test_client().get('/monsters/2').headers['ETag']
+
+        app.test_client().patch('/spells/1', json={ 'name': 'Greater Aid' })
+        assert not is_fresh('/spells/1', spell_etag)
+        assert not is_fresh('/monsters/1', etag)
+        assert is_fresh('/monsters/2', other_etag)
+
+    def test_version_is_not_writable(self):
+        """ <PATCH /spells/:id> ignores version and updated_at """
+
+        etag = app.test_client().get('/spells/2').headers['ETag']
+        res = app.test_client().patch('/spells/2', json={ 'version': 1 })
+        assert res.status_code == 202
+        assert is_fresh('/spells/2', etag)
+        assert Spell.query.where(Spell.id == 2).first().version == 1
+
+
+class TestConditionalListRoutes:
+    """ [TESTING SUITE: <Conditional GET list routes>] """
+
+    def test_list_routes_return_304(self):
+        """ <GET /monsters>, <GET /spells> and <GET /search> return a 304 while the body is unchanged """
+
+        for url in ['/monsters', '/spells?page_count=1', '/monsters?cursor=&fields=name', '/search?q=aid']:
+            etag = app.test_client().get(url).headers['ETag']
+            assert is_fresh(url, etag)
+
+    def test_list_etag_changes_with_rows(self):
+        """ <GET /spells> returns a new ETag after a spell is added """
+
+        etag = app.test_client().get('/spells').headers['ETag']
+        app.test_client().post('/spells', json={ 'name': 'Shield', 'school': 'abjuration' })
+        res = app.test_client().get('/spells', headers={ 'If-None-Match': etag })
+        assert res.status_code == 200
+        assert len(res.json) == 3
@@ -44,6 +44,30 @@ class TestNestedMonsterModel:
             db.session.remove()
             db.drop_all()
 
+
+    def test_get_resources_by_monster_id_with_fields(self):
+        """ <GET /monsters/:id/damage_resistances?fields=:str> retrieves only the requested fields of a monster's damage_resistances """
+
+        with app.app_context():
+            db.create_all()
+
+            m1 = Monster(**MONSTER_ONE)
+            db.session.add(m1)
+            db.session.commit()
+
+            item1 = DamageResistance(monster=m1, **{'damage_type': 'fire'})
+            db.session.add(item1)
+            db.session.commit()
+
+            res = app.test_client().get(f"/monsters/{m1.id}/damage-resistances?fields=damage_type")
+            assert res.status_code == 200
+            res_data = res.json
+            assert len(res_data) == 1
+            assert set(res_data[0].keys()) == { 'id', 'damage_type' }
+
+            db.session.remove()
+            db.drop_all()
+
     
     def test_post_monster_accepts_nested_resources(self):
         """ <POST /monsters> creates and returns a monster with nested damage_resistances """
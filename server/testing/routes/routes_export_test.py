@@ -0,0 +1,104 @@
+import gzip
+import json
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Skill, Action, Spell, MonsterSpell
+from create_app import create_app
+from export import ndjson_lines
+from loaders import monster_loader_options
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        spells = [ Spell(name="Aid", school="abjuration"), Spell(name="Mage Hand", school="conjuration") ]
+        db.session.add_all(spells)
+        for n in range(7):
+            m = Monster(**(MONSTER_ONE if n % 2 else MONSTER_TWO))
+            db.session.add_all([
+                m,
+                Skill(name='history', value=n, monster=m),
+                Action(name='Bite', description='Bites something', monster=m),
+                MonsterSpell(monster=m, spell=spells[n % 2]),
+            ])
+        db.session.commit()
+        db.session.expunge_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def read_ndjson(data):
+    return [ json.loads(line) for line in data.decode().splitlines() ]
+
+
+class TestExportRoutes:
+    """ [TESTING SUITE: <Export routes>] """
+
+    def test_export_monsters(self):
+        """ <GET /monsters/export> streams every monster as ndjson """
+
+        res = app.test_client().get('/monsters/export')
+        assert res.status_code == 200
+        assert res.content_type == 'application/x-ndjson'
+        assert res.is_streamed
+        rows = read_ndjson(res.data)
+        assert [ r['id'] for r in rows ] == list(range(1, 8))
+        assert rows[0] == app.test_client().get('/monsters/1').json
+
+    def test_export_spells(self):
+        """ <GET /spells/export> streams every spell as ndjson """
+
+        res = app.test_client().get('/spells/export')
+        assert res.status_code == 200
+        assert [ r['name'] for r in read_ndjson(res.data) ] == ['Aid', 'Mage Hand']
+
+    def test_export_filters_and_fields(self):
+        """ <GET /monsters/export?:filters> accepts the filters and fields of the list routes """
+
+        rows = read_ndjson(app.test_client().get('/monsters/export?name=monday&fields=name&include=spells').data)
+        assert len(rows) == 3
+        assert rows[0].keys() == { 'id', 'name', 'spells' }
+
+        rows = read_ndjson(app.test_client().get('/spells/export?school=conj').data)
+        assert [ r['name'] for r in rows ] == ['Mage Hand']
+
+    def test_export_gzip(self):
+        """ <GET /monsters/export> is gzipped when the client accepts gzip """
+
+        res = app.test_client().get('/monsters/export', headers={ 'Accept-Encoding': 'gzip, deflate' })
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert len(read_ndjson(gzip.decompress(res.data))) == 7
+
+        res = app.test_client().get('/monsters/export')
+        assert 'Content-Encoding' not in res.headers
+        # an unread streamed body holds its request context until it is closed
+        res.close()
+
+    def test_export_loads_relationships_per_batch(self):
+        """ ndjson_lines loads relationships once per batch and keeps only one batch in the session """
+
+        statements = []
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            session_sizes = []
+            lines = 0
+            for chunk in ndjson_lines(Monster.query.options(*monster_loader_options()).order_by(Monster.id), batch_size=3):
+                lines += chunk.count('\n')
+                session_sizes.append(len(db.session.identity_map))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+        assert lines == 7
+        # 1 for the monsters and 13 loader queries for each of the 3 batches
+        assert len(statements) == 1 + 13 * 3
+        assert max(session_sizes) <= 3 * 6
@@ -0,0 +1,102 @@
+import re
+import pytest
+
+from models import db, Monster, Skill, Spell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+        m1 = Monster(**MONSTER_ONE)
+        db.session.add_all([ m1, Spell(name="Aid", school="abjuration"), Skill(name='history', value=2, monster=m1) ])
+        db.session.commit()
+        app.extensions['metrics'].clear()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+# sample ##########
+# return the value of one sample of /metrics, or None
+# #################
+def sample(text, name, **labels):
+    for line in text.splitlines():
+        match = re.fullmatch(r'(\w+)(?:\{(.*)\})? (\S+)', line)
+        if match and match.group(1) == name:
+            found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ''))
+            if all( found.get(k) == v for k, v in labels.items() ):
+                return float(match.group(3))
+    return None
+
+
+def metrics_text():
+    response = app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    return response.get_data(as_text=True)
+
+
+class TestMetricsRoutes:
+    """ [TESTING SUITE: <Metrics routes>] """
+
+    def test_request_metrics(self):
+        """ GET /metrics counts requests by endpoint and status with latency and size histograms """
+
+        client = app.test_client()
+        assert client.get('/monsters/1').status_code == 200
+        assert client.get('/monsters/1').status_code == 200
+        assert client.get('/monsters/99').status_code == 404
+
+        text = metrics_text()
+        endpoint = { 'blueprint': 'monster_routes_blueprint', 'endpoint': 'monster_routes_blueprint.get_monster_by_id', 'method': 'GET' }
+        assert sample(text, 'http_requests_total', **endpoint, status='200') == 2
+        assert sample(text, 'http_requests_total', **endpoint, status='404') == 1
+        assert sample(text, 'http_request_duration_seconds_count', **endpoint) == 3
+        assert sample(text, 'http_request_duration_seconds_bucket', **endpoint, le='+Inf') == 3
+        assert sample(text, 'http_response_size_bytes_sum', **endpoint) > 0
+
+    def test_nested_blueprint_labels(self):
+        """ nested routes are labelled with their own blueprint """
+
+        app.test_client().get('/monsters/1/skills')
+        text = metrics_text()
+        assert sample(text, 'http_requests_total', blueprint='skills_routes_blueprint', method='GET', status='200') == 1
+
+    def test_db_metrics(self):
+        """ GET /metrics reports statements and database time per request and per engine """
+
+        app.test_client().get('/spells/1')
+        text = metrics_text()
+        endpoint = { 'endpoint': 'spell_routes_blueprint.get_spell_by_id' }
+        assert sample(text, 'db_statements_per_request_sum', **endpoint) >= 1
+        assert sample(text, 'db_statements_per_request_count', **endpoint) == 1
+        assert sample(text, 'db_seconds_per_request_sum', **endpoint) > 0
+        assert sample(text, 'db_statements_total', engine='primary') >= 1
+        assert sample(text, 'db_pool_checkout_seconds_count', engine='primary') >= 1
+
+    def test_streamed_response(self):
+        """ streamed responses are measured when they are closed """
+
+        response = app.test_client().get('/spells/export')
+        body = response.get_data()
+        response.close()
+
+        text = metrics_text()
+        endpoint = { 'endpoint': 'spell_routes_blueprint.export_spells' }
+        assert sample(text, 'http_requests_total', **endpoint, status='200') == 1
+        assert sample(text, 'http_response_size_bytes_sum', **endpoint) == len(body)
+        assert sample(text, 'db_statements_per_request_sum', **endpoint) >= 1
+
+    def test_metrics_disabled(self):
+        """ GET /metrics returns 404 when METRICS_ENABLED is false """
+
+        disabled = create_app('TESTING', { 'METRICS_ENABLED': False })
+        response = disabled.test_client().get('/metrics')
+        assert response.status_code == 404
+        assert response.json == { "error": "metrics are disabled" }
@@ -0,0 +1,148 @@
+import json
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Skill, Action, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        db.session.add_all([ Spell(name="Aid", school="abjuration"), Spell(name="Mage Hand", school="conjuration") ])
+        db.session.commit()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def bulk_monster(n):
+    return {
+        **MONSTER_ONE,
+        'name': f"Monster {n}",
+        'skills': [ { 'name': 'history', 'value': n } ],
+        'actions': [ { 'name': 'Bite', 'description': 'Bites something' }, { 'name': 'Claw', 'description': 'Claws something' } ],
+        'languages': [ { 'name': 'sylvan' } ],
+        'spells': ['aid', 'MAGE HAND'],
+    }
+
+
+class TestMonsterBulkRoutes:
+    """ [TESTING SUITE: <Monster bulk routes>] """
+
+    def test_post_monsters_bulk(self):
+        """ <POST /monsters/bulk> creates every monster with its nested resources and spells """
+
+        res = app.test_client().post('/monsters/bulk', json=[ bulk_monster(n) for n in range(5) ])
+        assert res.status_code == 201
+        assert [ c['index'] for c in res.json['created'] ] == list(range(5))
+        assert res.json['errors'] == []
+
+        for n, created in enumerate(res.json['created']):
+            m = app.test_client().get(f"/monsters/{created['id']}").json
+            assert m['name'] == f"Monster {n}"
+            assert m['size'] == MONSTER_ONE['size']
+            assert [ s['value'] for s in m['skills'] ] == [n]
+            assert len(m['actions']) == 2
+            assert m['actions'][0]['legendary_action'] == False
+            assert sorted( s['name'] for s in m['spells'] ) == ['Aid', 'Mage Hand']
+
+    def test_post_monsters_bulk_ndjson(self):
+        """ <POST /monsters/bulk> accepts newline delimited json """
+
+        body = '\n'.join( json.dumps(bulk_monster(n)) for n in range(3) ) + '\n{not json\n'
+        res = app.test_client().post('/monsters/bulk', data=body, content_type='application/x-ndjson')
+        assert res.status_code == 207
+        assert len(res.json['created']) == 3
+        assert res.json['errors'][0]['index'] == 3
+        assert Monster.query.count() == 3
+
+    def test_post_monsters_bulk_reports_invalid_items(self):
+        """ <POST /monsters/bulk> creates the valid monsters and reports the invalid ones """
+
+        items = [
+            bulk_monster(0),
+            { **bulk_monster(1), 'category': 'not a category' },
+            { **bulk_monster(2), 'skills': [ { 'value': 2 } ] },
+            { key: value for key, value in bulk_monster(3).items() if key != 'name' },
+            bulk_monster(4),
+        ]
+        res = app.test_client().post('/monsters/bulk', json=items)
+        assert res.status_code == 207
+        assert [ c['index'] for c in res.json['created'] ] == [0, 4]
+        assert [ e['index'] for e in res.json['errors'] ] == [1, 2, 3]
+        assert 'category' in res.json['errors'][0]['error']
+        assert sorted( m.name for m in Monster.query.all() ) == ['Monster 0', 'Monster 4']
+        assert Skill.query.count() == 2
+
+    def test_post_monsters_bulk_atomic(self):
+        """ <POST /monsters/bulk?atomic=true> creates nothing when any monster is invalid """
+
+        items = [ bulk_monster(0), { **bulk_monster(1), 'hit_dice_size': 7 } ]
+        res = app.test_client().post('/monsters/bulk?atomic=true', json=items)
+        assert res.status_code == 422
+        assert res.json['created'] == []
+        assert res.json['errors'][0]['index'] == 1
+        assert Monster.query.count() == 0
+
+        res = app.test_client().post('/monsters/bulk', json=[ 'not a monster' ])
+        assert res.status_code == 422
+
+    def test_post_monsters_bulk_missing_spells(self):
+        """ <POST /monsters/bulk> returns the spell names it could not find """
+
+        res = app.test_client().post('/monsters/bulk', json=[ { **bulk_monster(0), 'spells': ['Aid', 'Wish', 'aid'] } ])
+        assert res.status_code == 201
+        assert res.json['created'][0]['missing_spells'] == ['Wish']
+        assert MonsterSpell.query.count() == 1
+
+    def test_post_monsters_bulk_rejects_bad_body(self):
+        """ <POST /monsters/bulk> returns a 400 error when the body is not an array """
+
+        res = app.test_client().post('/monsters/bulk', json=bulk_monster(0))
+        assert res.status_code == 400
+        assert res.json['error']
+
+    def test_post_monsters_bulk_batches_inserts(self):
+        """ <POST /monsters/bulk> inserts the nested resources with the same number of statements for any number of monsters """
+
+        # sqlite can only return ids in parameter order one monster row at a time
+        def statement_count(count):
+            statements = []
+            def before_cursor_execute(conn, cursor, statement, *args):
+                if not statement.startswith('INSERT INTO monsters_table'):
+                    statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+            try:
+                res = app.test_client().post('/monsters/bulk', json=[ bulk_monster(n) for n in range(count) ])
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+            assert res.status_code == 201
+            return len(statements)
+
+        assert statement_count(2) == statement_count(50)
+        assert Action.query.count() == 104
+
+
+class TestMonsterBulkCache:
+    """ [TESTING SUITE: <Monster bulk response cache>] """
+
+    def test_post_monsters_bulk_invalidates_monster_pages(self):
+        """ <POST /monsters/bulk> invalidates the cached monster pages """
+
+        cached_app = create_app('TESTING', { 'RESPONSE_CACHE_ENABLED': True })
+        with cached_app.app_context():
+            db.create_all()
+            assert cached_app.test_client().get('/monsters').json == []
+            cached_app.test_client().post('/monsters/bulk', json=[ bulk_monster(0) ])
+            res = cached_app.test_client().get('/monsters')
+            assert res.headers['X-Cache'] == 'MISS'
+            assert [ m['name'] for m in res.json ] == ['Monster 0']
+            db.session.remove()
+            db.drop_all()
@@ -0,0 +1,133 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE
+
+app = create_app('TESTING')
+
+# 1 query for the monsters, 1 per relationship and 2 for monster_spells -> spells
+MONSTER_QUERY_COUNT = 14
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def add_monsters_with_relationships(count):
+    spells = [ Spell(name=f"Spell {n}", school="evocation") for n in range(3) ]
+    db.session.add_all(spells)
+    for _ in range(count):
+        m = Monster(**MONSTER_ONE)
+        db.session.add_all([
+            m,
+            Skill(name='history', value=2, monster=m),
+            SavingThrow(name='dex', value=2, monster=m),
+            SpecialAbility(name='Amphibious', description='Breathes air and water', monster=m),
+            Sense(name='darkvision', distance=60, monster=m),
+            Speed(name='walk', distance=30, monster=m),
+            Language(name='sylvan', monster=m),
+            DamageResistance(damage_type='fire', monster=m),
+            DamageImmunity(damage_type='poison', monster=m),
+            DamageVulnerability(damage_type='cold', monster=m),
+            ConditionImmunity(condition_type='prone', monster=m),
+            Action(name='Bite', description='Bites something', monster=m),
+        ])
+        db.session.add_all([ MonsterSpell(monster=m, spell=s) for s in spells ])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def count_queries(url):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        res = app.test_client().get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return res, len(statements)
+
+
+class TestMonsterQueryCounts:
+    """ [TESTING SUITE: <Monster route query counts>] """
+
+    def test_get_monsters_query_count(self):
+        """ <GET /monsters> loads every relationship with a fixed number of queries """
+
+        add_monsters_with_relationships(20)
+
+        res, query_count = count_queries('/monsters')
+        assert res.status_code == 200
+        assert len(res.json) == 10
+        assert len(res.json[0]['skills']) == 1
+        assert len(res.json[0]['spells']) == 3
+        assert query_count == MONSTER_QUERY_COUNT
+
+    def test_get_monsters_query_count_independent_of_page_size(self):
+        """ <GET /monsters?page_count=:int> issues the same number of queries for any page size """
+
+        add_monsters_with_relationships(20)
+
+        res, small_page_count = count_queries('/monsters?page_count=2')
+        assert len(res.json) == 2
+
+        res, large_page_count = count_queries('/monsters?page_count=20')
+        assert len(res.json) == 20
+
+        assert small_page_count == large_page_count == MONSTER_QUERY_COUNT
+
+    def test_get_monster_by_id_query_count(self):
+        """ <GET /monsters/:id> loads every relationship with a fixed number of queries """
+
+        add_monsters_with_relationships(2)
+
+        res, query_count = count_queries('/monsters/1')
+        assert res.status_code == 200
+        assert len(res.json['actions']) == 1
+        assert len(res.json['spells']) == 3
+        assert query_count == MONSTER_QUERY_COUNT
+
+    def test_get_nested_resources_query_count(self):
+        """ <GET /monsters/:id/skills> does not load unrelated monster relationships """
+
+        add_monsters_with_relationships(2)
+
+        res, query_count = count_queries('/monsters/1/skills')
+        assert res.status_code == 200
+        assert len(res.json) == 1
+        assert query_count == 2
+
+    def test_get_monsters_with_fields_query_count(self):
+        """ <GET /monsters?fields=:str> does not load any relationship """
+
+        add_monsters_with_relationships(20)
+
+        res, query_count = count_queries('/monsters?fields=id,name,category,challenge_rating')
+        assert res.status_code == 200
+        assert set(res.json[0].keys()) == { 'id', 'name', 'category', 'challenge_rating' }
+        assert query_count == 1
+
+    def test_get_monsters_with_include_query_count(self):
+        """ <GET /monsters?include=:str> loads only the included relationships """
+
+        add_monsters_with_relationships(20)
+
+        res, query_count = count_queries('/monsters?fields=name&include=skills,actions')
+        assert res.status_code == 200
+        assert set(res.json[0].keys()) == { 'id', 'name', 'skills', 'actions' }
+        assert query_count == 3
+
+        res, query_count = count_queries('/monsters/1?fields=name&include=spells')
+        assert res.status_code == 200
+        assert set(res.json.keys()) == { 'id', 'name', 'spells' }
+        assert len(res.json['spells']) == 3
+        assert query_count == 3
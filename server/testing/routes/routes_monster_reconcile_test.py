@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Skill, Action
+from create_app import create_app
+from helpers import reconcile_nested_monster_data
+from testing.test_monsters import MONSTER_ONE
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        m1 = Monster(**MONSTER_ONE)
+        db.session.add_all([
+            m1,
+            Skill(name='history', value=2, monster=m1),
+            Skill(name='stealth', value=4, monster=m1),
+            Skill(name='perception', value=3, monster=m1),
+            Action(name='Bite', description='Bites something', monster=m1),
+        ])
+        db.session.commit()
+        db.session.expunge_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def nested_writes(table, request):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        if table in statement and statement.split()[0] in ['INSERT', 'UPDATE', 'DELETE']:
+            statements.append(statement.split()[0])
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        res = request()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return res, statements
+
+
+def skill_ids():
+    return { s.name: s.id for s in Skill.query.all() }
+
+
+class TestReconcileNestedMonsterData:
+    """ [TESTING SUITE: <Diff based nested monster data>] """
+
+    def test_patch_keeps_matching_rows(self):
+        """ <PATCH /monsters/:id> updates matching nested rows in place, inserts new ones and deletes the rest """
+
+        ids = skill_ids()
+        res, writes = nested_writes('skills_table', lambda: app.test_client().patch('/monsters/1', json={ 'skills': [
+            { 'name': 'History', 'value': 2 },
+            { 'name': 'stealth', 'value': 6 },
+            { 'name': 'arcana', 'value': 1 },
+        ] }))
+
+        assert res.status_code == 202
+        assert sorted(writes) == ['DELETE', 'INSERT', 'UPDATE']
+        db.session.expunge_all()
+        new_ids = skill_ids()
+        assert new_ids['history'] == ids['history']
+        assert new_ids['stealth'] == ids['stealth']
+        assert 'perception' not in new_ids
+        assert Skill.query.where(Skill.name == 'stealth').first().value == 6
+
+    def test_unchanged_patch_does_not_write(self):
+        """ <PATCH /monsters/:id> writes nothing to a nested table whose items did not change """
+
+        res, writes = nested_writes('skills_table', lambda: app.test_client().patch('/monsters/1', json={ 'skills': [
+            { 'name': 'perception', 'value': 3 },
+            { 'name': 'history', 'value': 2 },
+            { 'name': 'stealth', 'value': 4 },
+        ] }))
+
+        assert res.status_code == 202
+        assert writes == []
+
+    def test_items_match_by_id_first(self):
+        """ <PATCH /monsters/:id> renames a nested row in place when the item has its id """
+
+        ids = skill_ids()
+        res = app.test_client().patch('/monsters/1', json={ 'actions': [ { 'id': 1, 'name': 'Gore', 'description': 'Gores something' } ] })
+
+        assert res.status_code == 202
+        assert [ (a['id'], a['name']) for a in res.json['actions'] ] == [(1, 'Gore')]
+        assert skill_ids() == ids
+
+    def test_pending_writes(self):
+        """ reconcile_nested_monster_data leaves only the inserted, changed and deleted rows pending in the session """
+
+        with app.test_request_context():
+            m = Monster.query.first()
+            reconcile_nested_monster_data([ { 'name': 'stealth', 'value': 5 }, { 'name': 'arcana', 'value': 1 } ], m, Skill, ['name', 'value'], ['name'])
+
+            assert [ s.name for s in db.session.new ] == ['arcana']
+            assert [ s.name for s in db.session.dirty if db.session.is_modified(s, include_collections=False) ] == ['stealth']
+            assert sorted( s.name for s in db.session.deleted ) == ['history', 'perception']
+            db.session.rollback()
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+SPELL_NAMES = [ 'Alarm', 'Banishment', 'Counterspell', 'Dispel Magic', 'Mage Armor', 'Shield' ]
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        m1 = Monster(**MONSTER_ONE)
+        spells = [ Spell(name=name, school="abjuration") for name in SPELL_NAMES ]
+        db.session.add_all([ m1, *spells, MonsterSpell(monster=m1, spell=spells[0]), MonsterSpell(monster=m1, spell=spells[1]) ])
+        db.session.commit()
+        db.session.expunge_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+def count_statements(request):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+    def commit(conn):
+        statements.append('COMMIT')
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(db.engine, 'commit', commit)
+    try:
+        res = request()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.remove(db.engine, 'commit', commit)
+    return res, statements
+
+
+class TestMonsterSpellNames:
+    """ [TESTING SUITE: <Monster spells by name>] """
+
+    def test_post_monster_resolves_spells_in_one_query(self):
+        """ <POST /monsters> links every spell from one lookup and one insert and reports missing names """
+
+        names = [ name.upper() for name in SPELL_NAMES ] + [ 'shield', 'Wish' ]
+        res, statements = count_statements(lambda: app.test_client().post('/monsters', json={ **MONSTER_TWO, 'spells': names }))
+
+        assert res.status_code == 201
+        assert sorted( s['name'] for s in res.json['spells'] ) == SPELL_NAMES
+        assert res.json['missing_spells'] == ['Wish']
+        assert len([ s for s in statements if s.startswith('SELECT') and 'lower(spells_table.name) IN' in s ]) == 1
+        assert len([ s for s in statements if s.startswith('INSERT') ]) == 2
+        assert statements.count('COMMIT') == 1
+        assert MonsterSpell.query.where(MonsterSpell.monster_id == res.json['id']).count() == len(SPELL_NAMES)
+
+    def test_patch_monster_only_writes_changed_links(self):
+        """ <PATCH /monsters/:id> keeps the links that stay and reports missing names """
+
+        kept = MonsterSpell.query.where(MonsterSpell.spell_id == 1).first().id
+        res = app.test_client().patch('/monsters/1', json={ 'spells': [ 'alarm', 'Shield', 'Not A Spell' ] })
+
+        assert res.status_code == 202
+        assert [ s['name'] for s in res.json['spells'] ] == [ 'Alarm', 'Shield' ]
+        assert res.json['missing_spells'] == ['Not A Spell']
+        assert MonsterSpell.query.where(MonsterSpell.spell_id == 1).first().id == kept
+
+    def test_spells_must_be_a_list(self):
+        """ <PATCH /monsters/:id> returns a 422 when spells is not a list """
+
+        res = app.test_client().patch('/monsters/1', json={ 'spells': 'Alarm' })
+        assert res.status_code == 422
+        assert 'missing_spells' not in app.test_client().get('/monsters/1').json
@@ -137,6 +137,76 @@ class TestMonsterRoutes:
         assert res_data[0]['name'] == MONSTER_TWO['name']
         assert res_data[4]['name'] == MONSTER_THREE['name']
 
+    def test_get_monsters_with_cursor(self):
+        """ <GET /monsters?cursor=> pages through every monster with a next_cursor """
+
+        db.session.add_all([ Monster(**MONSTER_FIVE) for _ in range(25) ])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters', query_string={ 'cursor': '' })
+        assert res.status_code == 200
+        assert res.content_type == 'application/json'
+        res_data = res.json
+        assert [ m['id'] for m in res_data['results'] ] == list(range(1, 11))
+        assert res_data['next_cursor']
+
+        seen_ids = [ m['id'] for m in res_data['results'] ]
+        cursor = res_data['next_cursor']
+        while cursor:
+            res_data = app.test_client().get('/monsters', query_string={ 'cursor': cursor }).json
+            seen_ids += [ m['id'] for m in res_data['results'] ]
+            cursor = res_data['next_cursor']
+
+        assert seen_ids == [ m.id for m in Monster.query.order_by(Monster.id).all() ]
+
+    def test_get_monsters_with_cursor_sorted_by_name(self):
+        """ <GET /monsters?cursor=&sort=name> pages by (name, id) including duplicate names """
+
+        db.session.add_all([
+            Monster(**MONSTER_FIVE), 
+            Monster(**MONSTER_ONE), 
+            Monster(**MONSTER_FIVE), 
+            Monster(**MONSTER_TWO), 
+            Monster(**MONSTER_FIVE)
+        ])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters', query_string={ 'cursor': '', 'sort': 'name', 'page_count': 2 })
+        assert res.status_code == 200
+        first_page = res.json
+        res = app.test_client().get('/monsters', query_string={ 'cursor': first_page['next_cursor'], 'sort': 'name', 'page_count': 2 })
+        second_page = res.json
+        res = app.test_client().get('/monsters', query_string={ 'cursor': second_page['next_cursor'], 'sort': 'name', 'page_count': 2 })
+        third_page = res.json
+
+        assert third_page['next_cursor'] == None
+        expected = [ (m.name, m.id) for m in Monster.query.order_by(Monster.name, Monster.id).all() ]
+        received = [ (m['name'], m['id']) for page in [first_page, second_page, third_page] for m in page['results'] ]
+        assert received == expected
+
+    def test_get_monsters_with_cursor_and_filter(self):
+        """ <GET /monsters?cursor=&size=:str> applies the same filters as page based requests """
+
+        db.session.add_all([Monster(**MONSTER_ONE), Monster(**MONSTER_TWO), Monster(**MONSTER_THREE), Monster(**MONSTER_FOUR), Monster(**MONSTER_FIVE)])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters', query_string={ 'cursor': '', 'size': 'medium' })
+        assert res.status_code == 200
+        monsters = Monster.query.where(Monster.size.like("%medium%")).all()
+        assert [ m.id for m in monsters ] == [ m['id'] for m in res.json['results'] ]
+        assert res.json['next_cursor'] == None
+
+    def test_get_monsters_with_invalid_cursor(self):
+        """ <GET /monsters?cursor=:str> returns a 400 error if the cursor is invalid """
+
+        res = app.test_client().get('/monsters', query_string={ 'cursor': 'not-a-cursor' })
+        assert res.status_code == 400
+        assert res.json['error']
+
+        res = app.test_client().get('/monsters', query_string={ 'cursor': '', 'sort': 'strength' })
+        assert res.status_code == 400
+        assert res.json['error']
+
     def test_get_monsters_by_name(self):
         """ <GET /monsters> accepts a 'name' query that returns based on name """
 
@@ -223,6 +293,52 @@ class TestMonsterRoutes:
         assert res_data['id'] == monster.id 
         assert res_data['name'] == monster.name 
 
+    def test_get_monsters_with_fields(self):
+        """ <GET /monsters?fields=:str> retrieves only the requested columns of each monster """
+
+        db.session.add_all([Monster(**MONSTER_ONE), Monster(**MONSTER_TWO), Monster(**MONSTER_THREE)])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters?fields=name,category,challenge_rating,thacko')
+        assert res.status_code == 200
+        res_data = res.json
+        assert len(res_data) == 3
+        assert res_data[1] == {
+            'id': 2,
+            'name': MONSTER_TWO['name'],
+            'category': MONSTER_TWO['category'],
+            'challenge_rating': MONSTER_TWO['challenge_rating']
+        }
+
+    def test_get_monsters_with_include(self):
+        """ <GET /monsters?include=:str> retrieves every column and only the included relationships """
+
+        db.session.add_all([Monster(**MONSTER_ONE), Monster(**MONSTER_TWO)])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters?include=skills,spells')
+        assert res.status_code == 200
+        res_data = res.json
+        assert res_data[0]['skills'] == []
+        assert res_data[0]['spells'] == []
+        assert res_data[0]['strength'] == MONSTER_ONE['strength']
+        assert 'actions' not in res_data[0]
+        assert 'languages' not in res_data[0]
+
+    def test_get_monster_by_id_with_fields_and_include(self):
+        """ <GET /monsters/:id?fields=:str&include=:str> retrieves only the requested fields of a monster """
+
+        db.session.add_all([Monster(**MONSTER_ONE), Monster(**MONSTER_TWO)])
+        db.session.commit()
+
+        res = app.test_client().get('/monsters/2?fields=name,size&include=actions')
+        assert res.status_code == 200
+        assert res.json == { 'id': 2, 'name': MONSTER_TWO['name'], 'size': MONSTER_TWO['size'], 'actions': [] }
+
+        full_res = app.test_client().get('/monsters/2')
+        assert full_res.json['id'] == 2
+        assert len(full_res.json.keys()) > 30
+
     def test_get_invalid_monster_by_id(self):
         """ <GET /monsters/:id> returns a 404 error if no monster found """
 
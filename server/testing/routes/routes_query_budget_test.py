@@ -0,0 +1,87 @@
+import logging
+import pytest
+
+from models import db, Monster, Skill, Spell
+from create_app import create_app
+from query_budget import QueryBudgetExceeded
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING', { 'QUERY_REPEAT_THRESHOLD': 2 })
+
+# reads every monster's skills one lazy load at a time
+@app.get('/lazy-skills')
+def lazy_skills():
+    return { "skills": [ len(m.skills) for m in Monster.query.all() ] }, 200
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+        m1 = Monster(**MONSTER_ONE)
+        m2 = Monster(**MONSTER_TWO)
+        db.session.add_all([ m1, m2, Skill(name='history', value=2, monster=m1), Spell(name="Aid", school="abjuration") ])
+        db.session.commit()
+        app.config['QUERY_BUDGETS'] = {}
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestQueryBudgetRoutes:
+    """ [TESTING SUITE: <Query budget routes>] """
+
+    def test_query_count_header(self):
+        """ responses carry the number of statements the request ran """
+
+        db.session.expunge_all()
+        res = app.test_client().get('/spells/1')
+        assert res.status_code == 200
+        assert res.headers['X-Query-Count'] == '1'
+
+    def test_repeated_statements_logged(self, caplog):
+        """ a statement repeated QUERY_REPEAT_THRESHOLD times is logged with the endpoint and stack """
+
+        db.session.expunge_all()
+        with caplog.at_level(logging.WARNING):
+            res = app.test_client().get('/lazy-skills')
+
+        assert res.status_code == 200
+        assert res.headers['X-Query-Count'] == '3'
+        assert 'possible N+1' in caplog.text
+        assert 'lazy_skills (GET /lazy-skills)' in caplog.text
+        assert '2x SELECT skills_table' in caplog.text
+        assert 'routes_query_budget_test.py' in caplog.text
+
+    def test_budget_exceeded_raises(self):
+        """ a request over its endpoint budget raises QueryBudgetExceeded with QUERY_BUDGET_STRICT """
+
+        db.session.expunge_all()
+        app.config['QUERY_BUDGETS'] = { 'lazy_skills': 2 }
+        with pytest.raises(QueryBudgetExceeded) as e:
+            app.test_client().get('/lazy-skills')
+        assert 'query budget of 2 exceeded' in str(e.value)
+
+    def test_budget_exceeded_logged(self, caplog):
+        """ a request over its budget is logged when QUERY_BUDGET_STRICT is off """
+
+        db.session.expunge_all()
+        app.config.update(QUERY_BUDGETS={ 'lazy_skills': 2 }, QUERY_BUDGET_STRICT=False)
+        try:
+            with caplog.at_level(logging.WARNING):
+                res = app.test_client().get('/lazy-skills')
+        finally:
+            app.config['QUERY_BUDGET_STRICT'] = True
+        assert res.status_code == 200
+        assert 'query budget of 2 exceeded' in caplog.text
+
+    def test_route_budget(self):
+        """ @query_budget sets the budget of a route """
+
+        view = app.view_functions['monster_routes_blueprint.get_monster_by_id']
+        assert view.query_budget == 16
+        db.session.expunge_all()
+        app.config['QUERY_BUDGETS'] = { 'monster_routes_blueprint.get_monster_by_id': 1 }
+        with pytest.raises(QueryBudgetExceeded):
+            app.test_client().get('/monsters/1')
@@ -0,0 +1,146 @@
+import pytest
+from sqlalchemy import event
+
+from models import db, Monster, Skill, Action, Spell, MonsterSpell
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        spells = [ Spell(name=f"Spell {n}", school="evocation") for n in range(3) ]
+        db.session.add_all(spells)
+        for attributes in [MONSTER_ONE, MONSTER_TWO]:
+            m = Monster(**attributes)
+            db.session.add_all([
+                m,
+                Skill(name='history', value=2, monster=m),
+                Action(name='Bite', description='Bites something', monster=m),
+                *[ MonsterSpell(monster=m, spell=s) for s in spells ],
+            ])
+        db.session.commit()
+        db.session.expunge_all()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+# capture_statements ##########
+# params: request:function(client) -> Response
+# return Response, list[tuple(statement:str, parameters:tuple)]
+# #############################
+def capture_statements(request):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append( (statement, parameters[0] if executemany else parameters) )
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        res = request(app.test_client())
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return res, statements
+
+
+# full_scans ##########
+# params: statements:list[tuple(statement:str, parameters:tuple)]
+# return list[str]
+#
+# runs EXPLAIN QUERY PLAN for every filtered statement
+# and returns the plan lines that scan a whole table.
+# unfiltered listings, LIKE substring filters and the
+# full text search tables are expected to scan
+# #####################
+def full_scans(statements):
+    scans = []
+    for statement, parameters in statements:
+        if ' WHERE ' not in statement or ' LIKE ' in statement:
+            continue
+        plan = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+        for row in plan:
+            detail = row[-1]
+            if detail.startswith('SCAN') and 'VIRTUAL TABLE' not in detail and 'CONSTANT ROW' not in detail:
+                scans.append(f"{detail} <- {statement}")
+    return scans
+
+
+class TestQueryPlans:
+    """ [TESTING SUITE: <Route query plans>] """
+
+    def test_get_routes_use_indexes(self):
+        """ <GET> routes never scan a whole table to filter or join """
+
+        requests = [
+            lambda c: c.get('/monsters'),
+            lambda c: c.get('/monsters?cursor=&page_count=1'),
+            lambda c: c.get('/monsters?cursor=&page_count=1&sort=name'),
+            lambda c: c.get('/monsters?name=devil'),
+            lambda c: c.get('/monsters/1'),
+            lambda c: c.get('/monsters/1?fields=name&include=skills,spells'),
+            lambda c: c.get('/monsters/1/skills'),
+            lambda c: c.get('/monsters/1/actions'),
+            lambda c: c.get('/spells'),
+            lambda c: c.get('/spells?cursor=&page_count=1&sort=name'),
+            lambda c: c.get('/spells/1'),
+            lambda c: c.get('/search?q=bite'),
+        ]
+
+        for request in requests:
+            res, statements = capture_statements(request)
+            assert res.status_code == 200
+            assert full_scans(statements) == []
+
+    def test_cursor_pages_use_indexes(self):
+        """ <GET /monsters?cursor=:str> seeks to the next page with an index """
+
+        for sort in ['id', 'name']:
+            res = app.test_client().get(f'/monsters?cursor=&page_count=1&sort={sort}')
+            next_cursor = res.json['next_cursor']
+
+            res, statements = capture_statements(lambda c: c.get(f'/monsters?cursor={next_cursor}&page_count=1&sort={sort}'))
+            assert res.status_code == 200
+            assert full_scans(statements) == []
+
+    def test_write_routes_use_indexes(self):
+        """ <POST PATCH DELETE> routes never scan a whole table to find rows """
+
+        requests = [
+            lambda c: c.patch('/monsters/1/skills/1', json={ 'value': 3 }),
+            lambda c: c.post('/monsters', json={ **MONSTER_ONE, 'skills': [ { 'name': 'arcana', 'value': 4 } ], 'spells': ['spell 1'] }),
+            lambda c: c.patch('/monsters/1', json={ 'name': 'Imp', 'skills': [ { 'name': 'stealth', 'value': 5 } ], 'spells': ['Spell 0', 'SPELL 2'] }),
+            lambda c: c.delete('/monsters/2/spells/1'),
+            lambda c: c.post('/monsters/2/spells', json={ 'name': 'spell 0' }),
+            lambda c: c.delete('/monsters/1/actions/1'),
+            lambda c: c.patch('/spells/1', json={ 'name': 'Fireball' }),
+            lambda c: c.delete('/spells/2'),
+            lambda c: c.delete('/monsters/2'),
+        ]
+
+        for request in requests:
+            res, statements = capture_statements(request)
+            assert res.status_code < 400
+            assert full_scans(statements) == []
+
+
+class TestMonsterSpellUniqueness:
+    """ [TESTING SUITE: <Monster spell uniqueness>] """
+
+    def test_post_duplicate_monster_spell(self):
+        """ <POST /monsters/:id/spells> returns a 422 error when the monster already has the spell """
+
+        res = app.test_client().post('/monsters/1/spells', json={ 'name': 'spell 1' })
+        assert res.status_code == 422
+        assert res.json['error']
+        assert MonsterSpell.query.where(MonsterSpell.monster_id == 1).count() == 3
+
+    def test_patch_monster_with_repeated_spells(self):
+        """ <PATCH /monsters/:id> links a spell named more than once a single time """
+
+        res = app.test_client().patch('/monsters/1', json={ 'spells': ['Spell 0', 'spell 0', 'SPELL 1'] })
+        assert res.status_code == 202
+        assert sorted( s['name'] for s in res.json['spells'] ) == ['Spell 0', 'Spell 1']
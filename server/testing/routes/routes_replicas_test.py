@@ -0,0 +1,125 @@
+import shutil
+import pytest
+from sqlalchemy import text
+
+from models import db, Monster, Skill, Spell
+from create_app import create_app
+from replicas import READ_PRIMARY_COOKIE, replica_engines
+from testing.test_monsters import MONSTER_ONE
+
+def replica_app(tmp_path, config):
+    # one primary and two replicas, each an sqlite file
+    primary = tmp_path / 'primary.db'
+    replicas = [ tmp_path / 'replica_0.db', tmp_path / 'replica_1.db' ]
+    app = create_app('TESTING', {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{primary}",
+        'REPLICA_DATABASE_URIS': [ f"sqlite:///{replica}" for replica in replicas ],
+        'READ_YOUR_WRITES_SECONDS': 5,
+        **config,
+    })
+    with app.app_context():
+        db.create_all()
+        m = Monster(**MONSTER_ONE)
+        db.session.add_all([ m, Spell(name='Aid', school='abjuration'), Skill(name='history', value=2, monster=m) ])
+        db.session.commit()
+        db.session.remove()
+
+        # the replicas start as copies of the primary, with names that tell them apart
+        for n, (engine, replica) in enumerate(zip(replica_engines(app), replicas)):
+            shutil.copy(primary, replica)
+            with engine.begin() as connection:
+                connection.execute(text("UPDATE spells_table SET name = :name"), { 'name': f"Aid (replica_{n})" })
+                connection.execute(text("UPDATE skills_table SET value = :value"), { 'value': 10 + n })
+
+        yield app
+
+        db.session.remove()
+        for engine in [ *db.engines.values(), *replica_engines(app) ]:
+            engine.dispose()
+
+@pytest.fixture
+def app(tmp_path):
+    yield from replica_app(tmp_path, {})
+
+@pytest.fixture
+def cached_app(tmp_path):
+    yield from replica_app(tmp_path, { 'RESPONSE_CACHE_ENABLED': True })
+
+class TestReplicaRoutes:
+    """ [TESTING SUITE: <Read replica routing>] """
+
+    def test_reads_go_round_robin_to_replicas(self, app):
+        """ <GET /spells/:id> and <GET /spells> are served by the replicas in turn """
+
+        client = app.test_client()
+        names = [ client.get('/spells/1').json['name'] for _ in range(3) ] + [ client.get('/spells').json[0]['name'] ]
+        assert names == ['Aid (replica_0)', 'Aid (replica_1)', 'Aid (replica_0)', 'Aid (replica_1)']
+
+    def test_monster_and_nested_reads_use_replicas(self, app):
+        """ <GET /monsters/:id> and the nested resource routes read from a replica """
+
+        client = app.test_client()
+        assert client.get('/monsters/1/skills').json[0]['value'] == 10
+        assert client.get('/monsters/1').json['skills'][0]['value'] == 11
+
+    def test_writes_go_to_primary(self, app):
+        """ <PATCH /spells/:id> writes to the primary only """
+
+        res = app.test_client().patch('/spells/1', json={ 'level': 3 })
+        assert res.status_code == 202
+
+        with app.app_context():
+            assert db.session.execute(text("SELECT level FROM spells_table")).scalar() == 3
+            for engine in replica_engines(app):
+                with engine.connect() as connection:
+                    assert connection.execute(text("SELECT level FROM spells_table")).scalar() != 3
+
+    def test_client_reads_its_own_writes(self, app):
+        """ after a write the same client reads from the primary until the window ends """
+
+        client = app.test_client()
+        res = client.patch('/spells/1', json={ 'name': 'Aid (patched)' })
+        assert res.status_code == 202
+        assert client.get_cookie(READ_PRIMARY_COOKIE) is not None
+
+        assert client.get('/spells/1').json['name'] == 'Aid (patched)'
+        assert client.get('/spells/1').json['name'] == 'Aid (patched)'
+        assert app.test_client().get('/spells/1').json['name'].startswith('Aid (replica_')
+
+        client.set_cookie(READ_PRIMARY_COOKIE, '0')
+        assert client.get('/spells/1').json['name'].startswith('Aid (replica_')
+        client.set_cookie(READ_PRIMARY_COOKIE, 'soon')
+        assert client.get('/spells/1').json['name'].startswith('Aid (replica_')
+
+    def test_client_reads_its_own_writes_past_the_cache(self, cached_app):
+        """ a client reading its own writes is not served a body cached from a replica """
+
+        writer = cached_app.test_client()
+        reader = cached_app.test_client()
+        assert writer.patch('/spells/1', json={ 'name': 'Aid v2' }).status_code == 202
+
+        # the commit cleared the cache, the lagging replica fills it again
+        res = reader.get('/spells/1')
+        assert res.json['name'].startswith('Aid (replica_')
+        assert res.headers['X-Cache'] == 'MISS'
+        assert reader.get('/spells/1').headers['X-Cache'] == 'HIT'
+
+        # the requests share the test's app context, so the session is removed like a request teardown would
+        db.session.remove()
+        res = writer.get('/spells/1')
+        assert res.json['name'] == 'Aid v2'
+        assert res.headers['X-Cache'] == 'MISS'
+
+    def test_failed_write_is_not_sticky(self, app):
+        """ a rejected write does not move the client's reads to the primary """
+
+        client = app.test_client()
+        res = client.patch('/spells/100', json={ 'name': 'Nothing' })
+        assert res.status_code == 404
+        assert client.get_cookie(READ_PRIMARY_COOKIE) is None
+
+    def test_cli_uses_primary(self, app):
+        """ outside a request every query goes to the primary """
+
+        with app.app_context():
+            assert Spell.query.first().name == 'Aid'
@@ -0,0 +1,138 @@
+import pytest
+
+from models import db, Monster, Spell, Action, SpecialAbility
+from create_app import create_app
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+from routes import search_routes
+
+app = create_app('TESTING')
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        m1 = Monster(**MONSTER_ONE)
+        m2 = Monster(**MONSTER_TWO)
+        db.session.add_all([
+            m1,
+            m2,
+            Spell(name="Fire Bolt", school="evocation", description="You hurl a mote of fire at a creature or object within range."),
+            Spell(name="Acid Splash", school="conjuration", description="You hurl a bubble of acid."),
+            Action(name="Fire Breath", description="The devil exhales fire in a 15-foot cone.", monster=m1),
+            Action(name="Bite", description="Melee Weapon Attack: +4 to hit.", monster=m2),
+            SpecialAbility(name="Devil's Sight", description="Magical darkness doesn't impede the devil's darkvision.", monster=m1),
+        ])
+        db.session.commit()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+class TestSearchRoutes:
+    """ [TESTING SUITE: <Search routes>] """
+
+    def test_search_across_types(self):
+        """ <GET /search?q=:str> returns ranked hits from monsters, spells, actions and special abilities """
+
+        res = app.test_client().get('/search?q=fire')
+        assert res.status_code == 200
+        assert res.content_type == 'application/json'
+        res_data = res.json
+        assert { (hit['type'], hit['name']) for hit in res_data } == { ('spell', 'Fire Bolt'), ('action', 'Fire Breath') }
+        assert res_data[0]['score'] >= res_data[1]['score']
+
+        res = app.test_client().get('/search?q=devil')
+        types = { hit['type'] for hit in res.json }
+        assert types == { 'monster', 'action', 'special_ability' }
+
+    def test_search_highlights_matches(self):
+        """ <GET /search?q=:str> highlights the matched terms in the name and snippet """
+
+        res = app.test_client().get('/search?q=acid')
+        res_data = res.json
+        assert len(res_data) == 1
+        assert res_data[0]['highlight'] == '<mark>Acid</mark> Splash'
+
+        res = app.test_client().get('/search?q=bubble')
+        res_data = res.json
+        assert len(res_data) == 1
+        assert res_data[0]['highlight'] == 'Acid Splash'
+        assert '<mark>bubble</mark>' in res_data[0]['snippet']
+
+    def test_search_escapes_catalog_text(self):
+        """ <GET /search?q=:str> escapes markup stored in the catalog so <mark> is the only tag in a hit """
+
+        db.session.add(Spell(name='<b>Ooze</b> Ward', school='abjuration', description='<script>alert("ooze")</script> & more'))
+        db.session.commit()
+
+        [hit] = app.test_client().get('/search?q=ooze').json
+        assert hit['highlight'] == '&lt;b&gt;<mark>Ooze</mark>&lt;/b&gt; Ward'
+
+        [hit] = app.test_client().get('/search?q=alert').json
+        assert hit['snippet'] == '&lt;script&gt;<mark>alert</mark>(&quot;ooze&quot;)&lt;/script&gt; &amp; more'
+
+    def test_search_returns_monster_id_for_nested_hits(self):
+        """ <GET /search?q=:str> returns the monster id for actions and special abilities """
+
+        res = app.test_client().get('/search?q=darkvision')
+        res_data = res.json
+        assert len(res_data) == 1
+        assert res_data[0]['type'] == 'special_ability'
+        assert res_data[0]['monster_id'] == Monster.query.first().id
+
+    def test_search_by_prefix_and_type(self):
+        """ <GET /search?q=:str&type=:str> matches prefixes and filters by type """
+
+        res = app.test_client().get('/search?q=fir&type=spell')
+        assert [ hit['name'] for hit in res.json ] == ['Fire Bolt']
+
+        res = app.test_client().get('/search?q=fire&type=wand')
+        assert res.status_code == 400
+        assert res.json['error']
+
+    def test_search_requires_query(self):
+        """ <GET /search> returns a 400 error without a query """
+
+        res = app.test_client().get('/search?q=%20')
+        assert res.status_code == 400
+        assert res.json['error']
+
+        res = app.test_client().get('/search?q="(*-')
+        assert res.status_code == 200
+        assert res.json == []
+
+    def test_search_limit(self, monkeypatch):
+        """ <GET /search?limit=:int> returns a 400 error for a limit that is not a positive integer and caps the rest """
+
+        assert len(app.test_client().get('/search?q=devil&limit=2').json) == 2
+        for limit in ['abc', '0', '-1']:
+            res = app.test_client().get(f'/search?q=devil&limit={limit}')
+            assert res.status_code == 400
+            assert res.json['error']
+
+        monkeypatch.setattr(search_routes, 'SEARCH_MAX_LIMIT', 1)
+        assert len(app.test_client().get('/search?q=devil&limit=50').json) == 1
+
+    def test_search_index_follows_writes(self):
+        """ <GET /search> reflects POST, PATCH and DELETE requests """
+
+        res = app.test_client().post('/spells', json={ 'name': 'Thunderwave', 'school': 'evocation' })
+        spell_id = res.json['id']
+        assert [ hit['id'] for hit in app.test_client().get('/search?q=thunderwave').json ] == [spell_id]
+
+        app.test_client().patch(f'/spells/{spell_id}', json={ 'name': 'Shatter' })
+        assert app.test_client().get('/search?q=thunderwave').json == []
+        assert [ hit['id'] for hit in app.test_client().get('/search?q=shatter').json ] == [spell_id]
+
+        app.test_client().delete(f'/spells/{spell_id}')
+        assert app.test_client().get('/search?q=shatter').json == []
+
+        action = Action.query.where(Action.name == 'Bite').first()
+        app.test_client().patch(f'/monsters/{action.monster_id}/actions/{action.id}', json={ 'name': 'Gnaw' })
+        assert [ hit['name'] for hit in app.test_client().get('/search?q=gnaw').json ] == ['Gnaw']
+
+        app.test_client().patch(f'/monsters/{action.monster_id}', json={ 'actions': [ { 'name': 'Tail', 'description': 'Sweeps its tail' } ] })
+        assert app.test_client().get('/search?q=gnaw').json == []
+        assert [ hit['name'] for hit in app.test_client().get('/search?q=tail').json ] == ['Tail']
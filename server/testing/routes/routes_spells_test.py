@@ -2,6 +2,7 @@ import pytest
 
 from models import db, Spell
 from create_app import create_app
+from pagination import encode_cursor
 from testing.test_spells import SPELL_ONE, SPELL_TWO, SPELL_THREE, SPELL_FOUR
 
 app = create_app('TESTING')
@@ -135,6 +136,69 @@ class TestSpellRoutes:
         assert res_data[0]['name'] == SPELL_TWO['name']
         assert res_data[4]['name'] == SPELL_THREE['name']
 
+    def test_get_spells_with_cursor(self):
+        """ <GET /spells?cursor=> pages through every spell with a next_cursor """
+
+        db.session.add_all([ Spell(name=f"Spell {n:02}", school="evocation") for n in range(25) ])
+        db.session.commit()
+
+        res = app.test_client().get('/spells', query_string={ 'cursor': '', 'sort': 'name' })
+        assert res.status_code == 200
+        assert res.content_type == 'application/json'
+        res_data = res.json
+        assert len(res_data['results']) == 10
+
+        seen_names = [ s['name'] for s in res_data['results'] ]
+        cursor = res_data['next_cursor']
+        while cursor:
+            res_data = app.test_client().get('/spells', query_string={ 'cursor': cursor, 'sort': 'name' }).json
+            seen_names += [ s['name'] for s in res_data['results'] ]
+            cursor = res_data['next_cursor']
+
+        assert seen_names == [ f"Spell {n:02}" for n in range(25) ]
+
+    def test_get_spells_with_cursor_for_other_sort(self):
+        """ <GET /spells?cursor=:str> returns a 400 error if the cursor belongs to another sort """
+
+        db.session.add_all([ Spell(name=f"Spell {n:02}", school="evocation") for n in range(5) ])
+        db.session.commit()
+
+        res = app.test_client().get('/spells', query_string={ 'cursor': '', 'page_count': 2 })
+        cursor = res.json['next_cursor']
+
+        res = app.test_client().get('/spells', query_string={ 'cursor': cursor, 'sort': 'name' })
+        assert res.status_code == 400
+        assert res.json['error']
+
+    def test_get_spells_with_tampered_cursor(self):
+        """ <GET /spells?cursor=:str> returns a 400 error if the cursor value is not a str, number or null """
+
+        db.session.add_all([ Spell(name=f"Spell {n:02}", school="evocation") for n in range(5) ])
+        db.session.commit()
+
+        for value in [ ['Spell 01'], { 'name': 'Spell 01' }, True ]:
+            res = app.test_client().get('/spells', query_string={ 'cursor': encode_cursor('name', value, 1), 'sort': 'name' })
+            assert res.status_code == 400
+            assert res.json['error']
+
+        res = app.test_client().get('/spells', query_string={ 'cursor': encode_cursor('name', 'Spell 01', 2), 'sort': 'name' })
+        assert res.status_code == 200
+        assert [ spell['name'] for spell in res.json['results'] ] == [ f"Spell {n:02}" for n in range(2, 5) ]
+
+    def test_get_spells_with_fields(self):
+        """ <GET /spells?fields=:str> and <GET /spells/:id?fields=:str> retrieve only the requested columns """
+
+        db.session.add_all([ Spell(name=f"Spell {n:02}", school="evocation", level=n) for n in range(3) ])
+        db.session.commit()
+
+        res = app.test_client().get('/spells?fields=name,level')
+        assert res.status_code == 200
+        assert res.json == [ { 'id': n + 1, 'name': f"Spell {n:02}", 'level': n } for n in range(3) ]
+
+        res = app.test_client().get('/spells/2?fields=school')
+        assert res.status_code == 200
+        assert res.json == { 'id': 2, 'school': 'evocation' }
+
     def test_get_spells_by_name(self):
         """ <GET /spells> accepts a 'name' query that returns based on name """
 
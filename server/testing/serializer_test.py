@@ -0,0 +1,98 @@
+import pytest
+
+from models import db, Monster, Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, Spell, MonsterSpell
+from create_app import create_app
+from serializers import SERIALIZER_CACHE_SIZE, serialize, compile_serializer
+from testing.test_monsters import MONSTER_ONE, MONSTER_TWO
+
+app = create_app('TESTING')
+
+CHILD_MODELS = [Skill, SavingThrow, SpecialAbility, Sense, Speed, Language, DamageResistance, DamageImmunity, DamageVulnerability, ConditionImmunity, Action, MonsterSpell]
+
+@pytest.fixture(autouse=True)
+def run_before_and_after():
+    with app.app_context():
+        db.create_all()
+
+        spells = [
+            Spell(name="Aid", school="abjuration", level=2, verbal=True, somatic=True, material="a strip of cloth"),
+            Spell(name="Mage Hand", school="conjuration", description="A spectral, floating hand appears"),
+        ]
+        m = Monster(**MONSTER_TWO)
+        db.session.add_all([
+            Monster(**MONSTER_ONE),
+            m,
+            Skill(name='history', value=2, monster=m),
+            SavingThrow(name='dexterity', value=2, monster=m),
+            SpecialAbility(name='Amphibious', description='Breathes air and water', monster=m),
+            Sense(name='darkvision', distance=60, monster=m),
+            Speed(name='walk', distance=30, monster=m),
+            Language(name='sylvan', monster=m),
+            DamageResistance(damage_type='fire', monster=m),
+            DamageImmunity(damage_type='poison', monster=m),
+            DamageVulnerability(damage_type='cold', monster=m),
+            ConditionImmunity(condition_type='prone', monster=m),
+            Action(name='Bite', description='Bites something', legendary_action=True, monster=m),
+            *spells,
+            *[ MonsterSpell(monster=m, spell=s) for s in spells ],
+        ])
+        db.session.commit()
+
+        yield
+
+        db.session.remove()
+        db.drop_all()
+
+
+class TestCompiledSerializer:
+    """ [TESTING SUITE: <compiled serializer>] """
+
+    def test_monster_matches_to_dict(self):
+        """ serialize(monster) is identical to monster.to_dict() """
+
+        for m in Monster.query.all():
+            assert serialize(m) == m.to_dict()
+            assert app.json.dumps(serialize(m)) == app.json.dumps(m.to_dict())
+
+    def test_monster_with_only_matches_to_dict(self):
+        """ serialize(monster, only) is identical to monster.to_dict(only) """
+
+        m = Monster.query.where(Monster.id == 2).first()
+        for only in [('id',), ('id', 'name', 'category'), ('id', 'name', 'skills', 'actions'), ('id', 'spells')]:
+            assert serialize(m, only=only) == m.to_dict(only=only)
+
+    def test_spell_matches_to_dict(self):
+        """ serialize(spell) is identical to spell.to_dict() """
+
+        for s in Spell.query.all():
+            assert serialize(s) == s.to_dict()
+            assert serialize(s, only=('id', 'name', 'level')) == s.to_dict(only=('id', 'name', 'level'))
+
+    def test_child_models_match_to_dict(self):
+        """ serialize(child) is identical to child.to_dict() with and without the nested route rules """
+
+        for model in CHILD_MODELS:
+            items = model.query.all()
+            assert items
+            for item in items:
+                assert serialize(item) == item.to_dict()
+                assert serialize(item, rules=("-monster", "-monster_id")) == item.to_dict(rules=("-monster", "-monster_id"))
+
+    def test_compiled_once(self):
+        """ compile_serializer returns the same function for the same arguments """
+
+        assert compile_serializer(Monster) is compile_serializer(Monster)
+        assert compile_serializer(Monster, ('id',)) is not compile_serializer(Monster)
+
+    def test_client_fields_share_serializers(self):
+        """ serialize compiles one serializer per set of real attributes and keeps a bounded number """
+
+        m = Monster.query.where(Monster.id == 2).first()
+        compile_serializer.cache_clear()
+        assert serialize(m, only=('name', 'id', 'name')) == serialize(m, only=('id', 'name', 'nope', 'x.y'))
+        assert compile_serializer.cache_info().currsize == 1
+
+        columns = Monster.__table__.columns.keys()
+        for n in range(1, 1 << 10):
+            serialize(m, only=[ c for i, c in enumerate(columns[:10]) if n & 1 << i ])
+        assert compile_serializer.cache_info().currsize == SERIALIZER_CACHE_SIZE
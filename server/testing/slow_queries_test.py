@@ -0,0 +1,63 @@
+import logging
+
+from types import SimpleNamespace
+
+from slow_queries import SlowQueryLog, redact, explain
+
+
+# a DBAPI cursor that fails like postgres after an
+# error, until it rolls back to a savepoint
+class AbortingCursor:
+
+    def __init__(self, executed):
+        self.executed = executed
+        self.aborted = False
+
+    def execute(self, statement, parameters=None):
+        self.executed.append(statement.split(' ')[0] if not statement.startswith('ROLLBACK') else 'ROLLBACK TO')
+        if self.aborted and not statement.startswith('ROLLBACK TO'):
+            raise Exception("current transaction is aborted")
+        self.aborted = False
+        if statement.startswith('EXPLAIN'):
+            self.aborted = True
+            raise Exception("syntax error")
+
+    def close(self):
+        pass
+
+def aborting_connection(executed):
+    return SimpleNamespace(dialect=SimpleNamespace(name='postgresql'), connection=SimpleNamespace(cursor=lambda: AbortingCursor(executed)))
+
+
+def entry(log, duration_ms):
+    log.entries.append({ 'sql': f"SELECT {duration_ms}", 'duration_ms': duration_ms })
+
+
+class TestSlowQueryLog:
+    """ [TESTING SUITE: <Slow query log>] """
+
+    def test_redact(self):
+        """ redact keeps None, booleans and numbers and hides every other value """
+
+        assert redact(('Aid', 3, None, True, 1.5, b'x')) == ['<str>', 3, None, True, 1.5, '<bytes>']
+        assert redact({ 'name_1': 'Aid', 'id_1': 4 }) == { 'name_1': '<str>', 'id_1': 4 }
+
+    def test_ring_buffer(self):
+        """ SlowQueryLog keeps the last entries up to its size and lists the slowest first """
+
+        log = SlowQueryLog(100, 3, False, logging.getLogger(__name__))
+        for duration_ms in [500, 120, 900, 300]:
+            entry(log, duration_ms)
+
+        assert [ e['duration_ms'] for e in log.worst() ] == [900, 300, 120]
+        assert [ e['duration_ms'] for e in log.recent() ] == [300, 900, 120]
+        log.clear()
+        assert log.worst() == []
+
+    def test_failed_explain_rolls_back(self):
+        """ explain runs in a savepoint and rolls back to it when the plan fails """
+
+        executed = []
+        plan = explain(aborting_connection(executed), "SELECT * FROM spells_table WHERE id = %(id)s", { 'id': 1 })
+        assert plan == ["EXPLAIN failed: syntax error"]
+        assert executed == ['SAVEPOINT', 'EXPLAIN', 'ROLLBACK TO', 'RELEASE']
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Spell
+from create_app import create_app
+from config import sqlite_pragmas
+from sqlite_tuning import read_only_uri
+
+def file_app(path, **config):
+    return create_app('TESTING', { 'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}", 'SQLITE_PRAGMAS': sqlite_pragmas(), **config })
+
+def pragma(name):
+    return db.session.execute(text(f"PRAGMA {name}")).scalar()
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ['SQLITE_TUNING', 'SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_MMAP_SIZE', 'SQLITE_CACHE_SIZE', 'SQLITE_BUSY_TIMEOUT', 'SQLITE_TEMP_STORE']:
+        monkeypatch.delenv(name, raising=False)
+
+class TestSqliteTuning:
+    """ [TESTING SUITE: <SQLite tuning>] """
+
+    def test_pragmas_on_every_connection(self, tmp_path):
+        """ every new connection runs SQLITE_PRAGMAS """
+
+        app = file_app(tmp_path / 'app.db')
+        with app.app_context():
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1
+            assert pragma('mmap_size') == 256 * 1024 * 1024
+            assert pragma('cache_size') == -64 * 1024
+            assert pragma('busy_timeout') == 5000
+            assert pragma('temp_store') == 2
+            db.engine.dispose()
+
+    def test_pragmas_from_env(self, monkeypatch):
+        """ sqlite_pragmas reads SQLITE_* and SQLITE_TUNING=false turns them off """
+
+        monkeypatch.setenv('SQLITE_BUSY_TIMEOUT', '100')
+        monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'FULL')
+        assert sqlite_pragmas()['busy_timeout'] == 100
+        assert sqlite_pragmas()['synchronous'] == 'FULL'
+
+        monkeypatch.setenv('SQLITE_TUNING', 'false')
+        assert sqlite_pragmas() == {}
+
+    def test_readers_run_during_a_write(self, tmp_path):
+        """ with WAL a reader is not blocked by an open write transaction """
+
+        app = file_app(tmp_path / 'app.db')
+        with app.app_context():
+            db.create_all()
+            db.session.add(Spell(name='Aid', school='abjuration'))
+            db.session.commit()
+
+            with db.engine.connect() as writer:
+                writer.execute(text("UPDATE spells_table SET name = 'Aid (writing)'"))
+                res = app.test_client().get('/spells/1')
+                assert res.status_code == 200
+                assert res.json['name'] == 'Aid'
+                writer.rollback()
+
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_read_only_uri(self, tmp_path):
+        """ read_only_uri opens the same file read only, optionally immutable """
+
+        assert read_only_uri('sqlite:////data/app.db') == 'sqlite:///file:/data/app.db?mode=ro&uri=true'
+        assert read_only_uri('sqlite:////data/app.db', immutable=True) == 'sqlite:///file:/data/app.db?mode=ro&immutable=1&uri=true'
+        with pytest.raises(ValueError):
+            read_only_uri('sqlite:///:memory:')
+        with pytest.raises(ValueError):
+            read_only_uri('postgresql://db/monsters')
+
+        path = tmp_path / 'app.db'
+        app = file_app(path, SQLITE_PRAGMAS={})
+        with app.app_context():
+            db.create_all()
+            db.session.add(Spell(name='Aid', school='abjuration'))
+            db.session.commit()
+            db.session.remove()
+            db.engine.dispose()
+
+        app = file_app(path, SQLALCHEMY_DATABASE_URI=read_only_uri(f"sqlite:///{path}", immutable=True))
+        with app.app_context():
+            assert app.test_client().get('/spells/1').json['name'] == 'Aid'
+
+            db.session.add(Spell(name='Bless', school='enchantment'))
+            with pytest.raises(OperationalError, match='readonly'):
+                db.session.commit()
+            db.session.rollback()
+            db.session.remove()
+            db.engine.dispose()